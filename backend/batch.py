@@ -0,0 +1,157 @@
+"""
+Parallel offline reprocessing of the derived results of historical recordings, after a change of
+the normalization formula or of the pyramid layout.
+
+Recordings are split into batches handed to a pool of worker processes. Each worker opens its
+own database connections, recomputes every recording of its batch (reading raw data in bulk,
+writing the results with multi-row INSERTs) and commits once per batch. The parent process
+appends every finished batch to a checkpoint file, which a resumed run skips, and reports
+progress and throughput as batches complete.
+
+    normalized  the normalized_series rows (see derived.py)
+    pyramids    the downsampling pyramids of both eyes (see pyramid.py)
+"""
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from multiprocessing import get_context
+from typing import List, Optional, Sequence, Set, Tuple
+
+from catalog import recording_data_points
+from database import AsyncSessionLocal, engine
+from derived import has_current_normalized, recompute_recording
+from pyramid import Pyramid, remove_pyramids, save_pyramid
+from services import EyeTrackingService
+
+REPROCESS_TARGETS = ("normalized", "pyramids")
+DEFAULT_BATCH_SIZE = 8
+
+Recording = Tuple[str, int]
+
+
+@dataclass
+class BatchResult:
+    recordings: List[Recording]
+    rows: int
+    seconds: float
+
+
+def process_batch(recordings: List[Recording], targets: Sequence[str], recompute_current: bool = False) -> BatchResult:
+    """
+    Worker entry point: recompute the targets of a batch of recordings in one transaction. Normalized
+    series already computed with the current formula are kept unless recompute_current.
+    """
+    return asyncio.run(_process_batch(recordings, targets, recompute_current))
+
+
+async def _process_batch(recordings: List[Recording], targets: Sequence[str], recompute_current: bool) -> BatchResult:
+    started = time.perf_counter()
+    row_count = 0
+    try:
+        async with AsyncSessionLocal() as db:
+            service = EyeTrackingService(db)
+            for session_id, recording_number in recordings:
+                if "normalized" in targets and (recompute_current or not await has_current_normalized(db, session_id, recording_number)):
+                    references = await service.get_calibration_references(session_id)
+                    row_count += await recompute_recording(db, session_id, recording_number, references)
+                if "pyramids" in targets:
+                    await remove_pyramids(db, session_id, recording_number)
+                    data_points = await recording_data_points(db, session_id, recording_number)
+                    for eye_side in ("left", "right"):
+                        timestamps, values = await service.get_recording_series(session_id, recording_number, eye_side)
+                        if len(values) and data_points is not None:
+                            await save_pyramid(db, session_id, recording_number, eye_side, Pyramid.build(timestamps, values),
+                                               data_points)
+            await db.commit()
+    finally:
+        # Each batch runs in a new event loop: pooled connections cannot outlive it
+        await engine.dispose()
+    return BatchResult(recordings, row_count, time.perf_counter() - started)
+
+
+class Checkpoint:
+    """
+    Recordings already reprocessed by a run, one JSON line per recording, appended as batches finish.
+    The first line holds the options of the run (targets, whether up-to-date series are recomputed):
+    a checkpoint written with other options is refused rather than resumed, unless restart.
+    """
+
+    def __init__(self, path: Optional[str], options: Optional[dict] = None, restart: bool = False):
+        self.path = path
+        self.options = options or {}
+        self.done: Set[Recording] = set()
+        if restart:
+            self.clear()
+        if path and os.path.exists(path):
+            with open(path) as checkpoint:
+                lines = [json.loads(line) for line in checkpoint if line.strip()]
+            header = lines[0] if lines and isinstance(lines[0], dict) else {}
+            if header.get('options') != self.options:
+                raise ValueError(f"Checkpoint {path} was written for {header.get('options') or 'unknown options'}, "
+                                 f"not {self.options}")
+            self.done = {(session_id, recording_number) for session_id, recording_number in lines[1:]}
+
+    def record(self, recordings: List[Recording]) -> None:
+        self.done.update(recordings)
+        if not self.path:
+            return
+        header = [] if os.path.exists(self.path) else [json.dumps({'options': self.options}) + "\n"]
+        with open(self.path, "a") as checkpoint:
+            checkpoint.writelines(header)
+            checkpoint.writelines(json.dumps([session_id, recording_number]) + "\n" for session_id, recording_number in recordings)
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+
+    def clear(self) -> None:
+        self.done.clear()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def reprocess_options(targets: Sequence[str], recompute_current: bool) -> dict:
+    """Options of a run stored in its checkpoint: resuming with other ones would skip recordings they never covered"""
+    return {'targets': sorted(targets), 'recompute_current': recompute_current}
+
+
+def reprocess(recordings: List[Recording], targets: Sequence[str], workers: int,
+              batch_size: int = DEFAULT_BATCH_SIZE, checkpoint: Optional[Checkpoint] = None,
+              recompute_current: bool = False) -> Tuple[int, int]:
+    """
+    Reprocess recordings across worker processes, skipping those in the checkpoint. Up-to-date normalized
+    series are only recomputed with recompute_current (see process_batch).
+    Returns the number of recordings and rows processed by this run.
+    """
+    checkpoint = checkpoint or Checkpoint(None)
+    pending = [recording for recording in recordings if recording not in checkpoint.done]
+    skipped = len(recordings) - len(pending)
+    if skipped:
+        print(f"Resuming: {skipped} recordings already done according to {checkpoint.path}")
+    batches = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+
+    started = time.perf_counter()
+    recording_count, row_count = 0, 0
+    # spawn: workers import their own engine instead of inheriting the parent's connections
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        running = {pool.submit(process_batch, batch, list(targets), recompute_current) for batch in batches}
+        while running:
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                try:
+                    result = future.result()
+                except Exception:
+                    # Stop queued batches; the checkpoint keeps what finished
+                    for queued in running:
+                        queued.cancel()
+                    raise
+                checkpoint.record(result.recordings)
+                recording_count += len(result.recordings)
+                row_count += result.rows
+                elapsed = time.perf_counter() - started
+                rate = recording_count / elapsed
+                remaining = (len(pending) - recording_count) / rate if rate else 0.0
+                print(f"[{recording_count}/{len(pending)}] {rate:.1f} recordings/s, {row_count / elapsed:.0f} rows/s, "
+                      f"ETA {remaining:.0f}s")
+    return recording_count, row_count
@@ -0,0 +1,9 @@
+"""
+Reproducible benchmarks of the backend hot paths, on synthetic sessions (see generator.py).
+
+    uv run python -m benchmarks --output results.json
+    uv run python -m benchmarks.compare baseline.json results.json
+
+Runs against a temporary SQLite database unless --database-url is given; DATABASE_URL is
+ignored, so that a benchmark never writes into the application database by accident.
+"""
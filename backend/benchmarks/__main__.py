@@ -0,0 +1,70 @@
+"""
+Run the benchmark suite and write its JSON results.
+
+Usage:
+    uv run python -m benchmarks [--database-url URL] [--output FILE] [--only ingest playback sessions functions]
+                                [--fps 30] [--duration 60] [--repeat 5] [--session-counts 10 1000 10000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the backend hot paths")
+    parser.add_argument("--database-url", help="Database to benchmark against, e.g. postgresql+asyncpg://... "
+                        "(default: a temporary SQLite database)")
+    parser.add_argument("--output", help="JSON results file (default: print the results)")
+    parser.add_argument("--only", nargs="+", help="Benchmarks to run (default: all)")
+    parser.add_argument("--fps", type=float, help="Frame rate of the synthetic recordings")
+    parser.add_argument("--duration", type=float, help="Duration of the synthetic recordings, in seconds")
+    parser.add_argument("--repeat", type=int, help="Measured runs of each benchmark, after one warm-up run")
+    parser.add_argument("--session-counts", type=int, nargs="+", help="Catalog sizes for the session listing benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic data generator")
+    return parser.parse_args()
+
+
+async def run(args: argparse.Namespace) -> dict:
+    # Imported once DATABASE_URL is set: database.py creates its engine on import
+    from database import engine
+    from benchmarks.suite import BENCHMARKS, BenchmarkConfig, run_suite
+
+    config = BenchmarkConfig(seed=args.seed, prefix=f"bench-{int(time.time())}")
+    for option, attribute in (("fps", "fps"), ("duration", "duration_s"), ("repeat", "repeat"), ("session_counts", "session_counts")):
+        if getattr(args, option) is not None:
+            setattr(config, attribute, getattr(args, option))
+    try:
+        return await run_suite(config, args.only or list(BENCHMARKS))
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    args = parse_args()
+    temporary_directory = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        temporary_directory = tempfile.mkdtemp(prefix="eye-tracking-benchmark-")
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(temporary_directory, 'benchmark.db')}"
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if temporary_directory:
+            shutil.rmtree(temporary_directory, ignore_errors=True)
+
+    document = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(document + "\n")
+        print(f"Results written to {args.output}")
+    else:
+        print(document)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Compare two benchmark result files, benchmark by benchmark, on the median run time (or the
+fastest one, steadier on a busy machine).
+
+Usage:
+    uv run python -m benchmarks.compare BASELINE.json RESULTS.json [--threshold 0.1] [--statistic median|min]
+
+Exits with status 1 when a benchmark is slower than the baseline by more than the threshold
+(a fraction of the baseline), so that it can gate a deploy.
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List, Tuple
+
+DEFAULT_THRESHOLD = 0.1
+STATISTICS = ("median", "min")
+
+Key = Tuple[str, str]
+
+
+def load_results(path: str) -> Dict[Key, dict]:
+    with open(path) as results:
+        document = json.load(results)
+    return {
+        (benchmark['name'], json.dumps(benchmark['params'], sort_keys=True)): benchmark
+        for benchmark in document['benchmarks']
+    }
+
+
+def compare(baseline: Dict[Key, dict], results: Dict[Key, dict], threshold: float,
+            statistic: str = "median") -> Tuple[List[str], List[Key]]:
+    """Report lines, and the keys of the benchmarks slower than the baseline by more than threshold"""
+    lines = [f"{'benchmark':<60} {'baseline ms':>12} {'current ms':>12} {'change':>8}"]
+    regressions = []
+    for key in sorted(set(baseline) | set(results)):
+        label = f"{key[0]} {key[1]}"
+        if key not in baseline or key not in results:
+            lines.append(f"{label:<60} {'only in ' + ('current' if key in results else 'baseline'):>34}")
+            continue
+        before, after = baseline[key][f"{statistic}_s"], results[key][f"{statistic}_s"]
+        change = after / before - 1 if before > 0 else 0.0
+        marker = ""
+        if change > threshold:
+            regressions.append(key)
+            marker = "  REGRESSION"
+        lines.append(f"{label:<60} {before * 1000:>12.3f} {after * 1000:>12.3f} {change:>+8.1%}{marker}")
+    return lines, regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare", description="Compare two benchmark result files")
+    parser.add_argument("baseline", help="Results of the reference commit")
+    parser.add_argument("results", help="Results to check")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Slowdown tolerated before failing, as a fraction")
+    parser.add_argument("--statistic", choices=STATISTICS, default="median", help="Run time compared")
+    args = parser.parse_args()
+
+    lines, regressions = compare(load_results(args.baseline), load_results(args.results), args.threshold, args.statistic)
+    print("\n".join(lines))
+    if regressions:
+        print(f"{len(regressions)} benchmarks slower than the baseline by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
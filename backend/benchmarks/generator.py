@@ -0,0 +1,158 @@
+"""
+Synthetic sessions in the payload format of the recording and calibration endpoints.
+
+Each eye is a pair of corners and an iris in MediaPipe's normalized image coordinates. The gaze
+alternates fixations (log-normal durations around FIXATION_MS, with a slow drift) and saccades
+(duration growing with amplitude), on top of a slow head movement that moves and scales the whole
+eye. Landmarks get Gaussian noise, frame intervals jitter, some frames are dropped, and blinks
+remove both eyes for BLINK_MS every few seconds. Everything derives from the seed, so a run
+generates the same sessions on every machine.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+DEFAULT_FPS = 30.0
+DEFAULT_DURATION_S = 60.0
+
+START_TIMESTAMP = 1_700_000_000_000
+# Sessions start this far apart; recordings of a session are this far apart at least
+SESSION_SPACING_MS = 86_400_000
+RECORDING_GAP_MS = 600_000
+
+EYE_WIDTH = 0.05
+EYE_CENTERS = {"leftEye": (0.42, 0.45), "rightEye": (0.58, 0.45)}
+# Fraction of the eye width the iris travels from the center at the extreme gaze positions
+IRIS_TRAVEL = 0.35
+LANDMARK_NOISE = 0.0004
+FRAME_JITTER_MS = 2.0
+DROPPED_FRAME_RATE = 0.01
+FIXATION_MS = 250.0
+BLINK_INTERVAL_MS = 4000.0
+BLINK_MS = 150.0
+
+
+@dataclass
+class SyntheticSession:
+    session_id: str
+    calibration_points: List[dict]
+    recordings: Dict[int, List[dict]]
+
+
+def _landmark(x: float, y: float, z: float) -> dict:
+    return {"x": x, "y": y, "z": z}
+
+
+def _eye(center_x: float, center_y: float, width: float, gaze: float, noise: np.ndarray) -> dict:
+    """Corners and iris of one eye looking at gaze (-1 left, 1 right), noise of shape (9,)"""
+    half = width / 2
+    iris_x = center_x + gaze * IRIS_TRAVEL * width
+    return {
+        "corners": [
+            _landmark(center_x - half + noise[0], center_y + noise[1], noise[2]),
+            _landmark(center_x + half + noise[3], center_y + noise[4], noise[5]),
+        ],
+        "center": _landmark(iris_x + noise[6], center_y + noise[7], noise[8]),
+    }
+
+
+def gaze_trace(times_ms: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Horizontal gaze in [-1, 1] at the given times (ms from the start): fixations joined by saccades"""
+    duration = float(times_ms[-1]) if len(times_ms) else 0.0
+    knot_times, knot_values = [0.0], [rng.uniform(-0.8, 0.8)]
+    while knot_times[-1] <= duration:
+        fixation = rng.lognormal(np.log(FIXATION_MS), 0.4)
+        drift = rng.normal(0.0, 0.02)
+        knot_times.append(knot_times[-1] + fixation)
+        knot_values.append(float(np.clip(knot_values[-1] + drift, -1.0, 1.0)))
+        target = rng.uniform(-0.8, 0.8)
+        saccade = 20.0 + 25.0 * abs(target - knot_values[-1])
+        knot_times.append(knot_times[-1] + saccade)
+        knot_values.append(target)
+    return np.interp(times_ms, knot_times, knot_values)
+
+
+def frame_times(start_ts: int, fps: float, duration_s: float, rng: np.random.Generator) -> np.ndarray:
+    """Strictly increasing int64 frame timestamps, jittered, with dropped frames removed"""
+    count = max(1, int(duration_s * fps))
+    intervals = np.maximum(1, np.round(1000.0 / fps + rng.normal(0.0, FRAME_JITTER_MS, count)))
+    intervals[0] = 0
+    timestamps = start_ts + np.cumsum(intervals).astype(np.int64)
+    kept = rng.random(count) >= DROPPED_FRAME_RATE
+    kept[0] = True
+    return timestamps[kept]
+
+
+def recording_positions(start_ts: int, fps: float, duration_s: float, rng: np.random.Generator) -> List[dict]:
+    """Positions of one recording, as sent to POST /api/eye-tracking/{session_id}"""
+    timestamps = frame_times(start_ts, fps, duration_s, rng)
+    elapsed = (timestamps - start_ts).astype(np.float64)
+    gaze = gaze_trace(elapsed, rng)
+
+    # Slow head movement: translation and distance to the camera
+    phase = rng.uniform(0, 2 * np.pi, 3)
+    head_x = 0.01 * np.sin(elapsed / 7000.0 + phase[0])
+    head_y = 0.005 * np.sin(elapsed / 5000.0 + phase[1])
+    scale = 1.0 + 0.05 * np.sin(elapsed / 11000.0 + phase[2])
+
+    blink_starts = np.cumsum(rng.exponential(BLINK_INTERVAL_MS, int(elapsed[-1] / BLINK_INTERVAL_MS) + 2))
+    blink_index = np.searchsorted(blink_starts, elapsed, side='right') - 1
+    blinking = (blink_index >= 0) & (elapsed - blink_starts[np.maximum(blink_index, 0)] < BLINK_MS)
+
+    noise = rng.normal(0.0, LANDMARK_NOISE, (len(timestamps), 2, 9))
+    confidences = np.round(rng.uniform(0.85, 1.0, len(timestamps)), 3)
+
+    positions = []
+    for i, timestamp in enumerate(timestamps.tolist()):
+        position = {"timestamp": timestamp, "confidence": float(confidences[i])}
+        if not blinking[i]:
+            for k, (key, (center_x, center_y)) in enumerate(EYE_CENTERS.items()):
+                position[key] = _eye(
+                    0.5 + (center_x - 0.5) * scale[i] + head_x[i], center_y + head_y[i],
+                    EYE_WIDTH * scale[i], float(gaze[i]), noise[i, k]
+                )
+        positions.append(position)
+    return positions
+
+
+def calibration_points(start_ts: int, rng: np.random.Generator) -> List[dict]:
+    """The three calibration points (left, center, right), as sent to POST /api/calibration"""
+    points = []
+    for index, (gaze_direction, gaze) in enumerate((("left", -1.0), ("center", 0.0), ("right", 1.0))):
+        point = {"timestamp": start_ts + index * 2000, "gaze_direction": gaze_direction}
+        for k, (key, (center_x, center_y)) in enumerate(EYE_CENTERS.items()):
+            point[key] = _eye(center_x, center_y, EYE_WIDTH, gaze, rng.normal(0.0, LANDMARK_NOISE, 9))
+        points.append(point)
+    return points
+
+
+def generate_session(session_id: str, recordings: int = 1, fps: float = DEFAULT_FPS,
+                     duration_s: float = DEFAULT_DURATION_S, start_ts: int = START_TIMESTAMP,
+                     seed: Optional[int] = 0) -> SyntheticSession:
+    """One calibrated session with `recordings` recordings of duration_s seconds at fps frames per second"""
+    rng = np.random.default_rng(seed)
+    # Timestamps are unique per session and eye: recordings must not overlap, whatever the jitter
+    spacing = int(duration_s * 2000) + RECORDING_GAP_MS
+    return SyntheticSession(
+        session_id=session_id,
+        calibration_points=calibration_points(start_ts, rng),
+        recordings={
+            number: recording_positions(start_ts + number * spacing, fps, duration_s, rng)
+            for number in range(1, recordings + 1)
+        },
+    )
+
+
+def generate_sessions(count: int, recordings: int = 1, fps: float = DEFAULT_FPS,
+                      duration_s: float = DEFAULT_DURATION_S, prefix: str = "bench",
+                      seed: int = 0, start: int = 0) -> Iterator[SyntheticSession]:
+    """
+    Sessions start to count - 1, named {prefix}-{index}, a day apart, each from its own seed:
+    a larger set generated later extends a smaller one with the same sessions
+    """
+    for index in range(start, count):
+        yield generate_session(
+            f"{prefix}-{index:06d}", recordings, fps, duration_s,
+            START_TIMESTAMP + index * SESSION_SPACING_MS, seed=seed * 1_000_003 + index
+        )
@@ -0,0 +1,308 @@
+"""
+Benchmarks of the ingest, playback and session listing paths, through EyeTrackingService against
+the database of DATABASE_URL, and of the normalization and smoothing functions.
+
+Every benchmark runs once to warm up, then `repeat` times; each database run opens its own
+AsyncSession, like a request does. Results keep every run time, so that comparisons can use the
+median rather than a single noisy measurement.
+"""
+import contextlib
+import io
+import os
+import platform
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import sqlalchemy
+from sqlalchemy import func, select
+
+from database import AsyncSessionLocal, SessionCatalog, engine, init_db
+from filters import DEFAULT_WINDOW, FILTERS, apply_filter
+from normalization import calibration_reference, eye_arrays_from_positions, normalize_eye
+from services import EyeTrackingService
+from utils import apply_noise_reduction_to_normalized_data, calculate_normalized_position
+
+from benchmarks.generator import DEFAULT_DURATION_S, DEFAULT_FPS, generate_session, generate_sessions
+
+RESULTS_FORMAT_VERSION = 1
+DEFAULT_REPEAT = 5
+DEFAULT_SESSION_COUNTS = (10, 1000, 10000)
+# Sessions seeded for the session listing benchmark hold one recording of this many seconds
+LISTING_RECORDING_S = 1.0
+# Minimum duration of one run of a function benchmark
+MIN_RUN_S = 0.05
+
+
+@dataclass
+class BenchmarkConfig:
+    fps: float = DEFAULT_FPS
+    duration_s: float = DEFAULT_DURATION_S
+    repeat: int = DEFAULT_REPEAT
+    session_counts: Sequence[int] = DEFAULT_SESSION_COUNTS
+    seed: int = 0
+    # Session ids start with it: a unique prefix per run lets runs share a database
+    prefix: str = "bench"
+
+    @property
+    def ingest_session(self) -> str:
+        return f"{self.prefix}-ingest"
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    params: dict
+    seconds: List[float]
+    # Frames, rows or points handled per run, for throughput
+    items: Optional[int] = None
+    extra: dict = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        times = np.array(self.seconds)
+        median = float(np.median(times))
+        result = {
+            'name': self.name,
+            'params': self.params,
+            'runs': len(times),
+            'min_s': float(times.min()),
+            'median_s': median,
+            'mean_s': float(times.mean()),
+            'stdev_s': float(times.std(ddof=1)) if len(times) > 1 else 0.0,
+            'seconds': self.seconds,
+        }
+        if self.items is not None:
+            result['items'] = self.items
+            result['items_per_s'] = self.items / median if median > 0 else None
+        result.update(self.extra)
+        return result
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the per-call prints of the service (ingest logs) while keeping their cost"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+async def measure(run: Callable[[int], Awaitable], repeat: int) -> List[float]:
+    """Seconds of `repeat` runs after one warm-up run; run gets the run index, -1 for the warm-up"""
+    seconds = []
+    for index in range(-1, repeat):
+        started = time.perf_counter()
+        await run(index)
+        if index >= 0:
+            seconds.append(time.perf_counter() - started)
+    return seconds
+
+
+def measure_sync(run: Callable[[], object], repeat: int) -> List[float]:
+    """
+    Seconds per call of `repeat` runs after one warm-up call. Like timeit, each run calls `run`
+    enough times to last MIN_RUN_S, so that sub-millisecond functions are not lost in timer noise.
+    """
+    started = time.perf_counter()
+    run()
+    once = time.perf_counter() - started
+    number = max(1, int(MIN_RUN_S / once)) if once > 0 else 1000
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            run()
+        seconds.append((time.perf_counter() - started) / number)
+    return seconds
+
+
+async def bench_ingest(config: BenchmarkConfig) -> List[BenchmarkResult]:
+    """store_recording_data of one recording into a calibrated session, a new recording number per run"""
+    session = generate_session(config.ingest_session, config.repeat + 1, config.fps, config.duration_s, seed=config.seed)
+    async with AsyncSessionLocal() as db:
+        with quiet():
+            await EyeTrackingService(db).store_calibration_data(config.ingest_session, session.calibration_points)
+
+    async def run(index: int) -> None:
+        # The warm-up stores recording 1, kept for the playback benchmarks
+        recording_number = index + 2
+        async with AsyncSessionLocal() as db:
+            with quiet():
+                await EyeTrackingService(db).store_recording_data(
+                    config.ingest_session, recording_number, session.recordings[recording_number]
+                )
+
+    seconds = await measure(run, config.repeat)
+    frames = len(session.recordings[1])
+    return [BenchmarkResult("store_recording_data", {'fps': config.fps, 'duration_s': config.duration_s}, seconds, frames)]
+
+
+async def bench_playback(config: BenchmarkConfig) -> List[BenchmarkResult]:
+    """get_recording_data of the first recording stored by bench_ingest, raw and smoothed"""
+    results = []
+    for noise_reduction in (False, True):
+        points = []
+
+        async def run(index: int) -> None:
+            async with AsyncSessionLocal() as db:
+                data = await EyeTrackingService(db).get_recording_data(config.ingest_session, 1, noise_reduction=noise_reduction)
+            points.append(len(data))
+
+        seconds = await measure(run, config.repeat)
+        results.append(BenchmarkResult(
+            "get_recording_data",
+            {'fps': config.fps, 'duration_s': config.duration_s, 'noise_reduction': noise_reduction},
+            seconds, points[-1]
+        ))
+    return results
+
+
+async def _catalog_session_count() -> int:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(func.count()).select_from(SessionCatalog))).scalar_one()
+
+
+async def bench_session_list(config: BenchmarkConfig) -> List[BenchmarkResult]:
+    """get_all_sessions with the catalog grown to each of the session counts"""
+    results = []
+    seeded = 0
+    for count in sorted(config.session_counts):
+        if count > seeded:
+            started = time.perf_counter()
+            sessions = generate_sessions(count, fps=config.fps, duration_s=LISTING_RECORDING_S,
+                                         prefix=f"{config.prefix}-list", seed=config.seed, start=seeded)
+            for session in sessions:
+                async with AsyncSessionLocal() as db:
+                    with quiet():
+                        await EyeTrackingService(db).store_recording_data(session.session_id, 1, session.recordings[1])
+            print(f"Seeded {count - seeded} sessions in {time.perf_counter() - started:.1f}s")
+            seeded = count
+
+        listed = []
+
+        async def run(index: int) -> None:
+            async with AsyncSessionLocal() as db:
+                listed.append(len(await EyeTrackingService(db).get_all_sessions()))
+
+        seconds = await measure(run, config.repeat)
+        # Other sessions of the database are listed too
+        results.append(BenchmarkResult("get_all_sessions", {'sessions': count}, seconds, listed[-1],
+                                       {'catalog_sessions': await _catalog_session_count()}))
+    return results
+
+
+def bench_functions(config: BenchmarkConfig) -> List[BenchmarkResult]:
+    """utils.py per-frame functions, and the NumPy paths the service uses instead"""
+    session = generate_session(f"{config.prefix}-functions", 1, config.fps, config.duration_s, seed=config.seed)
+    positions = session.recordings[1]
+    calibration_points = session.calibration_points
+    params = {'fps': config.fps, 'duration_s': config.duration_s}
+    results = []
+
+    normalized = []
+
+    def normalize_positions() -> None:
+        normalized[:] = [
+            {'timestamp': position['timestamp'], 'x': x}
+            for position in positions
+            for x in [calculate_normalized_position(position, calibration_points)]
+            if x is not None
+        ]
+
+    results.append(BenchmarkResult("utils.calculate_normalized_position", params,
+                                   measure_sync(normalize_positions, config.repeat), len(positions)))
+    results.append(BenchmarkResult(
+        "utils.apply_noise_reduction_to_normalized_data", params,
+        measure_sync(lambda: apply_noise_reduction_to_normalized_data(normalized, DEFAULT_WINDOW), config.repeat),
+        len(normalized)
+    ))
+
+    reference = calibration_reference(calibration_points)
+    results.append(BenchmarkResult(
+        "normalization.normalize_eye", params,
+        measure_sync(lambda: normalize_eye(eye_arrays_from_positions(positions), reference), config.repeat),
+        len(positions)
+    ))
+
+    _, values = normalize_eye(eye_arrays_from_positions(positions), reference)
+    for filter_name in FILTERS:
+        results.append(BenchmarkResult(
+            "filters.apply_filter", dict(params, filter=filter_name, window=DEFAULT_WINDOW),
+            measure_sync(lambda: apply_filter(values, filter_name, DEFAULT_WINDOW), config.repeat),
+            len(values)
+        ))
+    return results
+
+
+async def _bench_functions(config: BenchmarkConfig) -> List[BenchmarkResult]:
+    return bench_functions(config)
+
+
+# Run in this order: playback reads the recording stored by ingest
+BENCHMARKS: Dict[str, Callable[[BenchmarkConfig], Awaitable[List[BenchmarkResult]]]] = {
+    "ingest": bench_ingest,
+    "playback": bench_playback,
+    "sessions": bench_session_list,
+    "functions": _bench_functions,
+}
+
+
+def _git_revision() -> dict:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain"], cwd=root, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+    return {'commit': commit, 'dirty': bool(status.strip())}
+
+
+async def _database_metadata() -> dict:
+    async with engine.connect() as connection:
+        version = connection.dialect.server_version_info
+    return {
+        'dialect': engine.dialect.name,
+        'driver': engine.dialect.driver,
+        'server_version': ".".join(str(part) for part in version) if version else None,
+        'storage_mode': os.getenv("STORAGE_MODE", "rows"),
+        'bulk_ingest': os.getenv("BULK_INGEST", "true"),
+    }
+
+
+async def run_suite(config: BenchmarkConfig, selected: Sequence[str]) -> dict:
+    """Run the selected benchmarks (in BENCHMARKS order) and return the JSON results document"""
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(sorted(unknown))}. Available benchmarks: {', '.join(BENCHMARKS)}")
+    if "playback" in selected and "ingest" not in selected:
+        raise ValueError("The playback benchmarks read the recording stored by the ingest benchmark: select both")
+
+    await init_db()
+    started_at = datetime.now(timezone.utc)
+    results: List[BenchmarkResult] = []
+    for name, benchmark in BENCHMARKS.items():
+        if name in selected:
+            print(f"Running {name} benchmarks...")
+            for result in await benchmark(config):
+                summary = result.to_dict()
+                print(f"  {result.name} {result.params}: median {summary['median_s'] * 1000:.2f} ms")
+                results.append(result)
+
+    return {
+        'format_version': RESULTS_FORMAT_VERSION,
+        'started_at': started_at.isoformat(),
+        'git': _git_revision(),
+        'environment': {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'sqlalchemy': sqlalchemy.__version__,
+        },
+        'database': await _database_metadata(),
+        'config': asdict(config),
+        'benchmarks': [result.to_dict() for result in results],
+    }
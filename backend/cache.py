@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List
+
+# Returned by TTLCache.get when a key is absent, so that None can be cached
+MISSING = object()
+
+_caches: List["TTLCache"] = []
+
+
+class TTLCache:
+    """
+    Process-wide LRU cache whose entries also expire after `ttl` seconds, with hit/miss counters
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        _caches.append(self)
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return MISSING
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Drop every entry whose key matches, e.g. all the entries of one session"""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+# Normalization references per session_id, derived from calibration_data
+calibration_cache = TTLCache(
+    "calibration",
+    maxsize=int(os.getenv("CALIBRATION_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("CALIBRATION_CACHE_TTL", "300"))
+)
+
+# Range statistics indexes per (session_id, recording_number, eye, filter, window), see range_stats.py
+range_index_cache = TTLCache(
+    "range_index",
+    maxsize=int(os.getenv("RANGE_INDEX_CACHE_SIZE", "64")),
+    ttl=float(os.getenv("RANGE_INDEX_CACHE_TTL", "600"))
+)
+
+# Downsampling pyramids per (session_id, recording_number, eye), see pyramid.py
+pyramid_cache = TTLCache(
+    "pyramid",
+    maxsize=int(os.getenv("PYRAMID_CACHE_SIZE", "64")),
+    ttl=float(os.getenv("PYRAMID_CACHE_TTL", "600"))
+)
+
+# Detected eye movement events per (session_id, recording_number, eye, EventParameters), see events.py
+event_cache = TTLCache(
+    "events",
+    maxsize=int(os.getenv("EVENT_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("EVENT_CACHE_TTL", "600"))
+)
+
+
+def cache_stats() -> dict:
+    """Counters of every process-wide cache, keyed by cache name"""
+    return {cache.name: cache.stats() for cache in _caches}
@@ -0,0 +1,351 @@
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, delete, func, insert, literal, or_, select, tuple_, update
+from sqlalchemy.sql import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import CalibrationData, EyeTrackingData, RecordingCatalog, RecordingChunk, SessionCatalog, dialect_insert
+
+recording_catalog = RecordingCatalog.__table__
+session_catalog = SessionCatalog.__table__
+
+# Session listing: pages are ordered by (first_timestamp, session_id), see session_page_query
+SESSION_FIELDS = ("summary", "recordings")
+SESSION_ORDERS = ("desc", "asc")
+MAX_SESSION_PAGE_SIZE = 1000
+
+
+async def record_recording_ingest(db: AsyncSession, session_id: str, recording_number: int,
+                                  timestamps: Sequence[int], eye_sides: Sequence[str]) -> None:
+    """
+    Fold a batch of stored eye_tracking_data rows into the catalog. Runs in the caller's transaction.
+    """
+    if len(timestamps) == 0:
+        return
+
+    first_timestamp = int(min(timestamps))
+    last_timestamp = int(max(timestamps))
+    now = datetime.utcnow()
+
+    stmt = dialect_insert(db, recording_catalog).values(
+        session_id=session_id,
+        recording_number=recording_number,
+        data_points=len(timestamps),
+        first_timestamp=first_timestamp,
+        last_timestamp=last_timestamp,
+        duration=(last_timestamp - first_timestamp) // 1000,
+        has_left_eye='left' in eye_sides,
+        has_right_eye='right' in eye_sides,
+        updated_at=now
+    )
+    # Recordings can arrive in several batches: merge with the existing row
+    excluded = stmt.excluded
+    merged_first = case(
+        (excluded.first_timestamp < recording_catalog.c.first_timestamp, excluded.first_timestamp),
+        else_=recording_catalog.c.first_timestamp
+    )
+    merged_last = case(
+        (excluded.last_timestamp > recording_catalog.c.last_timestamp, excluded.last_timestamp),
+        else_=recording_catalog.c.last_timestamp
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[recording_catalog.c.session_id, recording_catalog.c.recording_number],
+        set_={
+            'data_points': recording_catalog.c.data_points + excluded.data_points,
+            'first_timestamp': merged_first,
+            'last_timestamp': merged_last,
+            'duration': (merged_last - merged_first) // 1000,
+            'has_left_eye': or_(recording_catalog.c.has_left_eye, excluded.has_left_eye),
+            'has_right_eye': or_(recording_catalog.c.has_right_eye, excluded.has_right_eye),
+            'updated_at': now
+        }
+    )
+    await db.execute(stmt)
+    await refresh_session(db, session_id)
+
+
+async def record_calibration_ingest(db: AsyncSession, session_id: str) -> None:
+    """
+    Flag a session as calibrated. Runs in the caller's transaction.
+    """
+    now = datetime.utcnow()
+    stmt = dialect_insert(db, session_catalog).values(
+        session_id=session_id,
+        total_recordings=0,
+        total_data_points=0,
+        has_calibration=True,
+        created_at=now,
+        updated_at=now
+    ).on_conflict_do_update(
+        index_elements=[session_catalog.c.session_id],
+        set_={'has_calibration': True, 'updated_at': now}
+    )
+    await db.execute(stmt)
+
+
+async def time_bounds(db: AsyncSession, session_id: str,
+                      recording_number: Optional[int] = None) -> Tuple[Optional[int], Optional[int]]:
+    """
+    First and last timestamps of a session, or of one of its recordings, (None, None) when unknown
+    """
+    if recording_number is None:
+        query = select(session_catalog.c.first_timestamp, session_catalog.c.last_timestamp).where(
+            session_catalog.c.session_id == session_id
+        )
+    else:
+        query = select(recording_catalog.c.first_timestamp, recording_catalog.c.last_timestamp).where(
+            recording_catalog.c.session_id == session_id,
+            recording_catalog.c.recording_number == recording_number
+        )
+    row = (await db.execute(query)).first()
+    return (row[0], row[1]) if row is not None else (None, None)
+
+
+async def recording_data_points(db: AsyncSession, session_id: str, recording_number: int) -> Optional[int]:
+    """
+    Number of stored rows of a recording, None when it is not in the catalog. Grows with every ingest,
+    so derived results can record it to detect that they are stale.
+    """
+    result = await db.execute(
+        select(recording_catalog.c.data_points).where(
+            recording_catalog.c.session_id == session_id,
+            recording_catalog.c.recording_number == recording_number
+        )
+    )
+    return result.scalar_one_or_none()
+
+
+async def refresh_session(db: AsyncSession, session_id: str) -> None:
+    """
+    Recompute a session's aggregates from its (few) recording catalog rows
+    """
+    now = datetime.utcnow()
+    await db.execute(
+        dialect_insert(db, session_catalog).values(
+            session_id=session_id,
+            total_recordings=0,
+            total_data_points=0,
+            has_calibration=False,
+            created_at=now,
+            updated_at=now
+        ).on_conflict_do_nothing(index_elements=[session_catalog.c.session_id])
+    )
+
+    def aggregate(expression):
+        return select(expression).where(recording_catalog.c.session_id == session_id).scalar_subquery()
+
+    await db.execute(
+        update(session_catalog).where(session_catalog.c.session_id == session_id).values(
+            total_recordings=aggregate(func.count()),
+            total_data_points=aggregate(func.coalesce(func.sum(recording_catalog.c.data_points), 0)),
+            first_timestamp=aggregate(func.min(recording_catalog.c.first_timestamp)),
+            last_timestamp=aggregate(func.max(recording_catalog.c.last_timestamp)),
+            updated_at=now
+        )
+    )
+
+
+async def remove_session_recordings(db: AsyncSession, session_id: str) -> None:
+    """
+    Drop a session's recordings from the catalog, keeping the session only if it is calibrated.
+    Runs in the caller's transaction.
+    """
+    await db.execute(delete(recording_catalog).where(recording_catalog.c.session_id == session_id))
+    await db.execute(
+        delete(session_catalog).where(
+            session_catalog.c.session_id == session_id,
+            session_catalog.c.has_calibration.is_(False)
+        )
+    )
+    await refresh_session_if_present(db, session_id)
+
+
+async def session_recording_numbers(db: AsyncSession, session_id: str) -> List[int]:
+    """Recording numbers of a session, in order"""
+    result = await db.execute(
+        select(recording_catalog.c.recording_number).where(
+            recording_catalog.c.session_id == session_id
+        ).order_by(recording_catalog.c.recording_number)
+    )
+    return list(result.scalars().all())
+
+
+async def refresh_session_if_present(db: AsyncSession, session_id: str) -> None:
+    result = await db.execute(select(session_catalog.c.session_id).where(session_catalog.c.session_id == session_id))
+    if result.first() is not None:
+        await refresh_session(db, session_id)
+
+
+async def rebuild_catalog(db: AsyncSession) -> dict:
+    """
+    Regenerate both catalog tables from the recording data (rows and packed chunks) and calibration_data
+    with set-based statements
+    """
+    now = datetime.utcnow()
+    await db.execute(delete(recording_catalog))
+    await db.execute(delete(session_catalog))
+
+    first_timestamp = func.min(EyeTrackingData.timestamp)
+    last_timestamp = func.max(EyeTrackingData.timestamp)
+    recordings = select(
+        EyeTrackingData.session_id,
+        EyeTrackingData.recording_number,
+        func.count(),
+        first_timestamp,
+        last_timestamp,
+        (last_timestamp - first_timestamp) // 1000,
+        func.max(case((EyeTrackingData.eye_side == 'left', 1), else_=0)) == 1,
+        func.max(case((EyeTrackingData.eye_side == 'right', 1), else_=0)) == 1,
+        literal(now)
+    ).where(
+        EyeTrackingData.recording_number.is_not(None)
+    ).group_by(
+        EyeTrackingData.session_id,
+        EyeTrackingData.recording_number
+    )
+    await db.execute(insert(recording_catalog).from_select([
+        'session_id', 'recording_number', 'data_points', 'first_timestamp', 'last_timestamp',
+        'duration', 'has_left_eye', 'has_right_eye', 'updated_at'
+    ], recordings))
+
+    # Packed recordings, aggregated from the per-chunk counters without decoding them
+    first_timestamp = func.min(RecordingChunk.first_timestamp)
+    last_timestamp = func.max(RecordingChunk.last_timestamp)
+    packed_recordings = select(
+        RecordingChunk.session_id,
+        RecordingChunk.recording_number,
+        func.sum(RecordingChunk.left_count + RecordingChunk.right_count),
+        first_timestamp,
+        last_timestamp,
+        (last_timestamp - first_timestamp) // 1000,
+        func.sum(RecordingChunk.left_count) > 0,
+        func.sum(RecordingChunk.right_count) > 0,
+        literal(now)
+    ).where(
+        ~select(recording_catalog.c.session_id).where(
+            recording_catalog.c.session_id == RecordingChunk.session_id,
+            recording_catalog.c.recording_number == RecordingChunk.recording_number
+        ).exists()
+    ).group_by(
+        RecordingChunk.session_id,
+        RecordingChunk.recording_number
+    )
+    await db.execute(insert(recording_catalog).from_select([
+        'session_id', 'recording_number', 'data_points', 'first_timestamp', 'last_timestamp',
+        'duration', 'has_left_eye', 'has_right_eye', 'updated_at'
+    ], packed_recordings))
+
+    calibrated = select(CalibrationData.session_id).where(
+        CalibrationData.session_id == recording_catalog.c.session_id
+    ).exists()
+    sessions = select(
+        recording_catalog.c.session_id,
+        func.count(),
+        func.sum(recording_catalog.c.data_points),
+        func.min(recording_catalog.c.first_timestamp),
+        func.max(recording_catalog.c.last_timestamp),
+        calibrated,
+        literal(now),
+        literal(now)
+    ).group_by(recording_catalog.c.session_id)
+    await db.execute(insert(session_catalog).from_select([
+        'session_id', 'total_recordings', 'total_data_points', 'first_timestamp', 'last_timestamp',
+        'has_calibration', 'created_at', 'updated_at'
+    ], sessions))
+
+    # Calibrated sessions without any recording yet
+    calibration_only = select(
+        CalibrationData.session_id,
+        literal(0),
+        literal(0),
+        literal(True),
+        literal(now),
+        literal(now)
+    ).where(
+        CalibrationData.session_id.not_in(select(session_catalog.c.session_id))
+    ).distinct()
+    await db.execute(insert(session_catalog).from_select([
+        'session_id', 'total_recordings', 'total_data_points', 'has_calibration', 'created_at', 'updated_at'
+    ], calibration_only))
+
+    await db.commit()
+
+    session_count = (await db.execute(select(func.count()).select_from(session_catalog))).scalar()
+    recording_count = (await db.execute(select(func.count()).select_from(recording_catalog))).scalar()
+    return {'sessions': session_count, 'recordings': recording_count}
+
+
+async def ensure_catalog(db: AsyncSession) -> Optional[dict]:
+    """
+    Build the catalog on first start against a database that predates it
+    """
+    catalog_row = await db.execute(select(recording_catalog.c.session_id).limit(1))
+    if catalog_row.first() is not None:
+        return None
+    data_row = await db.execute(select(EyeTrackingData.session_id).limit(1))
+    chunk_row = await db.execute(select(RecordingChunk.session_id).limit(1))
+    if data_row.first() is None and chunk_row.first() is None:
+        return None
+    return await rebuild_catalog(db)
+
+
+def encode_session_cursor(first_timestamp: int, session_id: str) -> str:
+    """Opaque cursor of the sessions after this one, in listing order"""
+    return base64.urlsafe_b64encode(json.dumps([first_timestamp, session_id]).encode()).decode().rstrip("=")
+
+
+def decode_session_cursor(cursor: str) -> Tuple[int, str]:
+    try:
+        first_timestamp, session_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if type(first_timestamp) is not int or not isinstance(session_id, str):
+            raise TypeError
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor: pass the next_cursor of the previous page")
+    return first_timestamp, session_id
+
+
+def validate_session_listing(limit: Optional[int], fields: Sequence[str], order: str) -> None:
+    """Raise ValueError for a page size out of range, unknown fields or an unknown order"""
+    if limit is not None and not 1 <= limit <= MAX_SESSION_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_SESSION_PAGE_SIZE}")
+    unknown = [field for field in fields if field not in SESSION_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"Unknown fields '{','.join(unknown)}'. Available fields: {', '.join(SESSION_FIELDS)}")
+    if order not in SESSION_ORDERS:
+        raise ValueError(f"Unknown order '{order}'. Available orders: {', '.join(SESSION_ORDERS)}")
+
+
+def session_page_query(limit: Optional[int] = None, cursor: Optional[str] = None,
+                       start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                       min_duration: Optional[int] = None, has_calibration: Optional[bool] = None,
+                       order: str = "desc") -> Select:
+    """
+    Catalog rows of one page of sessions with recordings, ordered by (first_timestamp, session_id) and
+    starting after the cursor: a range scan of idx_session_catalog_first_timestamp, whatever the page.
+    start_ts and end_ts bound the first timestamp (ms), min_duration the span of the session (s).
+    """
+    key = tuple_(session_catalog.c.first_timestamp, session_catalog.c.session_id)
+    query = select(session_catalog).where(session_catalog.c.first_timestamp.is_not(None))
+    if cursor is not None:
+        position = tuple_(*decode_session_cursor(cursor))
+        query = query.where(key < position if order == "desc" else key > position)
+    if start_ts is not None:
+        query = query.where(session_catalog.c.first_timestamp >= start_ts)
+    if end_ts is not None:
+        query = query.where(session_catalog.c.first_timestamp <= end_ts)
+    if min_duration is not None:
+        query = query.where(session_catalog.c.last_timestamp - session_catalog.c.first_timestamp >= min_duration * 1000)
+    if has_calibration is not None:
+        query = query.where(session_catalog.c.has_calibration.is_(has_calibration))
+
+    if order == "desc":
+        query = query.order_by(session_catalog.c.first_timestamp.desc(), session_catalog.c.session_id.desc())
+    else:
+        query = query.order_by(session_catalog.c.first_timestamp, session_catalog.c.session_id)
+    if limit is not None:
+        # One more row tells whether there is a next page
+        query = query.limit(limit + 1)
+    return query
@@ -0,0 +1,254 @@
+"""
+Maintenance commands for the eye tracking backend.
+
+Usage:
+    uv run python cli.py rebuild-catalog
+    uv run python cli.py rebuild-normalized [--all]
+    uv run python cli.py migrate-storage --to packed|rows [--session-id ID]
+    PARTITION_LAYOUT=hash|time uv run python cli.py partition-data [--keep-old]
+    uv run python cli.py reprocess [--targets normalized pyramids] [--all] [--workers N] [--checkpoint FILE]
+    uv run python cli.py export --format csv|parquet --output DIR [--session-id ID ...] [--start DATE] [--end DATE]
+    uv run python cli.py run-jobs
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from database import AsyncSessionLocal, Base, EyeTrackingData, engine, init_db
+from catalog import rebuild_catalog
+from derived import recompute_recording, stale_recordings
+from batch import DEFAULT_BATCH_SIZE, REPROCESS_TARGETS, Checkpoint, reprocess, reprocess_options
+from export import EXPORT_COLUMNS, EXPORT_FORMATS, export_session_ids, export_table, validate_export
+from normalization import NORMALIZATION_VERSION
+from partitioning import (PARTITION_LAYOUT, create_time_partitions, ensure_partitions, is_partitioned,
+                          is_partitioned_layout, months_between, table_exists)
+from services import EyeTrackingService
+from storage import STORAGES
+from workers import run_pending_jobs
+
+
+async def run_rebuild_catalog(args: argparse.Namespace) -> None:
+    await init_db()
+    async with AsyncSessionLocal() as db:
+        counts = await rebuild_catalog(db)
+    print(f"Catalog rebuilt: {counts['sessions']} sessions, {counts['recordings']} recordings")
+
+
+async def run_rebuild_normalized(args: argparse.Namespace) -> None:
+    await init_db()
+    async with AsyncSessionLocal() as db:
+        recordings = await stale_recordings(db, include_current=args.all)
+        service = EyeTrackingService(db)
+        stored_count = 0
+        for session_id, recording_number in recordings:
+            references = await service.get_calibration_references(session_id)
+            stored_count += await recompute_recording(db, session_id, recording_number, references)
+            # One transaction per recording, so an interrupted rebuild keeps its progress
+            await db.commit()
+    print(f"Normalized series rebuilt at version {NORMALIZATION_VERSION}: "
+          f"{len(recordings)} recordings, {stored_count} rows")
+
+
+async def run_migrate_storage(args: argparse.Namespace) -> None:
+    await init_db()
+    target = STORAGES[args.to]
+    recording_count, row_count = 0, 0
+    async with AsyncSessionLocal() as db:
+        service = EyeTrackingService(db)
+        for source in STORAGES.values():
+            if source is target:
+                continue
+            for session_id, recording_number in await source.recordings(db, args.session_id):
+                columns = await source.read_columns(db, session_id, recording_number)
+                await target.prepare(db, columns)
+                await source.delete_recording(db, session_id, recording_number)
+                await target.store(db, session_id, recording_number, columns)
+                # Recomputed from the rows as the target format returns them, like the raw fallback of playback
+                references = await service.get_calibration_references(session_id)
+                await recompute_recording(db, session_id, recording_number, references)
+                # One transaction per recording, so an interrupted migration keeps its progress
+                await db.commit()
+                recording_count += 1
+                row_count += len(columns['timestamp'])
+                print(f"Session {session_id}: moved recording #{recording_number} to {target.name} ({len(columns['timestamp'])} rows)")
+    print(f"Storage migrated to {target.name}: {recording_count} recordings, {row_count} rows")
+
+
+async def run_partition_data(args: argparse.Namespace) -> None:
+    if engine.dialect.name != "postgresql":
+        print("Partitioning is only supported on PostgreSQL")
+        return
+    if not is_partitioned_layout():
+        print("Set PARTITION_LAYOUT to hash or time")
+        return
+
+    table = EyeTrackingData.__tablename__
+    legacy = f"{table}_unpartitioned"
+    columns = ", ".join(column.name for column in EyeTrackingData.__table__.columns)
+
+    # Rename the heap table out of the way (once: an interrupted run resumes from here) and create the partitioned one
+    async with engine.begin() as conn:
+        if not await table_exists(conn, legacy):
+            if await is_partitioned(conn, table):
+                print(f"{table} is already partitioned")
+                return
+            await conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+            await conn.execute(text(f"ALTER TABLE {legacy} RENAME CONSTRAINT {table}_pkey TO {legacy}_pkey"))
+            for index in ("idx_session_timestamp", "idx_recording"):
+                await conn.execute(text(f"ALTER INDEX IF EXISTS {index} RENAME TO {legacy}_{index}"))
+        await conn.run_sync(Base.metadata.create_all)
+        await ensure_partitions(conn, table)
+        if PARTITION_LAYOUT == "time":
+            bounds = (await conn.execute(text(f"SELECT min(timestamp), max(timestamp) FROM {legacy}"))).first()
+            if bounds[0] is not None:
+                await create_time_partitions(conn, table, months_between(bounds[0], bounds[1]))
+
+    async with engine.connect() as conn:
+        sessions = (await conn.execute(text(f"SELECT DISTINCT session_id FROM {legacy} ORDER BY session_id"))).scalars().all()
+
+    # One transaction per session; rows copied by an interrupted run are skipped
+    copied_count = 0
+    for i, session_id in enumerate(sessions, 1):
+        async with engine.begin() as conn:
+            result = await conn.execute(text(
+                f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {legacy} WHERE session_id = :session_id "
+                f"ON CONFLICT DO NOTHING"
+            ), {"session_id": session_id})
+        copied_count += result.rowcount
+        print(f"[{i}/{len(sessions)}] Session {session_id}: {result.rowcount} rows")
+
+    async with engine.begin() as conn:
+        legacy_count = (await conn.execute(text(f"SELECT count(*) FROM {legacy}"))).scalar()
+        partitioned_count = (await conn.execute(text(f"SELECT count(*) FROM {table}"))).scalar()
+        if partitioned_count < legacy_count:
+            print(f"Only {partitioned_count} of {legacy_count} rows were copied, keeping {legacy}")
+            return
+        if not args.keep_old:
+            await conn.execute(text(f"DROP TABLE {legacy}"))
+        await conn.execute(text(f"ANALYZE {table}"))
+    print(f"{table} partitioned by {PARTITION_LAYOUT}: {copied_count} rows copied"
+          f"{f', previous table kept as {legacy}' if args.keep_old else ''}")
+
+
+async def run_reprocess(args: argparse.Namespace) -> None:
+    try:
+        checkpoint = Checkpoint(args.checkpoint, reprocess_options(args.targets, args.all), restart=args.restart)
+    except ValueError as e:
+        raise SystemExit(f"{e}: rerun with --restart to ignore it")
+    await init_db()
+    async with AsyncSessionLocal() as db:
+        # Pyramids are rebuilt for every recording, normalized series only where outdated unless --all:
+        # the workers skip the up-to-date ones
+        recordings = await stale_recordings(db, include_current=args.all or "pyramids" in args.targets)
+    if args.session_id:
+        recordings = [recording for recording in recordings if recording[0] in args.session_id]
+    # Connections of the parent are not used while the workers run
+    await engine.dispose()
+
+    print(f"Reprocessing {', '.join(args.targets)} of {len(recordings)} recordings with {args.workers} workers")
+    started = time.perf_counter()
+    # The pool blocks until done: run it off the event loop
+    recording_count, row_count = await asyncio.get_running_loop().run_in_executor(
+        None, reprocess, recordings, args.targets, args.workers, args.batch_size, checkpoint, args.all
+    )
+    elapsed = time.perf_counter() - started
+    print(f"Reprocessed {recording_count} recordings, {row_count} normalized rows in {elapsed:.1f}s")
+    # A complete run needs no resuming
+    checkpoint.clear()
+
+
+def parse_timestamp(text: str) -> int:
+    """Frame timestamp (ms) from a number of milliseconds or an ISO date, UTC unless it has an offset"""
+    if text.lstrip("-").isdigit():
+        return int(text)
+    moment = datetime.fromisoformat(text)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+async def run_export(args: argparse.Namespace) -> None:
+    for table in args.table:
+        validate_export(table, args.format)
+    os.makedirs(args.output, exist_ok=True)
+    async with AsyncSessionLocal() as db:
+        session_ids = await export_session_ids(db, args.session_id, args.start, args.end)
+        for table in args.table:
+            path = os.path.join(args.output, f"{table}{EXPORT_FORMATS[args.format][1]}")
+            with open(path, "wb") as output:
+                async for data in export_table(db, table, args.format, session_ids, args.start, args.end):
+                    output.write(data)
+            print(f"Exported {table} of {len(session_ids)} sessions to {path} ({os.path.getsize(path)} bytes)")
+
+
+async def run_jobs(args: argparse.Namespace) -> None:
+    await init_db()
+    started = time.perf_counter()
+    count = await run_pending_jobs()
+    print(f"Ran {count} jobs in {time.perf_counter() - started:.1f}s")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Eye tracking backend maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = subparsers.add_parser("rebuild-catalog", help="Regenerate the session/recording catalog from raw data")
+    rebuild.set_defaults(handler=run_rebuild_catalog)
+
+    normalized = subparsers.add_parser("rebuild-normalized", help="Recompute stored normalized series that are missing or outdated")
+    normalized.add_argument("--all", action="store_true", help="Also recompute series that are up to date")
+    normalized.set_defaults(handler=run_rebuild_normalized)
+
+    migrate = subparsers.add_parser("migrate-storage", help="Move recordings to the rows or packed storage format")
+    migrate.add_argument("--to", required=True, choices=list(STORAGES), help="Target storage format")
+    migrate.add_argument("--session-id", help="Only migrate this session")
+    migrate.set_defaults(handler=run_migrate_storage)
+
+    partition = subparsers.add_parser("partition-data", help="Move eye_tracking_data to the PARTITION_LAYOUT partitioned layout (PostgreSQL)")
+    partition.add_argument("--keep-old", action="store_true", help="Keep the unpartitioned table instead of dropping it")
+    partition.set_defaults(handler=run_partition_data)
+
+    reprocessing = subparsers.add_parser("reprocess", help="Recompute derived results of historical recordings across worker processes")
+    reprocessing.add_argument("--targets", nargs="+", default=list(REPROCESS_TARGETS), choices=list(REPROCESS_TARGETS), help="Derived results to recompute")
+    reprocessing.add_argument("--all", action="store_true", help="Also recompute normalized series that are up to date")
+    reprocessing.add_argument("--session-id", nargs="+", help="Only reprocess these sessions")
+    reprocessing.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes, one per core by default")
+    reprocessing.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Recordings per worker transaction")
+    reprocessing.add_argument("--checkpoint", default="reprocess.checkpoint", help="File recording finished recordings, to resume an interrupted run")
+    reprocessing.add_argument("--restart", action="store_true", help="Ignore the checkpoint of a previous run")
+    reprocessing.set_defaults(handler=run_reprocess)
+
+    export = subparsers.add_parser("export", help="Export recording and calibration rows to gzip CSV or Parquet files")
+    export.add_argument("--format", default="csv", choices=list(EXPORT_FORMATS), help="Output format")
+    export.add_argument("--output", required=True, help="Directory the files are written to, one per table")
+    export.add_argument("--table", nargs="+", default=list(EXPORT_COLUMNS), choices=list(EXPORT_COLUMNS), help="Tables to export")
+    export.add_argument("--session-id", nargs="+", help="Only export these sessions")
+    export.add_argument("--start", type=parse_timestamp, help="First frame timestamp, in ms or as an ISO date")
+    export.add_argument("--end", type=parse_timestamp, help="Last frame timestamp, in ms or as an ISO date")
+    export.set_defaults(handler=run_export)
+
+    jobs = subparsers.add_parser("run-jobs", help="Run the due background jobs in this process, without the API")
+    jobs.set_defaults(handler=run_jobs)
+
+    return parser
+
+
+async def run(args: argparse.Namespace) -> None:
+    try:
+        await args.handler(args)
+    finally:
+        # Close pooled connections, whose driver threads would otherwise keep the process alive
+        await engine.dispose()
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
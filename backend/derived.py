@@ -0,0 +1,203 @@
+"""
+Normalized X series precomputed from the recording data and the session calibration.
+
+normalized_series holds one row per frame with the normalized value of each eye (NULL where
+that eye is missing or cannot be normalized). normalized_series_status marks the recordings
+whose rows are complete, and the NORMALIZATION_VERSION they were computed with: readers only
+use the stored series when that version is current, and fall back to normalizing raw rows.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import case, delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import NormalizedSeries, NormalizedSeriesStatus, RecordingCatalog, dialect_insert
+from ingest import EYE_COLUMNS, bulk_insert
+from storage import recording_storage
+from normalization import NORMALIZATION_VERSION, CalibrationReference, EyeArrays, normalized_values
+
+normalized_series = NormalizedSeries.__table__
+normalized_series_status = NormalizedSeriesStatus.__table__
+
+
+def normalized_columns(session_id: str, recording_number: int, columns: Dict[str, list],
+                       references: Dict[str, Optional[CalibrationReference]]) -> Dict[str, list]:
+    """
+    Turn recording column batches (see ingest.positions_to_columns) into normalized_series
+    column batches, one row per timestamp
+    """
+    timestamps = np.array(columns['timestamp'], dtype=np.int64)
+    eye_sides = np.array(columns['eye_side'])
+    coordinates = np.array([columns[column] for column in EYE_COLUMNS], dtype=np.float64).reshape(len(EYE_COLUMNS), -1).T
+
+    frames = np.unique(timestamps)
+    derived = {}
+    for eye_side in ('left', 'right'):
+        values = np.full(len(frames), np.nan)
+        reference = references.get(eye_side)
+        mask = eye_sides == eye_side
+        if reference is not None and mask.any():
+            eye = EyeArrays(
+                timestamps=timestamps[mask],
+                iris=coordinates[mask, 0:3],
+                corner_left=coordinates[mask, 3:6],
+                corner_right=coordinates[mask, 6:9],
+            )
+            values[np.searchsorted(frames, eye.timestamps)] = normalized_values(eye, reference)
+        # NaN (missing eye or landmarks) is stored as NULL
+        derived[f'{eye_side}_x'] = [None if np.isnan(value) else value for value in values.tolist()]
+
+    row_count = len(frames)
+    return {
+        'session_id': [session_id] * row_count,
+        'recording_number': [recording_number] * row_count,
+        'timestamp': frames.tolist(),
+        'left_x': derived['left_x'],
+        'right_x': derived['right_x'],
+        'version': [NORMALIZATION_VERSION] * row_count,
+    }
+
+
+async def store_normalized(db: AsyncSession, session_id: str, recording_number: int, columns: Dict[str, list],
+                           references: Dict[str, Optional[CalibrationReference]]) -> int:
+    """
+    Store the normalized series of a batch of recording rows and mark the recording as covered.
+    Runs in the caller's transaction.
+    """
+    derived = normalized_columns(session_id, recording_number, columns, references)
+    await bulk_insert(db, normalized_series, derived)
+    row_count = len(derived['timestamp'])
+
+    now = datetime.utcnow()
+    stmt = dialect_insert(db, normalized_series_status).values(
+        session_id=session_id,
+        recording_number=recording_number,
+        version=NORMALIZATION_VERSION,
+        data_points=row_count,
+        updated_at=now
+    )
+    # A batch appended to a recording computed with another formula keeps the recording stale
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[normalized_series_status.c.session_id, normalized_series_status.c.recording_number],
+        set_={
+            'version': case(
+                (normalized_series_status.c.version == excluded.version, excluded.version),
+                else_=-1
+            ),
+            'data_points': normalized_series_status.c.data_points + excluded.data_points,
+            'updated_at': now
+        }
+    )
+    await db.execute(stmt)
+    return row_count
+
+
+async def remove_normalized(db: AsyncSession, session_id: str, recording_number: Optional[int] = None) -> None:
+    """
+    Drop the normalized series of a session, or of one of its recordings. Runs in the caller's transaction.
+    """
+    series_where = [normalized_series.c.session_id == session_id]
+    status_where = [normalized_series_status.c.session_id == session_id]
+    if recording_number is not None:
+        series_where.append(normalized_series.c.recording_number == recording_number)
+        status_where.append(normalized_series_status.c.recording_number == recording_number)
+    await db.execute(delete(normalized_series).where(*series_where))
+    await db.execute(delete(normalized_series_status).where(*status_where))
+
+
+async def recompute_recording(db: AsyncSession, session_id: str, recording_number: int,
+                              references: Dict[str, Optional[CalibrationReference]]) -> int:
+    """
+    Replace the normalized series of one recording, computed from its raw rows. Runs in the caller's transaction.
+    """
+    await remove_normalized(db, session_id, recording_number)
+    if all(reference is None for reference in references.values()):
+        return 0
+
+    storage = await recording_storage(db, session_id, recording_number)
+    columns = await storage.read_columns(db, session_id, recording_number)
+    if not columns['timestamp']:
+        return 0
+
+    return await store_normalized(db, session_id, recording_number, columns, references)
+
+
+async def normalized_version(db: AsyncSession, session_id: str, recording_number: int) -> Optional[int]:
+    """Formula version of a recording's stored series, None if it has none"""
+    result = await db.execute(
+        select(normalized_series_status.c.version).where(
+            normalized_series_status.c.session_id == session_id,
+            normalized_series_status.c.recording_number == recording_number
+        )
+    )
+    return result.scalar()
+
+
+async def can_extend_normalized(db: AsyncSession, session_id: str, recording_number: int, batch_rows: int) -> bool:
+    """
+    Whether the normalized series of a batch just stored (batch_rows rows, already in the catalog) can be appended
+    to the recording's stored series: only if it has one, or if the batch is all the recording holds. Otherwise
+    the stored series would cover the batch alone while claiming the recording.
+    """
+    if await normalized_version(db, session_id, recording_number) is not None:
+        return True
+    result = await db.execute(
+        select(RecordingCatalog.data_points).where(
+            RecordingCatalog.session_id == session_id,
+            RecordingCatalog.recording_number == recording_number
+        )
+    )
+    return (result.scalar() or 0) <= batch_rows
+
+
+async def has_current_normalized(db: AsyncSession, session_id: str, recording_number: int) -> bool:
+    return await normalized_version(db, session_id, recording_number) == NORMALIZATION_VERSION
+
+
+def normalized_series_query(session_id: str, recording_number: int, eye_side: str,
+                            start_ts: Optional[int] = None, end_ts: Optional[int] = None):
+    """
+    Timestamps and stored normalized values of one eye of a recording, ordered by timestamp.
+    A range scan of the (session_id, recording_number, timestamp) primary key.
+    """
+    value = normalized_series.c[f'{eye_side}_x']
+    query = select(normalized_series.c.timestamp, value).where(
+        normalized_series.c.session_id == session_id,
+        normalized_series.c.recording_number == recording_number,
+        value.is_not(None)
+    ).order_by(normalized_series.c.timestamp)
+
+    if start_ts is not None:
+        query = query.where(normalized_series.c.timestamp >= start_ts)
+    if end_ts is not None:
+        query = query.where(normalized_series.c.timestamp <= end_ts)
+    return query
+
+
+def series_from_rows(rows: Sequence[tuple]) -> Tuple[np.ndarray, np.ndarray]:
+    """(timestamp, value) rows to (timestamps, values) arrays"""
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    timestamps, values = zip(*rows)
+    return np.array(timestamps, dtype=np.int64), np.array(values, dtype=np.float64)
+
+
+async def stale_recordings(db: AsyncSession, include_current: bool = False) -> List[Tuple[str, int]]:
+    """
+    (session_id, recording_number) of the recordings whose normalized series is missing or
+    was computed with another formula version, or of every recording with include_current
+    """
+    query = select(RecordingCatalog.session_id, RecordingCatalog.recording_number).outerjoin(
+        NormalizedSeriesStatus,
+        (NormalizedSeriesStatus.session_id == RecordingCatalog.session_id)
+        & (NormalizedSeriesStatus.recording_number == RecordingCatalog.recording_number)
+    ).order_by(RecordingCatalog.session_id, RecordingCatalog.recording_number)
+    if not include_current:
+        query = query.where(
+            (NormalizedSeriesStatus.version.is_(None)) | (NormalizedSeriesStatus.version != NORMALIZATION_VERSION)
+        )
+    result = await db.execute(query)
+    return [tuple(row) for row in result.all()]
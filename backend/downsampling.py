@@ -0,0 +1,109 @@
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+
+# Answered from the recording pyramid (see pyramid.py), so a default zoom never reads the whole range
+DEFAULT_DOWNSAMPLER = "minmax"
+MIN_POINTS = 3
+MAX_POINTS = 100000
+
+
+def lttb(timestamps: np.ndarray, values: np.ndarray, max_points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Largest-Triangle-Three-Buckets: keep the first and last samples, and in each of max_points - 2
+    equal-count buckets the sample forming the largest triangle with the previously kept sample and
+    the average of the next bucket
+    """
+    n = len(values)
+    if n <= max_points:
+        return timestamps, values
+
+    x = (timestamps - timestamps[0]).astype(np.float64)
+    y = values.astype(np.float64, copy=False)
+    bucket_count = max_points - 2
+
+    # Bucket i covers [edges[i], edges[i + 1]) of the samples between the first and the last one
+    edges = (np.arange(bucket_count + 1) * ((n - 2) / bucket_count)).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    # Average of each bucket, and of the last sample as the bucket after the last one
+    cumulative_x = np.concatenate(([0.0], np.cumsum(x)))
+    cumulative_y = np.concatenate(([0.0], np.cumsum(y)))
+    sizes = edges[1:] - edges[:-1]
+    average_x = np.append((cumulative_x[edges[1:]] - cumulative_x[edges[:-1]]) / sizes, x[-1])
+    average_y = np.append((cumulative_y[edges[1:]] - cumulative_y[edges[:-1]]) / sizes, y[-1])
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(bucket_count):
+        start, end = edges[i], edges[i + 1]
+        bucket_x = x[start:end]
+        bucket_y = y[start:end]
+        # Twice the triangle area, the constant factor does not change the argmax
+        areas = np.abs((x[a] - average_x[i + 1]) * (bucket_y - y[a]) - (x[a] - bucket_x) * (average_y[i + 1] - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+
+    return timestamps[selected], values[selected]
+
+
+def minmax(timestamps: np.ndarray, values: np.ndarray, max_points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Min/max bucketing: split the series into max_points // 2 equal-count buckets and keep the
+    minimum and maximum sample of each, in time order
+    """
+    n = len(values)
+    if n <= max_points:
+        return timestamps, values
+
+    bucket_count = max_points // 2
+    size = -(-n // bucket_count)  # Ceiling division
+    bucket_count = -(-n // size)
+
+    padded = np.full(bucket_count * size, np.nan)
+    padded[:n] = values
+    buckets = padded.reshape(bucket_count, size)
+    offsets = np.arange(bucket_count) * size
+    lowest = offsets + np.nanargmin(buckets, axis=1)
+    highest = offsets + np.nanargmax(buckets, axis=1)
+
+    selected = np.unique(np.concatenate((lowest, highest)))
+    return timestamps[selected], values[selected]
+
+
+def mean(timestamps: np.ndarray, values: np.ndarray, max_points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Bucket averaging: split the series into max_points equal-count buckets and keep the mean of each,
+    at the middle of the bucket's time span
+    """
+    n = len(values)
+    if n <= max_points:
+        return timestamps, values
+
+    edges = (np.arange(max_points + 1) * (n / max_points)).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    sums = np.add.reduceat(values.astype(np.float64, copy=False), starts)
+    return (timestamps[starts] + timestamps[ends - 1]) // 2, sums / (ends - starts)
+
+
+DOWNSAMPLERS: Dict[str, Callable[[np.ndarray, np.ndarray, int], Tuple[np.ndarray, np.ndarray]]] = {
+    "lttb": lttb,
+    "minmax": minmax,
+    "mean": mean,
+}
+
+
+def validate_downsampler(method: str, max_points: int) -> None:
+    if method not in DOWNSAMPLERS:
+        raise ValueError(f"Unknown downsampling method '{method}', expected one of: {', '.join(DOWNSAMPLERS)}")
+    if max_points < MIN_POINTS or max_points > MAX_POINTS:
+        raise ValueError(f"max_points must be between {MIN_POINTS} and {MAX_POINTS}")
+
+
+def downsample(timestamps: np.ndarray, values: np.ndarray, max_points: int,
+               method: str = DEFAULT_DOWNSAMPLER) -> Tuple[np.ndarray, np.ndarray]:
+    """Reduce a series to at most max_points samples while preserving its visual shape"""
+    validate_downsampler(method, max_points)
+    return DOWNSAMPLERS[method](timestamps, values, max_points)
@@ -0,0 +1,258 @@
+"""
+Eye movement events of a recording, detected on the normalized X series of one eye.
+
+Samples whose landmarks are missing or degenerate (corner to corner width collapsed below
+DEGENERATE_WIDTH_RATIO of the recording median, as when the eyelid closes), and stretches with
+no sample for more than GAP_INTERVAL_FACTOR times the usual interval, are a loss of signal:
+a blink when it lasts between blink_min_ms and blink_max_ms, a gap otherwise. The valid
+samples between losses form segments, classified with one of:
+
+    ivt  velocity threshold: samples moving faster than velocity_threshold (normalized units
+         per second) are saccadic, runs of slower samples lasting min_fixation_ms are fixations
+    idt  dispersion threshold: maximal windows of at least min_fixation_ms whose values spread
+         over at most dispersion_threshold are fixations, the samples between them saccades
+
+Both run in O(n log n) array operations: I-DT finds the longest window starting at every
+sample at once, by doubling over min/max tables.
+"""
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from normalization import EyeArrays, iris_corner_distances
+from resampling import DEFAULT_MAX_GAP_MS, validate_resampling
+
+EVENT_METHODS = ("ivt", "idt")
+EVENT_TYPES = ("fixation", "saccade", "blink", "gap")
+
+# Normalized units: -1 and 1 are the iris at the eye corners, about a 60 degree field
+DEFAULT_EVENT_METHOD = "ivt"
+DEFAULT_VELOCITY_THRESHOLD = 1.0
+DEFAULT_DISPERSION_THRESHOLD = 0.05
+DEFAULT_MIN_FIXATION_MS = 100
+DEFAULT_BLINK_MIN_MS = 50
+DEFAULT_BLINK_MAX_MS = 500
+
+# Consecutive samples further apart than this many median intervals are a loss of signal
+GAP_INTERVAL_FACTOR = 2.5
+# Eye width below this fraction of the recording median marks degenerate landmarks
+DEGENERATE_WIDTH_RATIO = 0.2
+
+
+@dataclass(frozen=True)
+class EventParameters:
+    method: str = DEFAULT_EVENT_METHOD
+    velocity_threshold: float = DEFAULT_VELOCITY_THRESHOLD
+    dispersion_threshold: float = DEFAULT_DISPERSION_THRESHOLD
+    min_fixation_ms: int = DEFAULT_MIN_FIXATION_MS
+    blink_min_ms: int = DEFAULT_BLINK_MIN_MS
+    blink_max_ms: int = DEFAULT_BLINK_MAX_MS
+    # Detect on the landmarks resampled to this rate, see resampling.py
+    resample_hz: Optional[float] = None
+    max_gap_ms: int = DEFAULT_MAX_GAP_MS
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def validate_event_parameters(parameters: EventParameters) -> None:
+    """Raise ValueError for an unknown method or out-of-range thresholds"""
+    if parameters.method not in EVENT_METHODS:
+        raise ValueError(f"Unknown event detection method '{parameters.method}'. Available methods: {', '.join(EVENT_METHODS)}")
+    if parameters.velocity_threshold <= 0:
+        raise ValueError("velocity_threshold must be positive")
+    if parameters.dispersion_threshold <= 0:
+        raise ValueError("dispersion_threshold must be positive")
+    if parameters.min_fixation_ms < 0:
+        raise ValueError("min_fixation_ms must not be negative")
+    if not 0 <= parameters.blink_min_ms <= parameters.blink_max_ms:
+        raise ValueError("blink_min_ms must be between 0 and blink_max_ms")
+    validate_resampling(parameters.resample_hz, parameters.max_gap_ms)
+
+
+def invalid_samples(eye: EyeArrays, values: np.ndarray) -> np.ndarray:
+    """Samples that cannot be normalized or whose eye corners have collapsed onto each other"""
+    invalid = ~np.isfinite(values)
+    widths = iris_corner_distances(eye.corner_left, eye.corner_right)
+    finite = np.isfinite(widths)
+    if finite.any():
+        invalid |= ~finite | (widths <= DEGENERATE_WIDTH_RATIO * np.median(widths[finite]))
+    return invalid
+
+
+def _signal_losses(timestamps: np.ndarray, invalid: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Indexes of the valid samples, whether each one starts a new segment, and (start_ts, end_ts)
+    of every loss of signal: from the last valid sample before it to the first one after, or to
+    the edge of the recording
+    """
+    n = len(timestamps)
+    valid = np.flatnonzero(~invalid)
+    if len(valid) == 0:
+        losses = np.array([[timestamps[0], timestamps[-1]]]) if n else np.empty((0, 2), dtype=np.int64)
+        return valid, np.empty(0, dtype=bool), losses
+
+    intervals = np.diff(timestamps[valid])
+    positive = intervals[intervals > 0]
+    gap_threshold = GAP_INTERVAL_FACTOR * np.median(positive) if len(positive) else np.inf
+    breaks = (np.diff(valid) > 1) | (intervals > gap_threshold)
+
+    before, after = valid[:-1][breaks], valid[1:][breaks]
+    losses = [np.stack((timestamps[before], timestamps[after]), axis=1)]
+    if valid[0] > 0:
+        losses.insert(0, np.array([[timestamps[0], timestamps[valid[0]]]]))
+    if valid[-1] < n - 1:
+        losses.append(np.array([[timestamps[valid[-1]], timestamps[-1]]]))
+
+    starts = np.concatenate(([True], breaks))
+    return valid, starts, np.concatenate(losses).astype(np.int64)
+
+
+def _sample_speeds(timestamps: np.ndarray, values: np.ndarray, segment_starts: np.ndarray) -> np.ndarray:
+    """
+    Absolute velocity of each sample, in normalized units per second: from the previous sample of
+    its segment, or to the next one for the first sample of a segment. 0 for isolated samples.
+    """
+    seconds = np.diff(timestamps) / 1000.0
+    steps = np.full(len(seconds), np.nan)
+    moving = (seconds > 0) & ~segment_starts[1:]
+    steps[moving] = np.abs(np.diff(values)[moving]) / seconds[moving]
+    steps[~moving & ~segment_starts[1:]] = 0.0
+
+    incoming = np.concatenate(([np.nan], steps))
+    outgoing = np.concatenate((steps, [np.nan]))
+    speeds = np.where(segment_starts, outgoing, incoming)
+    return np.nan_to_num(speeds, nan=0.0)
+
+
+def _segment_ends(segment_starts: np.ndarray) -> np.ndarray:
+    """Exclusive end index of the segment of every sample"""
+    m = len(segment_starts)
+    boundaries = np.append(np.flatnonzero(segment_starts), m)
+    segment = np.cumsum(segment_starts) - 1
+    return boundaries[segment + 1]
+
+
+def _longest_windows(values: np.ndarray, limits: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    For every sample i, the largest end such that values[i:end] spreads over at most threshold,
+    with end <= limits[i]. Doubles over tables of the min and max of every 2**k samples.
+    """
+    m = len(values)
+    highest, lowest = [values], [values]
+    width = 1
+    while 2 * width <= m:
+        highest.append(np.maximum(highest[-1][:-width], highest[-1][width:]))
+        lowest.append(np.minimum(lowest[-1][:-width], lowest[-1][width:]))
+        width *= 2
+
+    ends = np.arange(1, m + 1)
+    high, low = values.copy(), values.copy()
+    for k in reversed(range(len(highest))):
+        width = 1 << k
+        fits = ends + width <= limits
+        index = np.where(fits, ends, 0)
+        new_high = np.maximum(high, highest[k][index])
+        new_low = np.minimum(low, lowest[k][index])
+        extend = fits & (new_high - new_low <= threshold)
+        ends = np.where(extend, ends + width, ends)
+        high = np.where(extend, new_high, high)
+        low = np.where(extend, new_low, low)
+    return ends
+
+
+def _idt_fixations(timestamps: np.ndarray, values: np.ndarray, segment_starts: np.ndarray,
+                   parameters: EventParameters) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fixation mask of the samples and first sample of each fixation, from the longest low-dispersion
+    window at each sample, taken greedily
+    """
+    m = len(values)
+    ends = _longest_windows(values, _segment_ends(segment_starts), parameters.dispersion_threshold)
+    candidates = timestamps[ends - 1] - timestamps >= parameters.min_fixation_ms
+
+    # next_candidate[i]: first candidate window start at or after i, m if none
+    next_candidate = np.where(candidates, np.arange(m), m)
+    next_candidate = np.append(np.minimum.accumulate(next_candidate[::-1])[::-1], m)
+
+    fixation_starts = []
+    start = next_candidate[0]
+    while start < m:
+        fixation_starts.append(start)
+        start = next_candidate[ends[start]]
+    fixation_starts = np.array(fixation_starts, dtype=np.int64)
+
+    coverage = np.zeros(m + 1, dtype=np.int64)
+    np.add.at(coverage, fixation_starts, 1)
+    np.add.at(coverage, ends[fixation_starts], -1)
+    return np.cumsum(coverage[:m]) > 0, fixation_starts
+
+
+def detect_events(eye: EyeArrays, values: np.ndarray, parameters: EventParameters) -> Dict[str, object]:
+    """
+    Fixations, saccades, blinks and gaps of one eye of a recording, from its samples and their
+    normalized values (NaN where they cannot be normalized). Returns the events ordered by
+    start_ts and a per-type summary.
+    """
+    timestamps = eye.timestamps
+    valid, segment_starts, losses = _signal_losses(timestamps, invalid_samples(eye, values))
+    t, x = timestamps[valid], values[valid]
+    speeds = _sample_speeds(t, x, segment_starts) if len(valid) else np.empty(0)
+
+    if parameters.method == "idt" and len(valid):
+        fixation, fixation_starts = _idt_fixations(t, x, segment_starts, parameters)
+    else:
+        fixation, fixation_starts = speeds <= parameters.velocity_threshold, np.empty(0, dtype=np.int64)
+    run_starts = segment_starts | np.concatenate(([True], fixation[1:] != fixation[:-1]))[:len(t)]
+    # A fixation ending right where the next one starts is still two fixations
+    run_starts[fixation_starts] = True
+
+    events: List[dict] = []
+    starts = np.flatnonzero(run_starts)
+    if len(starts):
+        ends = np.append(starts[1:], len(t))
+        is_fixation = fixation[starts]
+        durations = t[ends - 1] - t[starts]
+        high = np.maximum.reduceat(x, starts)
+        low = np.minimum.reduceat(x, starts)
+        means = np.add.reduceat(x, starts) / (ends - starts)
+        peaks = np.maximum.reduceat(speeds, starts)
+
+        kept = ~is_fixation | (durations >= parameters.min_fixation_ms)
+        for run in np.flatnonzero(kept).tolist():
+            event = {
+                'type': 'fixation' if is_fixation[run] else 'saccade',
+                'start_ts': int(t[starts[run]]),
+                'end_ts': int(t[ends[run] - 1]),
+                'duration_ms': int(durations[run]),
+                'samples': int(ends[run] - starts[run]),
+            }
+            if is_fixation[run]:
+                event['mean_x'] = float(means[run])
+                event['dispersion'] = float(high[run] - low[run])
+            else:
+                event['amplitude'] = float(high[run] - low[run])
+                event['peak_velocity'] = float(peaks[run])
+            events.append(event)
+
+    for start_ts, end_ts in losses.tolist():
+        duration = end_ts - start_ts
+        is_blink = parameters.blink_min_ms <= duration <= parameters.blink_max_ms
+        events.append({
+            'type': 'blink' if is_blink else 'gap',
+            'start_ts': start_ts,
+            'end_ts': end_ts,
+            'duration_ms': duration,
+        })
+
+    events.sort(key=lambda event: event['start_ts'])
+    return {'events': events, 'summary': summarize_events(events)}
+
+
+def summarize_events(events: List[dict]) -> Dict[str, dict]:
+    summary = {event_type: {'count': 0, 'total_ms': 0} for event_type in EVENT_TYPES}
+    for event in events:
+        summary[event['type']]['count'] += 1
+        summary[event['type']]['total_ms'] += event['duration_ms']
+    return summary
@@ -0,0 +1,181 @@
+"""
+Bulk export of recording and calibration rows, as gzip CSV or Parquet.
+
+Sessions are selected by id, or by a frame timestamp range overlapping their catalog bounds, or
+all of them. Recording rows come from every storage format and are restricted to the range;
+calibration rows of the selected sessions are exported whole, since they are needed to normalize
+any part of a recording.
+
+Rows are read session by session through server-side cursors and encoded EXPORT_ROW_GROUP_SIZE
+rows at a time: one gzip member flush or one Parquet row group per group, handed to the caller
+as bytes, so memory stays bounded whatever the export size.
+"""
+import csv
+import io
+import os
+import zlib
+from typing import AsyncIterator, Iterable, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import CalibrationData, SessionCatalog
+from ingest import EYE_COLUMNS
+from storage import STORAGES
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
+
+EXPORT_ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", "50000"))
+
+EXPORT_FORMATS = {
+    "csv": ("application/gzip", ".csv.gz"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+}
+
+EXPORT_COLUMNS = {
+    "eye_tracking_data": ["session_id", "recording_number", "timestamp", "eye_side", "confidence", *EYE_COLUMNS],
+    "calibration_data": ["session_id", "timestamp", "eye_side", "gaze_direction", "calibration_point_index", "confidence", *EYE_COLUMNS],
+}
+
+_INTEGER_COLUMNS = {"recording_number", "timestamp", "calibration_point_index"}
+_STRING_COLUMNS = {"session_id", "eye_side", "gaze_direction"}
+
+
+def validate_export(table: str, export_format: str) -> None:
+    """Raise ValueError for an unknown table or format, or Parquet without pyarrow"""
+    if table not in EXPORT_COLUMNS:
+        raise ValueError(f"Unknown export table '{table}'. Available tables: {', '.join(EXPORT_COLUMNS)}")
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{export_format}'. Available formats: {', '.join(EXPORT_FORMATS)}")
+    if export_format == "parquet" and pa is None:
+        raise ValueError("Parquet export requires pyarrow (uv sync --extra arrow)")
+
+
+async def export_session_ids(db: AsyncSession, session_ids: Optional[Sequence[str]] = None,
+                             start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> List[str]:
+    """Sessions to export: the given ones, or those of the catalog overlapping [start_ts, end_ts]"""
+    query = select(SessionCatalog.session_id).order_by(SessionCatalog.session_id)
+    if session_ids:
+        query = query.where(SessionCatalog.session_id.in_(list(session_ids)))
+    if start_ts is not None:
+        query = query.where(SessionCatalog.last_timestamp >= start_ts)
+    if end_ts is not None:
+        query = query.where(SessionCatalog.first_timestamp <= end_ts)
+    result = await db.execute(query)
+    return list(result.scalars().all())
+
+
+async def stream_table_rows(db: AsyncSession, table: str, session_ids: Iterable[str],
+                            start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                            chunk_size: int = EXPORT_ROW_GROUP_SIZE) -> AsyncIterator[List[tuple]]:
+    """Rows of one export table, in EXPORT_COLUMNS order, in batches of at most chunk_size"""
+    for session_id in session_ids:
+        if table == "calibration_data":
+            query = select(*[getattr(CalibrationData, column) for column in EXPORT_COLUMNS[table]]).where(
+                CalibrationData.session_id == session_id
+            ).order_by(CalibrationData.timestamp, CalibrationData.eye_side, CalibrationData.gaze_direction)
+            result = await db.stream(query.execution_options(yield_per=chunk_size))
+            async for rows in result.partitions():
+                yield rows
+            continue
+
+        for storage in STORAGES.values():
+            async for rows in storage.stream_export(db, session_id, start_ts, end_ts, chunk_size):
+                yield [(session_id, *row) for row in rows]
+
+
+async def _row_groups(batches: AsyncIterator[List[tuple]], size: int) -> AsyncIterator[List[tuple]]:
+    """Regroup row batches of any size into groups of size rows, the last one shorter"""
+    pending: List[tuple] = []
+    async for rows in batches:
+        pending.extend(rows)
+        while len(pending) >= size:
+            yield pending[:size]
+            pending = pending[size:]
+    if pending:
+        yield pending
+
+
+class _ByteSink(io.RawIOBase):
+    """Write-only file collecting bytes until taken, which keeps counting positions across takes"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _arrow_schema(table: str):
+    fields = []
+    for column in EXPORT_COLUMNS[table]:
+        if column in _STRING_COLUMNS:
+            fields.append(pa.field(column, pa.string()))
+        elif column in _INTEGER_COLUMNS:
+            fields.append(pa.field(column, pa.int64()))
+        else:
+            fields.append(pa.field(column, pa.float64()))
+    return pa.schema(fields)
+
+
+async def encode_csv_gzip(table: str, groups: AsyncIterator[List[tuple]]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    text = io.StringIO()
+    writer = csv.writer(text, lineterminator="\n")
+    writer.writerow(EXPORT_COLUMNS[table])
+    async for rows in groups:
+        writer.writerows(rows)
+        data = compressor.compress(text.getvalue().encode())
+        text.seek(0)
+        text.truncate()
+        if data:
+            yield data
+    yield compressor.compress(text.getvalue().encode()) + compressor.flush()
+
+
+async def encode_parquet(table: str, groups: AsyncIterator[List[tuple]]) -> AsyncIterator[bytes]:
+    schema = _arrow_schema(table)
+    sink = _ByteSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    async for rows in groups:
+        columns = list(zip(*rows))
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+            schema=schema
+        ))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+async def export_table(db: AsyncSession, table: str, export_format: str, session_ids: Iterable[str],
+                       start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                       row_group_size: int = EXPORT_ROW_GROUP_SIZE) -> AsyncIterator[bytes]:
+    """Encoded bytes of one export table, one row group at a time"""
+    validate_export(table, export_format)
+    batches = stream_table_rows(db, table, session_ids, start_ts, end_ts, row_group_size)
+    groups = _row_groups(batches, row_group_size)
+    encode = encode_parquet if export_format == "parquet" else encode_csv_gzip
+    async for data in encode(table, groups):
+        if data:
+            yield data
@@ -0,0 +1,227 @@
+import bisect
+import math
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from metrics import timed
+
+# Windows are centered: a window of size w covers w // 2 samples on each side
+# of the current one, and is truncated at the edges of the recording.
+DEFAULT_FILTER = "moving_average"
+DEFAULT_WINDOW = 3
+MAX_WINDOW = 10001
+
+# Polynomial order of the Savitzky-Golay fit
+SAVGOL_POLYORDER = 2
+
+# The running median reduces a sliding window view up to this window size, and
+# keeps a sorted window above it, where copying every window costs O(n * w)
+_MEDIAN_VIEW_MAX_WINDOW = 32
+# Rows of the sliding window view reduced at once, to bound the temporary copy
+# np.median makes
+_MEDIAN_BLOCK_ROWS = 4096
+
+
+def moving_average(values: np.ndarray, window: int = DEFAULT_WINDOW) -> np.ndarray:
+    """Centered moving average through cumulative sums, O(n) whatever the window"""
+    n = len(values)
+    if n < window:
+        return values.copy()
+
+    half = window // 2
+    cumulative = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    index = np.arange(n)
+    start = np.maximum(index - half, 0)
+    end = np.minimum(index + half + 1, n)
+    return (cumulative[end] - cumulative[start]) / (end - start)
+
+
+def running_median(values: np.ndarray, window: int = DEFAULT_WINDOW) -> np.ndarray:
+    """
+    Centered running median. Narrow windows are reduced over a sliding window view; wider ones
+    keep the window sorted and update it in O(log w) comparisons per sample.
+    """
+    n = len(values)
+    if n < window:
+        return values.copy()
+    if window <= _MEDIAN_VIEW_MAX_WINDOW:
+        return _running_median_view(values, window)
+    return _running_median_sorted(values, window)
+
+
+def _running_median_view(values: np.ndarray, window: int) -> np.ndarray:
+    n = len(values)
+    half = window // 2
+    size = 2 * half + 1
+    smoothed = np.empty(n, dtype=np.float64)
+
+    if n >= size:
+        windows = sliding_window_view(values, size)
+        for start in range(0, len(windows), _MEDIAN_BLOCK_ROWS):
+            block = windows[start:start + _MEDIAN_BLOCK_ROWS]
+            smoothed[half + start:half + start + len(block)] = np.median(block, axis=1)
+
+    # Truncated windows at both edges
+    for i in list(range(min(half, n))) + list(range(max(n - half, half), n)):
+        smoothed[i] = np.median(values[max(i - half, 0):i + half + 1])
+    return smoothed
+
+
+def _running_median_sorted(values: np.ndarray, window: int) -> np.ndarray:
+    n = len(values)
+    half = window // 2
+    samples = values.tolist()
+    smoothed = np.empty(n, dtype=np.float64)
+
+    sorted_window = sorted(samples[:half])
+    for i in range(n):
+        if i + half < n:
+            bisect.insort(sorted_window, samples[i + half])
+        if i - half - 1 >= 0:
+            del sorted_window[bisect.bisect_left(sorted_window, samples[i - half - 1])]
+        middle = len(sorted_window) // 2
+        if len(sorted_window) % 2:
+            smoothed[i] = sorted_window[middle]
+        else:
+            smoothed[i] = 0.5 * (sorted_window[middle - 1] + sorted_window[middle])
+    return smoothed
+
+
+def exponential_moving_average(values: np.ndarray, window: int = DEFAULT_WINDOW,
+                               initial: Optional[float] = None) -> np.ndarray:
+    """
+    Exponential moving average with alpha = 2 / (window + 1), starting from `initial`
+    (the first sample by default). Evaluated in closed form over blocks, carrying the state between them.
+    """
+    n = len(values)
+    alpha = 2.0 / (window + 1)
+    if n == 0 or alpha >= 1:
+        return values.astype(np.float64, copy=True)
+
+    decay = 1.0 - alpha
+    # Largest block for which decay ** -block stays far from float64 overflow
+    block_size = int(min(4096, max(1, 150 * math.log(10) / -math.log(decay))))
+    powers = decay ** np.arange(block_size + 1)
+    inverse_powers = 1.0 / powers[:block_size]
+
+    smoothed = np.empty(n, dtype=np.float64)
+    state = float(values[0]) if initial is None else float(initial)
+    for start in range(0, n, block_size):
+        block = values[start:start + block_size]
+        k = len(block)
+        # y_i = decay^(i+1) * state + alpha * sum_j<=i decay^(i-j) * x_j
+        weighted = np.cumsum(block * inverse_powers[:k])
+        smoothed[start:start + k] = powers[1:k + 1] * state + alpha * powers[:k] * weighted
+        state = smoothed[start + k - 1]
+    return smoothed
+
+
+def savitzky_golay(values: np.ndarray, window: int = DEFAULT_WINDOW, polyorder: int = SAVGOL_POLYORDER) -> np.ndarray:
+    """
+    Savitzky-Golay smoothing: a convolution in the interior, and the polynomial fitted on the
+    first/last full window evaluated at the edges
+    """
+    n = len(values)
+    half = window // 2
+    size = 2 * half + 1
+    if size <= polyorder:
+        raise ValueError(f"Savitzky-Golay window must be larger than the polynomial order ({polyorder})")
+    if n < size:
+        return values.copy()
+
+    offsets = np.arange(-half, half + 1, dtype=np.float64)
+    vandermonde = np.vander(offsets, polyorder + 1, increasing=True)
+    fit = np.linalg.pinv(vandermonde)  # (polyorder + 1, size), maps a window to polynomial coefficients
+
+    smoothed = np.empty(n, dtype=np.float64)
+    smoothed[half:n - half] = np.convolve(values, fit[0][::-1], mode='valid')
+
+    if half:
+        head = np.vander(offsets[:half], polyorder + 1, increasing=True) @ (fit @ values[:size])
+        tail = np.vander(offsets[half + 1:], polyorder + 1, increasing=True) @ (fit @ values[n - size:])
+        smoothed[:half] = head
+        smoothed[n - half:] = tail
+    return smoothed
+
+
+FILTERS: Dict[str, Callable[..., np.ndarray]] = {
+    "moving_average": moving_average,
+    "median": running_median,
+    "ema": exponential_moving_average,
+    "savgol": savitzky_golay,
+}
+
+
+def validate_filter(filter_name: str, window: int) -> None:
+    if filter_name not in FILTERS:
+        raise ValueError(f"Unknown filter '{filter_name}', expected one of: {', '.join(FILTERS)}")
+    if window < 1 or window > MAX_WINDOW:
+        raise ValueError(f"Filter window must be between 1 and {MAX_WINDOW}")
+    if filter_name == "savgol" and 2 * (window // 2) + 1 <= SAVGOL_POLYORDER:
+        raise ValueError(f"Savitzky-Golay window must be larger than the polynomial order ({SAVGOL_POLYORDER})")
+
+
+@timed("smoothing")
+def apply_filter(values: np.ndarray, filter_name: str = DEFAULT_FILTER, window: int = DEFAULT_WINDOW) -> np.ndarray:
+    """Smooth a normalized series with one of the FILTERS"""
+    validate_filter(filter_name, window)
+    return FILTERS[filter_name](np.asarray(values, dtype=np.float64), window)
+
+
+class ChunkedFilter:
+    """
+    Apply one of the FILTERS to a series delivered in chunks, with the same output as apply_filter
+    on the whole series.
+
+    Centered filters hold back the last window // 2 samples of each chunk until the samples after
+    them arrive, and keep one window of context before the first sample still to be emitted. The
+    exponential moving average is causal and only carries its last output.
+    """
+
+    def __init__(self, filter_name: str = DEFAULT_FILTER, window: int = DEFAULT_WINDOW):
+        validate_filter(filter_name, window)
+        self._filter = FILTERS[filter_name]
+        self._window = window
+        self._half = window // 2
+        self._recursive = filter_name == "ema"
+        self._state: Optional[float] = None
+        self._timestamps = np.empty(0, dtype=np.int64)
+        self._values = np.empty(0, dtype=np.float64)
+        self._offset = 0   # Series index of self._values[0]
+        self._emitted = 0  # Series index of the next sample to emit
+
+    @timed("smoothing")
+    def push(self, timestamps: np.ndarray, values: np.ndarray, final: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """Add a chunk and return the (timestamps, smoothed values) that are now final"""
+        values = np.asarray(values, dtype=np.float64)
+        if self._recursive:
+            if len(values) == 0:
+                return timestamps, values
+            smoothed = exponential_moving_average(values, self._window, initial=self._state)
+            self._state = smoothed[-1]
+            return timestamps, smoothed
+
+        buffered_timestamps = np.concatenate((self._timestamps, timestamps))
+        buffered_values = np.concatenate((self._values, values))
+        end = self._offset + len(buffered_values)
+        emit_end = end if final else end - self._half
+        if not final and len(buffered_values) < 2 * self._half + 1:
+            # Filters return short series unchanged, wait for a full window
+            emit_end = self._emitted
+
+        emitted_timestamps = buffered_timestamps[:0]
+        emitted_values = buffered_values[:0]
+        if emit_end > self._emitted:
+            smoothed = self._filter(buffered_values, self._window)
+            emitted_timestamps = buffered_timestamps[self._emitted - self._offset:emit_end - self._offset]
+            emitted_values = smoothed[self._emitted - self._offset:emit_end - self._offset]
+            self._emitted = emit_end
+
+        # Keep a full window of context before the next sample to emit
+        new_offset = max(0, min(self._emitted - self._half, end - (2 * self._half + 1)), self._offset)
+        self._timestamps = buffered_timestamps[new_offset - self._offset:]
+        self._values = buffered_values[new_offset - self._offset:]
+        self._offset = new_offset
+        return emitted_timestamps, emitted_values
@@ -0,0 +1,209 @@
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import Table, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Set BULK_INGEST=false to fall back to the per-row ORM ingest path
+BULK_INGEST = os.getenv("BULK_INGEST", "true").lower() not in ("0", "false", "no")
+
+# Rows per multi-row INSERT statement. asyncpg caps a statement at 32767 bind
+# parameters and a calibration row has 16 columns, so stay well below that.
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "1000"))
+
+# Coordinate columns shared by eye_tracking_data and calibration_data, in the
+# order produced by eye_values()
+EYE_COLUMNS = [
+    'iris_x', 'iris_y', 'iris_z',
+    'corner_left_x', 'corner_left_y', 'corner_left_z',
+    'corner_right_x', 'corner_right_y', 'corner_right_z',
+]
+
+EYE_KEYS = (('left', 'leftEye'), ('right', 'rightEye'))
+
+
+@dataclass
+class IngestStats:
+    table: str
+    rows: int
+    statements: Optional[int]  # None for the ORM path, where the unit of work issues the statements
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self) -> str:
+        statements = f" in {self.statements} statements" if self.statements is not None else ""
+        return f"{self.table}: {self.rows} rows{statements}, {self.seconds:.3f}s ({self.rows_per_second:.0f} rows/s)"
+
+
+def eye_values(eye: dict) -> list:
+    """Flatten an eye dict into the 9 coordinate values of EYE_COLUMNS"""
+    center = eye.get('center') or {}
+    corners = eye.get('corners') or []
+    left_corner = corners[0] if len(corners) > 0 else {}
+    right_corner = corners[1] if len(corners) > 1 else {}
+    return [
+        center.get('x'), center.get('y'), center.get('z'),
+        left_corner.get('x'), left_corner.get('y'), left_corner.get('z'),
+        right_corner.get('x'), right_corner.get('y'), right_corner.get('z'),
+    ]
+
+
+def eye_dict(values: List[Optional[float]]) -> dict:
+    """Rebuild an eye dict from the 9 coordinate values of EYE_COLUMNS, the inverse of eye_values()"""
+    return {
+        'center': {'x': values[0], 'y': values[1], 'z': values[2]},
+        'corners': [
+            {'x': values[3], 'y': values[4], 'z': values[5]},
+            {'x': values[6], 'y': values[7], 'z': values[8]},
+        ]
+    }
+
+
+def positions_to_columns(session_id: str, recording_number: int, positions: List[dict]) -> Dict[str, list]:
+    """
+    Turn a recording payload into column batches for eye_tracking_data, one row per eye per frame
+    """
+    timestamps, eye_sides, confidences, coordinates = [], [], [], []
+
+    for position in positions:
+        for eye_side, key in EYE_KEYS:
+            eye = position.get(key)
+            if not eye:
+                continue
+            timestamps.append(position.get('timestamp'))
+            eye_sides.append(eye_side)
+            confidences.append(position.get('confidence'))
+            coordinates.append(eye_values(eye))
+
+    row_count = len(timestamps)
+    columns = {
+        'session_id': [session_id] * row_count,
+        'timestamp': timestamps,
+        'eye_side': eye_sides,
+        'recording_number': [recording_number] * row_count,
+    }
+    columns.update(zip(EYE_COLUMNS, _transpose(coordinates)))
+    columns['confidence'] = confidences
+    columns['created_at'] = [datetime.utcnow()] * row_count
+    return columns
+
+
+def columnar_to_columns(session_id: str, recording_number: int, timestamps: Sequence[int],
+                        confidences: Optional[Sequence[Optional[float]]],
+                        eyes: Dict[str, Optional[Dict[str, Sequence[Optional[float]]]]]) -> Dict[str, list]:
+    """
+    Turn a columnar recording payload (one array per frame field, see ColumnarRecordingData in main.py)
+    into column batches for eye_tracking_data, in the same row order as positions_to_columns. Arrays are
+    checked and converted as a whole; an eye is missing from a frame when all its coordinates are null.
+    """
+    frame_count = len(timestamps)
+    frame_timestamps = np.asarray(timestamps, dtype=np.int64)
+    if confidences is None:
+        frame_confidences = np.full(frame_count, np.nan)
+    else:
+        if len(confidences) != frame_count:
+            raise ValueError(f"confidence has {len(confidences)} values for {frame_count} timestamps")
+        frame_confidences = np.asarray(confidences, dtype=np.float64)
+
+    presence, coordinates = [], []
+    for eye_side, _ in EYE_KEYS:
+        eye = eyes.get(eye_side)
+        if eye is None:
+            presence.append(np.zeros(frame_count, dtype=bool))
+            coordinates.append(np.full((len(EYE_COLUMNS), frame_count), np.nan))
+            continue
+        for column in EYE_COLUMNS:
+            if len(eye[column]) != frame_count:
+                raise ValueError(f"{eye_side}.{column} has {len(eye[column])} values for {frame_count} timestamps")
+        values = np.asarray([eye[column] for column in EYE_COLUMNS], dtype=np.float64).reshape(len(EYE_COLUMNS), frame_count)
+        missing = np.isnan(values)
+        present = ~missing.any(axis=0)
+        if (missing.any(axis=0) & ~missing.all(axis=0)).any():
+            raise ValueError(f"{eye_side} eye coordinates must be all null or all set in a frame")
+        presence.append(present)
+        coordinates.append(values)
+
+    # Frame-major, left before right, like positions_to_columns
+    frame_index, eye_index = np.nonzero(np.stack(presence, axis=1))
+    row_count = len(frame_index)
+    samples = np.stack(coordinates)[eye_index, :, frame_index]
+    row_confidences = frame_confidences[frame_index]
+
+    columns = {
+        'session_id': [session_id] * row_count,
+        'timestamp': frame_timestamps[frame_index].tolist(),
+        'eye_side': [EYE_KEYS[index][0] for index in eye_index.tolist()],
+        'recording_number': [recording_number] * row_count,
+    }
+    columns.update(zip(EYE_COLUMNS, samples.T.tolist() if row_count else _transpose([])))
+    columns['confidence'] = [None if np.isnan(value) else value for value in row_confidences.tolist()]
+    columns['created_at'] = [datetime.utcnow()] * row_count
+    return columns
+
+
+def calibration_to_columns(session_id: str, calibration_points: List[dict]) -> Dict[str, list]:
+    """
+    Turn a calibration payload into column batches for calibration_data, one row per eye per point
+    """
+    timestamps, eye_sides, gaze_directions, confidences, point_indexes, coordinates = [], [], [], [], [], []
+
+    for i, point in enumerate(calibration_points):
+        for eye_side, key in EYE_KEYS:
+            eye = point.get(key)
+            if not eye:
+                continue
+            timestamps.append(point.get('timestamp'))
+            eye_sides.append(eye_side)
+            gaze_directions.append(point.get('gaze_direction', 'center'))  # Default to center if not specified
+            confidences.append(point.get('confidence'))
+            point_indexes.append(i)
+            coordinates.append(eye_values(eye))
+
+    row_count = len(timestamps)
+    columns = {
+        'session_id': [session_id] * row_count,
+        'timestamp': timestamps,
+        'eye_side': eye_sides,
+        'gaze_direction': gaze_directions,
+    }
+    columns.update(zip(EYE_COLUMNS, _transpose(coordinates)))
+    columns['confidence'] = confidences
+    columns['calibration_point_index'] = point_indexes
+    columns['created_at'] = [datetime.utcnow()] * row_count
+    return columns
+
+
+def _transpose(rows: List[list]) -> List[list]:
+    if not rows:
+        return [[] for _ in EYE_COLUMNS]
+    return [list(column) for column in zip(*rows)]
+
+
+def column_length(columns: Dict[str, list]) -> int:
+    return len(next(iter(columns.values()), []))
+
+
+async def bulk_insert(db: AsyncSession, table: Table, columns: Dict[str, list],
+                      chunk_size: Optional[int] = None) -> int:
+    """
+    Write column batches with one multi-row INSERT per chunk and return the number of statements.
+    The caller owns the transaction.
+    """
+    chunk_size = chunk_size or INGEST_CHUNK_SIZE
+    names = list(columns)
+    row_count = column_length(columns)
+    statements = 0
+
+    for start in range(0, row_count, chunk_size):
+        end = min(start + chunk_size, row_count)
+        rows = [dict(zip(names, values)) for values in zip(*(columns[name][start:end] for name in names))]
+        await db.execute(insert(table).values(rows))
+        statements += 1
+
+    return statements
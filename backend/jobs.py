@@ -0,0 +1,243 @@
+"""
+Queue of the post-ingest processing of recordings, kept in the jobs table.
+
+Ingest enqueues jobs in its own transaction, so that a stored recording always has its jobs, and
+returns without waiting for them. The worker pool of workers.py claims queued jobs, runs them
+and records their result. A job that fails is queued again after a growing delay until it has run
+JOB_MAX_ATTEMPTS times. A job left running longer than JOB_LEASE_SECONDS (its worker process
+died) can be claimed again.
+
+Claiming is a conditional UPDATE on the status and attempts read just before, which only one
+worker wins, so several processes can share the queue on PostgreSQL as well as on SQLite.
+
+    normalize  recompute the normalized series (see derived.py)
+    pyramid    build the downsampling pyramids of both eyes (see pyramid.py)
+    stats      whole-recording statistics of both eyes, raw and smoothed (see range_stats.py)
+    events     fixations, saccades and blinks of both eyes with the default parameters (see events.py)
+"""
+import asyncio
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence
+
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Job
+
+JOB_KINDS = ("normalize", "pyramid", "stats", "events")
+JOB_STATUSES = ("queued", "running", "succeeded", "failed")
+
+# Concurrent jobs per process
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Delay before the first retry of a failed job, doubled at every further attempt (seconds)
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "5"))
+# Idle workers look for due jobs this often, and right away when jobs are enqueued by this process (seconds)
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+# A running job not finished after this long is claimed again (seconds)
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))
+# Jobs enqueued for every stored recording, besides normalization when the calibration changes
+INGEST_JOBS = [kind.strip() for kind in os.getenv("INGEST_JOBS", "pyramid,stats,events").split(",") if kind.strip()]
+
+# Candidates read per claim, so that workers racing for the first one still find another
+CLAIM_CANDIDATES = 10
+
+jobs = Job.__table__
+
+# Wake-up events of the running worker pools, set by notify_workers
+_wakeups: List[asyncio.Event] = []
+
+
+def validate_job_kinds(kinds: Sequence[str]) -> None:
+    unknown = [kind for kind in kinds if kind not in JOB_KINDS]
+    if unknown:
+        raise ValueError(f"Unknown job kinds: {', '.join(unknown)}. Available job kinds: {', '.join(JOB_KINDS)}")
+
+
+validate_job_kinds(INGEST_JOBS)
+
+
+def job_dict(row, include_result: bool = False) -> dict:
+    """API representation of a jobs row"""
+    job = {
+        'id': row.id,
+        'kind': row.kind,
+        'session_id': row.session_id,
+        'recording_number': row.recording_number,
+        'status': row.status,
+        'attempts': row.attempts,
+        'max_attempts': row.max_attempts,
+        'error': row.error,
+        'run_after': row.run_after.isoformat() if row.run_after else None,
+        'created_at': row.created_at.isoformat() if row.created_at else None,
+        'started_at': row.started_at.isoformat() if row.started_at else None,
+        'finished_at': row.finished_at.isoformat() if row.finished_at else None,
+    }
+    if include_result:
+        job['result'] = json.loads(row.result) if row.result is not None else None
+    return job
+
+
+async def enqueue_jobs(db: AsyncSession, session_id: str, recording_number: int, kinds: Sequence[str]) -> List[str]:
+    """
+    Queue jobs of the given kinds for a recording and return their ids. A job of the same kind still
+    waiting for its first run is reused instead of queued twice. Runs in the caller's transaction:
+    call notify_workers after the commit.
+    """
+    validate_job_kinds(kinds)
+    if not kinds:
+        return []
+
+    result = await db.execute(
+        select(jobs.c.kind, jobs.c.id).where(
+            jobs.c.session_id == session_id,
+            jobs.c.recording_number == recording_number,
+            jobs.c.kind.in_(list(kinds)),
+            jobs.c.status == "queued",
+            jobs.c.attempts == 0
+        )
+    )
+    ids = dict(result.all())
+
+    now = datetime.utcnow()
+    new_jobs = []
+    for kind in kinds:
+        if kind not in ids:
+            ids[kind] = str(uuid.uuid4())
+            new_jobs.append({
+                'id': ids[kind],
+                'kind': kind,
+                'session_id': session_id,
+                'recording_number': recording_number,
+                'status': "queued",
+                'attempts': 0,
+                'max_attempts': JOB_MAX_ATTEMPTS,
+                'run_after': now,
+                'created_at': now,
+            })
+    if new_jobs:
+        await db.execute(insert(jobs), new_jobs)
+    return [ids[kind] for kind in kinds]
+
+
+def add_wakeup(wakeup: asyncio.Event) -> None:
+    _wakeups.append(wakeup)
+
+
+def remove_wakeup(wakeup: asyncio.Event) -> None:
+    if wakeup in _wakeups:
+        _wakeups.remove(wakeup)
+
+
+def notify_workers() -> None:
+    """Wake the idle workers of this process up, after jobs were committed"""
+    for wakeup in _wakeups:
+        wakeup.set()
+
+
+async def claim_job(db: AsyncSession) -> Optional[dict]:
+    """
+    Mark the next due job running and return it (id, kind, session_id, recording_number, attempts),
+    or None when no job is due. Commits.
+    """
+    now = datetime.utcnow()
+    expired = now - timedelta(seconds=JOB_LEASE_SECONDS)
+    result = await db.execute(
+        select(jobs.c.id, jobs.c.kind, jobs.c.session_id, jobs.c.recording_number, jobs.c.status,
+               jobs.c.attempts, jobs.c.max_attempts).where(
+            or_(
+                and_(jobs.c.status == "queued", jobs.c.run_after <= now),
+                and_(jobs.c.status == "running", jobs.c.started_at < expired)
+            )
+        ).order_by(jobs.c.run_after).limit(CLAIM_CANDIDATES)
+    )
+    for candidate in result.all():
+        claimed = and_(jobs.c.id == candidate.id, jobs.c.status == candidate.status, jobs.c.attempts == candidate.attempts)
+        if candidate.attempts >= candidate.max_attempts:
+            # Its last attempt never finished
+            await db.execute(update(jobs).where(claimed).values(
+                status="failed", error="Lease expired on the last attempt", finished_at=now
+            ))
+            await db.commit()
+            continue
+
+        won = await db.execute(update(jobs).where(claimed).values(
+            status="running", attempts=candidate.attempts + 1, started_at=now, finished_at=None
+        ))
+        await db.commit()
+        if won.rowcount == 1:
+            return {
+                'id': candidate.id,
+                'kind': candidate.kind,
+                'session_id': candidate.session_id,
+                'recording_number': candidate.recording_number,
+                'attempts': candidate.attempts + 1,
+                'max_attempts': candidate.max_attempts,
+            }
+    return None
+
+
+async def complete_job(db: AsyncSession, job: dict, result: dict) -> None:
+    """
+    Record the result of a job. Commits, together with whatever the job wrote in the same session.
+    """
+    await db.execute(update(jobs).where(jobs.c.id == job['id'], jobs.c.attempts == job['attempts']).values(
+        status="succeeded", result=json.dumps(result), error=None, finished_at=datetime.utcnow()
+    ))
+    await db.commit()
+
+
+async def fail_job(db: AsyncSession, job: dict, error: str) -> str:
+    """
+    Queue a failed job again after the retry delay, or mark it failed on its last attempt.
+    Commits, and returns the new status.
+    """
+    now = datetime.utcnow()
+    if job['attempts'] < job['max_attempts']:
+        values = {'status': "queued", 'run_after': now + timedelta(seconds=JOB_RETRY_DELAY * 2 ** (job['attempts'] - 1))}
+    else:
+        values = {'status': "failed", 'finished_at': now}
+    await db.execute(update(jobs).where(jobs.c.id == job['id'], jobs.c.attempts == job['attempts']).values(
+        error=error, **values
+    ))
+    await db.commit()
+    return values['status']
+
+
+async def get_job(db: AsyncSession, job_id: str) -> Optional[dict]:
+    """A job with its result, None if it does not exist"""
+    result = await db.execute(select(jobs).where(jobs.c.id == job_id))
+    row = result.first()
+    return job_dict(row, include_result=True) if row is not None else None
+
+
+async def has_pending_job(db: AsyncSession, session_id: str, recording_number: int, kind: str) -> bool:
+    """Whether a job of this kind is queued or running for the recording"""
+    result = await db.execute(
+        select(jobs.c.id).where(
+            jobs.c.session_id == session_id,
+            jobs.c.recording_number == recording_number,
+            jobs.c.kind == kind,
+            jobs.c.status.in_(["queued", "running"])
+        ).limit(1)
+    )
+    return result.first() is not None
+
+
+async def recording_jobs(db: AsyncSession, session_id: str, recording_number: int) -> List[dict]:
+    """Jobs of a recording without their results, most recent first"""
+    result = await db.execute(
+        select(jobs).where(
+            jobs.c.session_id == session_id,
+            jobs.c.recording_number == recording_number
+        ).order_by(jobs.c.created_at.desc(), jobs.c.kind)
+    )
+    return [job_dict(row) for row in result.all()]
+
+
+async def remove_jobs(db: AsyncSession, session_id: str) -> None:
+    """Drop the jobs of a session. Runs in the caller's transaction."""
+    await db.execute(delete(jobs).where(jobs.c.session_id == session_id))
@@ -0,0 +1,87 @@
+import asyncio
+import os
+from typing import List, Optional
+
+from database import AsyncSessionLocal
+from services import EyeTrackingService
+
+# Frames written per transaction while a recording is streamed
+LIVE_INGEST_BATCH_SIZE = int(os.getenv("LIVE_INGEST_BATCH_SIZE", "300"))
+# Batches allowed to wait for the writer before the receiving side blocks
+LIVE_INGEST_MAX_PENDING_BATCHES = int(os.getenv("LIVE_INGEST_MAX_PENDING_BATCHES", "4"))
+
+
+class RecordingStreamWriter:
+    """
+    Batched, back-pressured writer for a recording streamed in small pieces.
+
+    Frames are buffered until a batch is full, and batches go through a bounded queue to a single
+    writer task that stores them with its own database session. When the database falls behind,
+    add() blocks on the full queue, which stops reading from the client. Memory per recorder stays
+    bounded by batch_size * (max_pending + 1) frames. The post-ingest jobs of the recording (see
+    jobs.py) are enqueued once the last batch is stored, rather than for every batch.
+    """
+
+    def __init__(self, session_id: str, recording_number: int,
+                 batch_size: int = LIVE_INGEST_BATCH_SIZE, max_pending: int = LIVE_INGEST_MAX_PENDING_BATCHES):
+        self.session_id = session_id
+        self.recording_number = recording_number
+        self.batch_size = batch_size
+        self.received = 0
+        self.stored = 0
+        self.job_ids: List[str] = []
+        self.error: Optional[Exception] = None
+        self._buffer: List[dict] = []
+        self._queue: "asyncio.Queue[Optional[List[dict]]]" = asyncio.Queue(maxsize=max_pending)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def add(self, positions: List[dict]) -> None:
+        self._raise_on_error()
+        self.received += len(positions)
+        self._buffer.extend(positions)
+        while len(self._buffer) >= self.batch_size:
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            await self._queue.put(batch)
+
+    async def close(self) -> int:
+        """Flush the buffered frames, wait for every pending batch and return the number of stored rows"""
+        if self._buffer:
+            await self._queue.put(self._buffer)
+            self._buffer = []
+        await self._queue.put(None)
+        if self._task is not None:
+            await self._task
+        self._raise_on_error()
+        return self.stored
+
+    async def _run(self) -> None:
+        async with AsyncSessionLocal() as db:
+            service = EyeTrackingService(db)
+            while True:
+                batch = await self._queue.get()
+                if batch is None:
+                    break
+                if self.error is not None:
+                    continue  # Keep draining so that add() never blocks on a dead writer
+                try:
+                    self.stored += await service.store_recording_data(self.session_id, self.recording_number, batch,
+                                                                      queue_jobs=False)
+                except Exception as e:
+                    print(f"Session {self.session_id}: Live ingest of recording #{self.recording_number} failed: {str(e)}")
+                    await db.rollback()
+                    self.error = e
+            # Post-ingest jobs run once, on the whole recording
+            if self.stored and self.error is None:
+                try:
+                    self.job_ids = await service.enqueue_recording_jobs(self.session_id, self.recording_number)
+                except Exception as e:
+                    # The frames are stored: only their derived results are missing
+                    print(f"Session {self.session_id}: Enqueueing the jobs of recording #{self.recording_number} failed: {str(e)}")
+                    await db.rollback()
+
+    def _raise_on_error(self) -> None:
+        if self.error is not None:
+            raise RuntimeError(f"Recording writer failed: {self.error}")
@@ -1,14 +1,33 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, TypeAdapter, ValidationError
 from typing import List, Optional
 import uuid
 from datetime import datetime
 import json
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db, init_db
+from database import get_db, init_db, AsyncSessionLocal
+from ingest import columnar_to_columns
+from catalog import MAX_SESSION_PAGE_SIZE, SESSION_FIELDS, SESSION_ORDERS, ensure_catalog
+from cache import cache_stats
+from metrics import METRICS_MEDIA_TYPE, MetricsMiddleware, render_metrics
+from live_ingest import RecordingStreamWriter
+from jobs import get_job, recording_jobs
+from workers import JobWorkerPool
+from normalization import eye_arrays_from_positions, normalize_eye
+from serialization import (JSON_MEDIA_TYPE, NDJSON_MEDIA_TYPE, OCTET_STREAM_MEDIA_TYPE, RECORDING_MEDIA_TYPE, decode_recording,
+                           negotiate_series_format, encode_series_as, encode_series_ndjson, encode_ndjson)
 from services import EyeTrackingService
+from filters import DEFAULT_FILTER, DEFAULT_WINDOW, FILTERS, validate_filter
+from downsampling import DEFAULT_DOWNSAMPLER, DOWNSAMPLERS
+from range_stats import parse_percentiles
+from resampling import DEFAULT_MAX_GAP_MS
+from export import EXPORT_COLUMNS, EXPORT_FORMATS, export_session_ids, export_table, validate_export
+from events import (DEFAULT_BLINK_MAX_MS, DEFAULT_BLINK_MIN_MS, DEFAULT_DISPERSION_THRESHOLD, DEFAULT_EVENT_METHOD,
+                    DEFAULT_MIN_FIXATION_MS, DEFAULT_VELOCITY_THRESHOLD, EVENT_METHODS, EventParameters)
 
 app = FastAPI(title="Eye Tracking API", version="1.0.0")
 
@@ -21,6 +40,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latency, payload sizes and database work per route, see /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Data models - Updated to match frontend schema
 class EyeLandmark(BaseModel):
     x: float
@@ -54,11 +76,35 @@ class RecordingData(BaseModel):
     positions: List[EyePosition]
     timestamp: int
 
+class EyeColumns(BaseModel):
+    """One array per coordinate, null where the eye is missing from the frame"""
+    iris_x: List[Optional[float]]
+    iris_y: List[Optional[float]]
+    iris_z: List[Optional[float]]
+    corner_left_x: List[Optional[float]]
+    corner_left_y: List[Optional[float]]
+    corner_left_z: List[Optional[float]]
+    corner_right_x: List[Optional[float]]
+    corner_right_y: List[Optional[float]]
+    corner_right_z: List[Optional[float]]
+
+class ColumnarRecordingData(BaseModel):
+    """RecordingData as parallel arrays, one value per frame, validated without per-frame models"""
+    session_id: str
+    recording_number: int
+    timestamps: List[int]
+    confidence: Optional[List[Optional[float]]] = None
+    left: Optional[EyeColumns] = None
+    right: Optional[EyeColumns] = None
+    timestamp: int
+
 class CalibrationData(BaseModel):
     session_id: str
     calibration_points: List[EyePosition]
     timestamp: int
 
+position_list_adapter = TypeAdapter(List[EyePosition])
+
 class EyeTrackingResponse(BaseModel):
     success: bool
     message: str
@@ -72,16 +118,34 @@ class RecordingResponse(BaseModel):
     session_id: str
     recording_number: int
     positions_received: int
+    # Post-ingest jobs of the recording, see GET /api/jobs/{job_id}
+    job_ids: List[str] = []
 
 class CalibrationResponse(BaseModel):
     success: bool
     message: str
     session_id: str
     calibration_points_received: int
+    # Jobs recomputing the session's recordings with the new calibration
+    job_ids: List[str] = []
+
+job_workers = JobWorkerPool()
 
 @app.on_event("startup")
 async def startup_event():
     await init_db()
+    
+    # Databases created before the catalog existed get it built once
+    async with AsyncSessionLocal() as db:
+        counts = await ensure_catalog(db)
+    if counts:
+        print(f"Built catalog: {counts['sessions']} sessions, {counts['recordings']} recordings")
+    
+    job_workers.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await job_workers.stop()
 
 @app.get("/")
 async def root():
@@ -91,11 +155,34 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
-@app.post("/api/eye-tracking/{session_id}", response_model=RecordingResponse)
-async def receive_recording_data(session_id: str, data: RecordingData, db: AsyncSession = Depends(get_db)):
+@app.post("/api/eye-tracking/{session_id}", response_model=RecordingResponse, openapi_extra={
+    "requestBody": {
+        "required": True,
+        "content": {
+            JSON_MEDIA_TYPE: {"schema": RecordingData.model_json_schema(ref_template="#/components/schemas/{model}")},
+            RECORDING_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}},
+        }
+    }
+})
+async def receive_recording_data(session_id: str, request: Request, db: AsyncSession = Depends(get_db)):
     """
-    Receive recording data for a specific session with recording number
+    Receive recording data for a specific session with recording number.
+    
+    JSON (RecordingData) by default. Send `Content-Type: application/vnd.eyetracking.recording`
+    (or `application/octet-stream`) with the packed binary layout documented in serialization.py,
+    decoded straight into NumPy columns.
     """
+    content_type = (request.headers.get("content-type") or JSON_MEDIA_TYPE).split(";")[0].strip().lower()
+    body = await request.body()
+    if content_type in (RECORDING_MEDIA_TYPE, OCTET_STREAM_MEDIA_TYPE):
+        return await receive_binary_recording_data(session_id, body, db)
+    
+    try:
+        data = RecordingData.model_validate_json(body)
+    except ValidationError as e:
+        # Same 422 body as FastAPI's own validation of a declared body parameter
+        raise RequestValidationError([{**error, 'loc': ('body', *error['loc'])} for error in e.errors()])
+    
     try:
         # Validate session_id matches
         if data.session_id != session_id:
@@ -118,13 +205,156 @@ async def receive_recording_data(session_id: str, data: RecordingData, db: Async
             message=f"Successfully received recording #{data.recording_number} with {len(data.positions)} positions",
             session_id=session_id,
             recording_number=data.recording_number,
-            positions_received=len(data.positions)
+            positions_received=len(data.positions),
+            job_ids=service.last_job_ids
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error processing recording data: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+async def receive_binary_recording_data(session_id: str, body: bytes, db: AsyncSession) -> RecordingResponse:
+    """
+    Store a recording uploaded in the binary layout, from numpy.frombuffer views of the body
+    """
+    try:
+        recording = decode_recording(body)
+        frame_count = len(recording.timestamps)
+        
+        service = EyeTrackingService(db)
+        columns = columnar_to_columns(
+            session_id, recording.recording_number, recording.timestamps, recording.confidence, recording.eyes
+        )
+        stored_count = await service.store_recording_columns(session_id, recording.recording_number, columns)
+        
+        print(f"Session {session_id}: Received binary recording #{recording.recording_number} with {frame_count} positions ({len(body)} bytes)")
+        print(f"Session {session_id}: Stored {stored_count} data points")
+        
+        return RecordingResponse(
+            success=True,
+            message=f"Successfully received recording #{recording.recording_number} with {frame_count} positions",
+            session_id=session_id,
+            recording_number=recording.recording_number,
+            positions_received=frame_count,
+            job_ids=service.last_job_ids
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error processing binary recording data: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.post("/api/eye-tracking/{session_id}/columnar", response_model=RecordingResponse)
+async def receive_columnar_recording_data(session_id: str, data: ColumnarRecordingData, db: AsyncSession = Depends(get_db)):
+    """
+    Receive recording data as parallel arrays (timestamps, confidence, and each coordinate of each eye),
+    converted to storage columns with NumPy instead of one model per frame
+    """
+    try:
+        if data.session_id != session_id:
+            raise ValueError("Session ID mismatch")
+        
+        service = EyeTrackingService(db)
+        
+        columns = columnar_to_columns(
+            session_id, data.recording_number, data.timestamps, data.confidence,
+            {'left': dict(data.left) if data.left else None, 'right': dict(data.right) if data.right else None}
+        )
+        stored_count = await service.store_recording_columns(session_id, data.recording_number, columns)
+        
+        print(f"Session {session_id}: Received columnar recording #{data.recording_number} with {len(data.timestamps)} positions")
+        print(f"Session {session_id}: Stored {stored_count} data points")
+        
+        return RecordingResponse(
+            success=True,
+            message=f"Successfully received recording #{data.recording_number} with {len(data.timestamps)} positions",
+            session_id=session_id,
+            recording_number=data.recording_number,
+            positions_received=len(data.timestamps),
+            job_ids=service.last_job_ids
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error processing columnar recording data: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.websocket("/ws/eye-tracking/{session_id}/{recording_number}")
+async def stream_recording_data(websocket: WebSocket, session_id: str, recording_number: int):
+    """
+    Receive a recording while it is being recorded.
+    
+    The client sends {"positions": [...]} messages with a few frames each, and {"type": "end"} when
+    the recording stops. Every batch is acknowledged with the left eye normalized positions computed
+    with the session's calibration; "end" is answered once every frame is stored. Malformed messages
+    are answered with {"type": "error"} and skipped. Frames received before a dropped connection or
+    a server error are still stored.
+    """
+    await websocket.accept()
+    
+    # Short-lived session: the writer uses its own, and this one must not stay checked out while streaming
+    async with AsyncSessionLocal() as db:
+        reference = (await EyeTrackingService(db).get_calibration_references(session_id))['left']
+    
+    writer = RecordingStreamWriter(session_id, recording_number)
+    writer.start()
+    
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError as e:
+                await websocket.send_json({"type": "error", "detail": f"Invalid JSON: {e}"})
+                continue
+            if not isinstance(message, dict):
+                await websocket.send_json({"type": "error", "detail": "Expected a JSON object"})
+                continue
+            if message.get("type") == "end":
+                break
+            
+            try:
+                positions = [position.model_dump() for position in position_list_adapter.validate_python(message.get("positions", []))]
+            except ValidationError as e:
+                await websocket.send_json({"type": "error", "detail": e.errors(include_url=False, include_context=False)})
+                continue
+            
+            await writer.add(positions)
+            timestamps, values = normalize_eye(eye_arrays_from_positions(positions, 'leftEye'), reference)
+            await websocket.send_json({
+                "type": "ack",
+                "positions_received": writer.received,
+                "normalized": [{"timestamp": t, "x": x} for t, x in zip(timestamps.tolist(), values.tolist())]
+            })
+        
+        stored_count = await writer.close()
+        print(f"Session {session_id}: Streamed recording #{recording_number} with {writer.received} positions")
+        await websocket.send_json({
+            "type": "complete",
+            "session_id": session_id,
+            "recording_number": recording_number,
+            "positions_received": writer.received,
+            "stored": stored_count,
+            "job_ids": writer.job_ids
+        })
+        await websocket.close()
+    except WebSocketDisconnect:
+        # Keep whatever was received before the connection dropped
+        try:
+            await writer.close()
+        except Exception as e:
+            print(f"Error storing streamed recording data: {str(e)}")
+        print(f"Session {session_id}: Stream of recording #{recording_number} disconnected after {writer.received} positions")
+    except Exception as e:
+        print(f"Error streaming recording data: {str(e)}")
+        # Still store the frames received so far, as on a dropped connection
+        try:
+            await writer.close()
+        except Exception as close_error:
+            print(f"Error storing streamed recording data: {str(close_error)}")
+        await websocket.close(code=1011, reason=str(e)[:120])
+
 @app.post("/api/calibration", response_model=CalibrationResponse)
 async def receive_calibration_data(data: CalibrationData, db: AsyncSession = Depends(get_db)):
     """
@@ -147,7 +377,8 @@ async def receive_calibration_data(data: CalibrationData, db: AsyncSession = Dep
             success=True,
             message=f"Successfully received {len(data.calibration_points)} calibration points",
             session_id=data.session_id,
-            calibration_points_received=len(data.calibration_points)
+            calibration_points_received=len(data.calibration_points),
+            job_ids=service.last_job_ids
         )
         
     except Exception as e:
@@ -172,51 +403,343 @@ async def get_session_calibration(session_id: str, db: AsyncSession = Depends(ge
         print(f"Error retrieving calibration data: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """
+    Get hit/miss counters of the in-process caches
+    """
+    return {
+        "success": True,
+        "caches": cache_stats()
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Request, database, processing and cache metrics in the Prometheus text format
+    """
+    return Response(content=render_metrics(), media_type=METRICS_MEDIA_TYPE)
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    Get the status of a background job, with its result once it succeeded
+    """
+    try:
+        job = await get_job(db, job_id)
+    except Exception as e:
+        print(f"Error retrieving job: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    
+    return {
+        "success": True,
+        "job": job
+    }
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    Get the result of a background job: 409 until it succeeded
+    """
+    try:
+        job = await get_job(db, job_id)
+    except Exception as e:
+        print(f"Error retrieving job result: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    if job['status'] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job['status']}")
+    
+    return {
+        "success": True,
+        "job_id": job_id,
+        "kind": job['kind'],
+        "session_id": job['session_id'],
+        "recording_number": job['recording_number'],
+        "result": job['result']
+    }
+
 @app.get("/api/sessions")
-async def get_all_sessions(db: AsyncSession = Depends(get_db)):
+async def get_all_sessions(
+    limit: Optional[int] = Query(None, description=f"Sessions per page (at most {MAX_SESSION_PAGE_SIZE}), all sessions by default"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    start_ts: Optional[int] = Query(None, description="Sessions starting at or after this timestamp (ms)"),
+    end_ts: Optional[int] = Query(None, description="Sessions starting at or before this timestamp (ms)"),
+    min_duration: Optional[int] = Query(None, description="Sessions spanning at least this many seconds"),
+    has_calibration: Optional[bool] = Query(None, description="Only calibrated (true) or uncalibrated (false) sessions"),
+    fields: str = Query(",".join(SESSION_FIELDS), description=f"Comma-separated parts of each session: {', '.join(SESSION_FIELDS)}"),
+    order: str = Query("desc", description=f"Order of the first timestamps: {', '.join(SESSION_ORDERS)}"),
+    db: AsyncSession = Depends(get_db)
+):
     """
-    Get all sessions with their recordings
+    Get the sessions with their recordings, most recent first, one page at a time when a limit is given.
+    fields=summary leaves out the per-recording detail.
     """
     try:
         service = EyeTrackingService(db)
-        sessions = await service.get_all_sessions()
+        sessions, next_cursor = await service.list_sessions(
+            limit, cursor, start_ts, end_ts, min_duration, has_calibration,
+            [field.strip() for field in fields.split(",") if field.strip()], order
+        )
         
         return {
             "success": True,
-            "sessions": sessions
+            "sessions": sessions,
+            "next_cursor": next_cursor
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error retrieving sessions: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.get("/api/export")
+async def export_data(
+    table: str = Query("eye_tracking_data", description=f"Table to export: {', '.join(EXPORT_COLUMNS)}"),
+    export_format: str = Query("csv", alias="format", description=f"Output format: {', '.join(EXPORT_FORMATS)}"),
+    session_id: Optional[List[str]] = Query(None, description="Sessions to export (repeatable), all by default"),
+    start_ts: Optional[int] = Query(None, description="First frame timestamp to export (inclusive, ms)"),
+    end_ts: Optional[int] = Query(None, description="Last frame timestamp to export (inclusive, ms)")
+):
+    """
+    Stream the rows of several sessions, or of the sessions within a time range, as gzip CSV or Parquet,
+    read through server-side cursors and encoded one row group at a time
+    """
+    try:
+        validate_export(table, export_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    media_type, extension = EXPORT_FORMATS[export_format]
+    
+    async def export_bytes():
+        async with AsyncSessionLocal() as db:
+            session_ids = await export_session_ids(db, session_id, start_ts, end_ts)
+            async for data in export_table(db, table, export_format, session_ids, start_ts, end_ts):
+                yield data
+    
+    return StreamingResponse(
+        export_bytes(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{table}{extension}"'}
+    )
+
+@app.get("/api/sessions/{session_id}/data")
+async def stream_session_data(session_id: str):
+    """
+    Stream every position of a session as NDJSON, ordered by timestamp, in constant memory
+    """
+    async def ndjson_positions():
+        async with AsyncSessionLocal() as db:
+            async for positions in EyeTrackingService(db).stream_session_data(session_id):
+                yield encode_ndjson(positions)
+    
+    return StreamingResponse(ndjson_positions(), media_type=NDJSON_MEDIA_TYPE)
+
 @app.get("/api/sessions/{session_id}/recordings/{recording_number}")
 async def get_recording_data(
     session_id: str, 
     recording_number: int, 
     eye: str = "both",
     noise_reduction: bool = False,
+    filter_name: str = Query(DEFAULT_FILTER, alias="filter", description=f"Noise reduction filter: {', '.join(FILTERS)}"),
+    window: int = Query(DEFAULT_WINDOW, description="Noise reduction window size, in samples"),
+    start_ts: Optional[int] = Query(None, description="First timestamp to return (inclusive, ms)"),
+    end_ts: Optional[int] = Query(None, description="Last timestamp to return (inclusive, ms)"),
+    max_points: Optional[int] = Query(None, description="Downsample the series to at most this many points"),
+    downsample: str = Query(DEFAULT_DOWNSAMPLER, description=f"Downsampling method: {', '.join(DOWNSAMPLERS)}"),
+    resample_hz: Optional[float] = Query(None, description="Resample the series to a uniform grid at this rate"),
+    max_gap_ms: int = Query(DEFAULT_MAX_GAP_MS, description="Longest hole between samples bridged by resampling, in ms"),
+    accept: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Get data for a specific recording with optional filtering and noise reduction
+    Get data for a specific recording with optional filtering and noise reduction,
+    restricted to a time range and downsampled to a point budget.
+    
+    JSON by default. Send `Accept: application/vnd.eyetracking.series` (or `application/octet-stream`)
+    for the binary columnar layout documented in serialization.py,
+    `Accept: application/vnd.apache.arrow.stream` for Arrow IPC when pyarrow is installed, or
+    `Accept: application/x-ndjson` to stream the series in constant memory.
     """
     try:
         service = EyeTrackingService(db)
-        data = await service.get_recording_data(session_id, recording_number, eye, noise_reduction)
+        media_type = negotiate_series_format(accept)
         
-        return {
+        if media_type == NDJSON_MEDIA_TYPE:
+            if max_points is not None:
+                raise ValueError("max_points is not supported on streamed responses")
+            if resample_hz is not None:
+                raise ValueError("resample_hz is not supported on streamed responses")
+            if noise_reduction:
+                validate_filter(filter_name, window)
+            
+            # The request's session is closed before the body is sent, the stream opens its own
+            async def ndjson_series():
+                async with AsyncSessionLocal() as stream_db:
+                    chunks = EyeTrackingService(stream_db).stream_recording_arrays(
+                        session_id, recording_number, eye, noise_reduction, filter_name, window, start_ts, end_ts
+                    )
+                    async for timestamps, values in chunks:
+                        yield encode_series_ndjson(timestamps, values)
+            
+            return StreamingResponse(ndjson_series(), media_type=NDJSON_MEDIA_TYPE, headers={"Vary": "Accept"})
+        
+        if media_type != JSON_MEDIA_TYPE:
+            timestamps, values = await service.get_recording_arrays(
+                session_id, recording_number, eye, noise_reduction, filter_name, window,
+                start_ts, end_ts, max_points, downsample, resample_hz, max_gap_ms
+            )
+            return Response(
+                content=encode_series_as(media_type, timestamps, values),
+                media_type=media_type,
+                headers={
+                    "Vary": "Accept",
+                    "X-Session-Id": session_id,
+                    "X-Recording-Number": str(recording_number),
+                    "X-Data-Points": str(len(timestamps))
+                }
+            )
+        
+        data = await service.get_recording_data(
+            session_id, recording_number, eye, noise_reduction, filter_name, window,
+            start_ts, end_ts, max_points, downsample, resample_hz, max_gap_ms
+        )
+        
+        return JSONResponse({
             "success": True,
             "session_id": session_id,
             "recording_number": recording_number,
             "eye": eye,
             "noise_reduction": noise_reduction,
+            "filter": filter_name if noise_reduction else None,
+            "window": window if noise_reduction else None,
+            "start_ts": start_ts,
+            "end_ts": end_ts,
+            "max_points": max_points,
+            "downsample": downsample if max_points is not None else None,
+            "resample_hz": resample_hz,
+            "max_gap_ms": max_gap_ms if resample_hz is not None else None,
             "data": data,
             "data_points": len(data)
-        }
+        }, headers={"Vary": "Accept"})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error retrieving recording data: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.get("/api/sessions/{session_id}/recordings/{recording_number}/jobs")
+async def get_recording_jobs(session_id: str, recording_number: int, db: AsyncSession = Depends(get_db)):
+    """
+    Get the background jobs of a recording, most recent first, without their results
+    """
+    try:
+        jobs = await recording_jobs(db, session_id, recording_number)
+        
+        return {
+            "success": True,
+            "session_id": session_id,
+            "recording_number": recording_number,
+            "jobs": jobs
+        }
+    except Exception as e:
+        print(f"Error retrieving recording jobs: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.get("/api/sessions/{session_id}/recordings/{recording_number}/stats")
+async def get_recording_stats(
+    session_id: str,
+    recording_number: int,
+    eye: str = "both",
+    noise_reduction: bool = False,
+    filter_name: str = Query(DEFAULT_FILTER, alias="filter", description=f"Noise reduction filter: {', '.join(FILTERS)}"),
+    window: int = Query(DEFAULT_WINDOW, description="Noise reduction window size, in samples"),
+    start_ts: Optional[int] = Query(None, description="First timestamp of the range (inclusive, ms)"),
+    end_ts: Optional[int] = Query(None, description="Last timestamp of the range (inclusive, ms)"),
+    percentiles: Optional[str] = Query(None, description="Comma-separated percentiles, 5,25,50,75,95 by default"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get statistics of a recording's normalized series over a time range: count, mean, std, min, max,
+    percentiles and mean absolute velocity (normalized units per second)
+    """
+    try:
+        service = EyeTrackingService(db)
+        stats = await service.get_range_stats(
+            session_id, recording_number, eye, noise_reduction, filter_name, window,
+            start_ts, end_ts, parse_percentiles(percentiles)
+        )
+        
+        return {
+            "success": True,
+            "session_id": session_id,
+            "recording_number": recording_number,
+            "eye": eye,
+            "noise_reduction": noise_reduction,
+            "filter": filter_name if noise_reduction else None,
+            "window": window if noise_reduction else None,
+            "start_ts": start_ts,
+            "end_ts": end_ts,
+            "stats": stats
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error computing recording statistics: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.get("/api/sessions/{session_id}/recordings/{recording_number}/events")
+async def get_recording_events(
+    session_id: str,
+    recording_number: int,
+    eye: str = "both",
+    method: str = Query(DEFAULT_EVENT_METHOD, description=f"Fixation/saccade classification: {', '.join(EVENT_METHODS)}"),
+    velocity_threshold: float = Query(DEFAULT_VELOCITY_THRESHOLD, description="I-VT saccade velocity, in normalized units per second"),
+    dispersion_threshold: float = Query(DEFAULT_DISPERSION_THRESHOLD, description="I-DT fixation dispersion, in normalized units"),
+    min_fixation_ms: int = Query(DEFAULT_MIN_FIXATION_MS, description="Shortest fixation, in ms"),
+    blink_min_ms: int = Query(DEFAULT_BLINK_MIN_MS, description="Shortest loss of signal counted as a blink, in ms"),
+    blink_max_ms: int = Query(DEFAULT_BLINK_MAX_MS, description="Longest loss of signal counted as a blink, in ms"),
+    resample_hz: Optional[float] = Query(None, description="Detect on the landmarks resampled to a uniform grid at this rate"),
+    max_gap_ms: int = Query(DEFAULT_MAX_GAP_MS, description="Longest hole between samples bridged by resampling, in ms"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get the fixations, saccades, blinks and gaps of a recording, ordered by start timestamp,
+    with the count and total duration of each event type
+    """
+    try:
+        service = EyeTrackingService(db)
+        parameters = EventParameters(
+            method=method,
+            velocity_threshold=velocity_threshold,
+            dispersion_threshold=dispersion_threshold,
+            min_fixation_ms=min_fixation_ms,
+            blink_min_ms=blink_min_ms,
+            blink_max_ms=blink_max_ms,
+            resample_hz=resample_hz,
+            max_gap_ms=max_gap_ms
+        )
+        detected = await service.get_recording_events(session_id, recording_number, eye, parameters)
+        
+        return {
+            "success": True,
+            "session_id": session_id,
+            "recording_number": recording_number,
+            "eye": eye,
+            "parameters": parameters.to_dict(),
+            "summary": detected["summary"],
+            "events": detected["events"]
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error detecting recording events: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
 if __name__ == "__main__":
     import uvicorn
     import os
@@ -0,0 +1,368 @@
+"""
+In-process metrics of the API, exposed in the Prometheus text format on /metrics.
+
+    http_request_duration_seconds   latency of every request, per method, route template and status
+    http_request_db_round_trips     SQL statements executed while serving a request
+    http_request_db_rows            rows fetched by buffered queries or written, per request
+    http_request_size_bytes         request and response body sizes, streamed bodies included
+    http_response_size_bytes
+    db_query_duration_seconds       every statement, per leading SQL keyword
+    db_pool_checkout_seconds        wait for a pooled connection
+    compute_duration_seconds        normalization and smoothing passes
+    cache_*                         counters of the process-wide caches, see cache.py
+
+Per-request statistics are gathered by SQLAlchemy cursor events into the RequestStats of the
+current request, held in a context variable set by MetricsMiddleware. Statements slower than
+SLOW_QUERY_MS are logged as one JSON line, for a SLOW_QUERY_SAMPLE_RATE fraction of them.
+
+Values are kept per process: with several uvicorn workers, each one reports its own.
+"""
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+from cache import cache_stats
+
+METRICS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_SAMPLE_RATE", "1.0"))
+# Logged statements are cut to this many characters; parameters are never logged
+SLOW_QUERY_MAX_CHARS = 1000
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COMPUTE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+ROW_BUCKETS = (0, 10, 100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+SIZE_BUCKETS = (256, 1024, 4096, 16_384, 65_536, 262_144, 1_048_576, 4_194_304, 16_777_216, 67_108_864)
+
+Labels = Tuple[str, ...]
+
+_metrics: List["Metric"] = []
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class Metric:
+    """A named metric family with fixed label names, registered for render_metrics"""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def samples(self) -> List[Tuple[str, Labels, Labels, float]]:
+        """(name suffix, extra label names, label values, value) of every series"""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, extra_names, values, value in self.samples():
+            labels = _format_labels(self.labelnames + extra_names, values)
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> List[Tuple[str, Labels, Labels, float]]:
+        with self._lock:
+            return [("", (), labels, value) for labels, value in sorted(self._values.items())]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[Labels, list] = {}  # labels -> [per-bucket counts, sum]
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+
+    def samples(self) -> List[Tuple[str, Labels, Labels, float]]:
+        samples = []
+        with self._lock:
+            for labels, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    samples.append(("_bucket", ("le",), labels + (_format_value(bound),), cumulative))
+                samples.append(("_sum", (), labels, total))
+                samples.append(("_count", (), labels, cumulative))
+        return samples
+
+
+class Gauge(Metric):
+    """Values read when rendering, from a function returning {label values: value}"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 collect: Callable[[], Dict[Labels, float]]):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def samples(self) -> List[Tuple[str, Labels, Labels, float]]:
+        return [("", (), labels, value) for labels, value in sorted(self.collect().items())]
+
+
+class CollectedCounter(Gauge):
+    """Counter kept elsewhere (cache counters), read when rendering"""
+    kind = "counter"
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to serve a request, body included",
+    ("method", "route", "status")
+)
+REQUEST_DB_ROUND_TRIPS = Histogram(
+    "http_request_db_round_trips", "SQL statements executed per request", ("route",), COUNT_BUCKETS
+)
+REQUEST_DB_ROWS = Histogram(
+    "http_request_db_rows", "Rows fetched by buffered queries or written per request", ("route",), ROW_BUCKETS
+)
+REQUEST_BYTES = Histogram(
+    "http_request_size_bytes", "Request body size", ("route",), SIZE_BUCKETS
+)
+RESPONSE_BYTES = Histogram(
+    "http_response_size_bytes", "Response body size, streamed responses included", ("route",), SIZE_BUCKETS
+)
+QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Time to execute a SQL statement, per leading keyword", ("operation",)
+)
+SLOW_QUERIES = Counter(
+    "db_slow_queries_total", "SQL statements slower than SLOW_QUERY_MS, logged or not", ("operation",)
+)
+POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds", "Wait for a connection from the pool, connecting included", (), COMPUTE_BUCKETS
+)
+COMPUTE_SECONDS = Histogram(
+    "compute_duration_seconds", "Time spent in a CPU-bound processing stage", ("stage",), COMPUTE_BUCKETS
+)
+JOB_RUNS = Counter(
+    "job_runs_total", "Background job attempts by outcome: succeeded, queued (retried) or failed", ("kind", "status")
+)
+JOB_SECONDS = Histogram(
+    "job_duration_seconds", "Time to run a background job attempt", ("kind",)
+)
+
+
+def _cache_counter(field: str) -> Callable[[], Dict[Labels, float]]:
+    return lambda: {(name,): stats[field] for name, stats in cache_stats().items()}
+
+
+for _field in ("hits", "misses", "evictions", "invalidations"):
+    CollectedCounter(f"cache_{_field}_total", f"Cache {_field}", ("cache",), _cache_counter(_field))
+Gauge("cache_entries", "Entries currently held by a cache", ("cache",), _cache_counter("size"))
+
+
+@dataclass
+class RequestStats:
+    scope: dict
+    round_trips: int = 0
+    rows: int = 0
+
+    @property
+    def route(self) -> str:
+        """Route template matched by the router, which stores it in the scope"""
+        route = self.scope.get("route")
+        return getattr(route, "path", "unmatched")
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def timed(stage: str):
+    """Decorator recording the duration of every call in compute_duration_seconds{stage}"""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                COMPUTE_SECONDS.observe(time.perf_counter() - started, stage)
+        return wrapper
+    return decorator
+
+
+_LEADING_KEYWORD = re.compile(r"\s*(\w+)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _operation(statement: str) -> str:
+    match = _LEADING_KEYWORD.match(statement)
+    return match.group(1).lower() if match else "other"
+
+
+def _cursor_rows(cursor) -> int:
+    """Rows buffered by a SELECT (the asyncio drivers fetch them on execute), or affected by a write"""
+    buffered = getattr(cursor, "_rows", None)
+    if buffered:
+        return len(buffered)
+    rowcount = getattr(cursor, "rowcount", -1)
+    return rowcount if rowcount and rowcount > 0 else 0
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_started"].pop()
+    operation = _operation(statement)
+    QUERY_SECONDS.observe(seconds, operation)
+    rows = _cursor_rows(cursor)
+
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.round_trips += 1
+        stats.rows += rows
+
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.inc(1, operation)
+        if random.random() < SLOW_QUERY_SAMPLE_RATE:
+            print(json.dumps({
+                'event': 'slow_query',
+                'duration_ms': round(seconds * 1000, 1),
+                'operation': operation,
+                'rows': rows,
+                'executemany': executemany,
+                'route': stats.route if stats is not None else None,
+                'statement': _WHITESPACE.sub(" ", statement).strip()[:SLOW_QUERY_MAX_CHARS],
+            }))
+
+
+def _handle_error(exception_context):
+    # The statement failed: after_cursor_execute will not run for it
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def _timed_pool_class(pool_class: type) -> type:
+    class TimedPool(pool_class):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started)
+
+    TimedPool.__name__ = TimedPool.__qualname__ = f"Timed{pool_class.__name__}"
+    return TimedPool
+
+
+def instrument_engine(engine) -> None:
+    """Attach the query and pool instrumentation to an engine (sync or async)"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+    # Time checkouts in the pool itself; the subclass survives the pool being recreated on dispose()
+    pool = sync_engine.pool
+    pool.__class__ = _timed_pool_class(type(pool))
+    Gauge(
+        "db_pool_checked_out", "Connections currently checked out of the pool", (),
+        lambda: {(): sync_engine.pool.checkedout()} if hasattr(sync_engine.pool, "checkedout") else {}
+    )
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, body sizes and database work of every HTTP request,
+    labelled with the route template ('/api/sessions/{session_id}') rather than the path
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+        request_bytes, response_bytes = 0, 0
+
+        async def counting_receive():
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                request_bytes += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            _request_stats.reset(token)
+            route = stats.route
+            REQUEST_SECONDS.observe(time.perf_counter() - started, scope["method"], route, str(status))
+            REQUEST_DB_ROUND_TRIPS.observe(stats.round_trips, route)
+            REQUEST_DB_ROWS.observe(stats.rows, route)
+            REQUEST_BYTES.observe(request_bytes, route)
+            RESPONSE_BYTES.observe(response_bytes, route)
@@ -0,0 +1,122 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ingest import EYE_KEYS, eye_values
+from metrics import timed
+from utils import get_euclidean_distance
+
+
+# Bump whenever the normalization formula changes, so that stored normalized
+# series are recomputed by `python cli.py rebuild-normalized`
+NORMALIZATION_VERSION = 1
+
+
+@dataclass(frozen=True)
+class CalibrationReference:
+    """Iris to corner distances of the leftmost calibration point, which map to -1 and 1"""
+    left_corner_min_distance: float
+    right_corner_max_distance: float
+
+    @property
+    def range_distance(self) -> float:
+        return self.right_corner_max_distance - self.left_corner_min_distance
+
+
+@dataclass
+class EyeArrays:
+    """Contiguous columns for one eye of a recording, ordered by timestamp"""
+    timestamps: np.ndarray    # int64, shape (n,)
+    iris: np.ndarray          # float64, shape (n, 3)
+    corner_left: np.ndarray   # float64, shape (n, 3)
+    corner_right: np.ndarray  # float64, shape (n, 3)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+
+def calibration_reference(calibration_points: List[dict], eye_key: str = 'leftEye') -> Optional[CalibrationReference]:
+    """Derive the normalization reference of one eye, as calculate_normalized_position does for the left eye"""
+    if not calibration_points:
+        return None
+
+    leftmost_calibration = calibration_points[0]
+    if not leftmost_calibration.get(eye_key):
+        return None
+
+    eye = leftmost_calibration[eye_key]
+    reference = CalibrationReference(
+        left_corner_min_distance=get_euclidean_distance(eye['center'], eye['corners'][0]),
+        right_corner_max_distance=get_euclidean_distance(eye['center'], eye['corners'][1]),
+    )
+    if reference.range_distance == 0:
+        return None
+    return reference
+
+
+def calibration_references(calibration_points: List[dict]) -> Dict[str, Optional[CalibrationReference]]:
+    """Normalization references for both eyes, keyed by eye side"""
+    return {eye_side: calibration_reference(calibration_points, key) for eye_side, key in EYE_KEYS}
+
+
+def eye_arrays_from_rows(rows: Sequence[tuple]) -> EyeArrays:
+    """
+    Build EyeArrays from (timestamp, iris_x, iris_y, iris_z, corner_left_x, ..., corner_right_z) rows.
+    Missing coordinates become NaN.
+    """
+    if not rows:
+        empty = np.empty((0, 3), dtype=np.float64)
+        return EyeArrays(np.empty(0, dtype=np.int64), empty, empty.copy(), empty.copy())
+
+    columns = list(zip(*rows))
+    coordinates = np.array(columns[1:10], dtype=np.float64).T
+    return EyeArrays(
+        timestamps=np.array(columns[0], dtype=np.int64),
+        iris=np.ascontiguousarray(coordinates[:, 0:3]),
+        corner_left=np.ascontiguousarray(coordinates[:, 3:6]),
+        corner_right=np.ascontiguousarray(coordinates[:, 6:9]),
+    )
+
+
+def eye_arrays_from_positions(positions: List[dict], eye_key: str = 'leftEye') -> EyeArrays:
+    """Build EyeArrays for one eye from recording payload positions, skipping frames without that eye"""
+    return eye_arrays_from_rows([
+        (position.get('timestamp'), *eye_values(position[eye_key]))
+        for position in positions
+        if position.get(eye_key)
+    ])
+
+
+def iris_corner_distances(iris: np.ndarray, corner: np.ndarray) -> np.ndarray:
+    """Row-wise Euclidean distance, with the same operation order as get_euclidean_distance"""
+    delta = iris - corner
+    return np.sqrt(delta[:, 0] * delta[:, 0] + delta[:, 1] * delta[:, 1] + delta[:, 2] * delta[:, 2])
+
+
+@timed("normalization")
+def normalized_values(eye: EyeArrays, reference: CalibrationReference) -> np.ndarray:
+    """Normalized value of every sample of an eye, NaN where landmarks are missing"""
+    current_left_corner_distance = iris_corner_distances(eye.iris, eye.corner_left)
+    return 2 * ((current_left_corner_distance - reference.left_corner_min_distance) / reference.range_distance - 0.5)
+
+
+def normalize_eye(eye: EyeArrays, reference: Optional[CalibrationReference]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Normalize a whole eye series in one pass. Returns (timestamps, values), dropping samples that
+    cannot be normalized (missing landmarks), so the output matches calculate_normalized_position.
+    """
+    if reference is None or len(eye) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    values = normalized_values(eye, reference)
+
+    valid = np.isfinite(values)
+    if valid.all():
+        return eye.timestamps, values
+    return eye.timestamps[valid], values[valid]
+
+
+def series_eye(eye: str) -> str:
+    """Eye whose normalized series is returned for the 'eye' filter. 'both' keeps the historical left eye series."""
+    return 'right' if eye == 'right' else 'left'
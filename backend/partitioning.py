@@ -0,0 +1,142 @@
+"""
+Partitioned physical layout of eye_tracking_data on PostgreSQL, selected with PARTITION_LAYOUT:
+
+    none  one heap table (default, and the only layout on other databases)
+    hash  PARTITION_COUNT partitions on a hash of session_id: every query of a session touches
+          a single small partition
+    time  one partition per calendar month (UTC) of the frame timestamp, created ahead of time
+          and on demand at ingest: old months can be detached, archived or dropped as a whole
+
+Partitions replace the (session_id, timestamp) B-tree with a BRIN index on timestamp, which is
+a few pages per partition since frames are written in time order. The primary key and the
+(session_id, recording_number) index are kept, per partition.
+
+`python cli.py partition-data` moves an existing unpartitioned table to the configured layout.
+"""
+import os
+from datetime import datetime, timezone
+from typing import Iterable, List, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+PARTITION_LAYOUT = os.getenv("PARTITION_LAYOUT", "none").lower()
+PARTITION_COUNT = int(os.getenv("PARTITION_COUNT", "16"))
+
+# Monthly partitions created in advance by init_db, besides the current month
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "2"))
+
+PARTITION_BY = {
+    "hash": "HASH (session_id)",
+    "time": "RANGE (timestamp)",
+}
+
+if PARTITION_LAYOUT != "none" and PARTITION_LAYOUT not in PARTITION_BY:
+    raise ValueError(f"Unknown PARTITION_LAYOUT '{PARTITION_LAYOUT}', expected one of: none, {', '.join(PARTITION_BY)}")
+
+# Monthly partitions known to exist, so that ingest only issues DDL for a new month
+_known_partitions: Set[str] = set()
+
+
+def is_partitioned_layout() -> bool:
+    return PARTITION_LAYOUT in PARTITION_BY
+
+
+def month_of(timestamp: int) -> Tuple[int, int]:
+    moment = datetime.fromtimestamp(timestamp / 1000, tz=timezone.utc)
+    return moment.year, moment.month
+
+
+def next_month(year: int, month: int) -> Tuple[int, int]:
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def month_start(year: int, month: int) -> int:
+    """First millisecond of a month, in the unit of eye_tracking_data.timestamp"""
+    return int(datetime(year, month, 1, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def months_between(first_timestamp: int, last_timestamp: int) -> List[Tuple[int, int]]:
+    months = []
+    month, last = month_of(first_timestamp), month_of(last_timestamp)
+    while month <= last:
+        months.append(month)
+        month = next_month(*month)
+    return months
+
+
+def time_partition_name(table: str, year: int, month: int) -> str:
+    return f"{table}_y{year:04d}m{month:02d}"
+
+
+async def is_partitioned(conn: AsyncConnection, table: str) -> bool:
+    result = await conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :table"
+    ), {"table": table})
+    return result.first() is not None
+
+
+async def table_exists(conn: AsyncConnection, table: str) -> bool:
+    result = await conn.execute(text("SELECT to_regclass(:table) IS NOT NULL"), {"table": table})
+    return bool(result.scalar())
+
+
+async def create_hash_partitions(conn: AsyncConnection, table: str) -> None:
+    for remainder in range(PARTITION_COUNT):
+        await conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {table}_p{remainder:02d} PARTITION OF {table} "
+            f"FOR VALUES WITH (MODULUS {PARTITION_COUNT}, REMAINDER {remainder})"
+        ))
+
+
+async def create_time_partitions(conn: AsyncConnection, table: str, months: Iterable[Tuple[int, int]]) -> None:
+    for year, month in months:
+        name = time_partition_name(table, year, month)
+        if name in _known_partitions:
+            continue
+        # Serialize concurrent workers creating the same month
+        await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": name})
+        await conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+            f"FOR VALUES FROM ({month_start(year, month)}) TO ({month_start(*next_month(year, month))})"
+        ))
+        _known_partitions.add(name)
+
+
+async def ensure_partitions(conn: AsyncConnection, table: str) -> bool:
+    """
+    Create the partitions of the configured layout. Returns False when the table exists unpartitioned.
+    """
+    if not is_partitioned_layout() or conn.dialect.name != "postgresql":
+        return True
+    if not await is_partitioned(conn, table):
+        return False
+
+    if PARTITION_LAYOUT == "hash":
+        await create_hash_partitions(conn, table)
+    else:
+        now = int(datetime.now(tz=timezone.utc).timestamp() * 1000)
+        months = [month_of(now)]
+        for _ in range(PARTITION_MONTHS_AHEAD):
+            months.append(next_month(*months[-1]))
+        await create_time_partitions(conn, table, months)
+    return True
+
+
+async def ensure_time_partitions(engine: AsyncEngine, table: str, timestamps: Iterable[int]) -> None:
+    """
+    Create the monthly partitions a batch of frames falls into, in their own short transaction
+    since creating a partition locks the whole table. Call it before the batch's transaction
+    touches the table.
+    """
+    if PARTITION_LAYOUT != "time" or engine.dialect.name != "postgresql":
+        return
+    timestamps = list(timestamps)
+    if not timestamps:
+        return
+
+    months = months_between(min(timestamps), max(timestamps))
+    if all(time_partition_name(table, *month) in _known_partitions for month in months):
+        return
+    async with engine.begin() as conn:
+        await create_time_partitions(conn, table, months)
@@ -0,0 +1,255 @@
+"""
+Multi-resolution pyramid of a recording's normalized series, for zoomed-out playback.
+
+Level k aggregates the series in buckets of MIN_BUCKET_SIZE * 2**k consecutive samples, keeping
+for each bucket its first and last timestamps, its minimum and maximum (with their timestamps),
+and its mean. Each level is built from the one below in O(buckets), so the whole pyramid costs
+about two passes over the series and 2 * n / MIN_BUCKET_SIZE buckets of storage.
+
+A request for a time range and a point budget is answered from the finest level whose buckets in
+the range fit the budget: a binary search and a slice, whatever the recording length. Buckets
+straddling the range ends are kept, minus the min/max points that fall outside the range.
+"""
+import io
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from catalog import recording_catalog
+from database import RecordingPyramid, dialect_insert
+from normalization import NORMALIZATION_VERSION
+
+MIN_BUCKET_SIZE = 16
+
+# Downsampling methods a pyramid can answer, with the points each bucket contributes
+PYRAMID_METHODS = {"minmax": 2, "mean": 1}
+
+_FIELDS = ("start_ts", "end_ts", "min_ts", "min", "max_ts", "max", "sum", "count")
+
+
+@dataclass
+class PyramidLevel:
+    bucket_size: int
+    start_ts: np.ndarray  # int64, first timestamp of each bucket
+    end_ts: np.ndarray    # int64, last timestamp of each bucket
+    min_ts: np.ndarray    # int64
+    min: np.ndarray       # float64
+    max_ts: np.ndarray    # int64
+    max: np.ndarray       # float64
+    sum: np.ndarray       # float64
+    count: np.ndarray     # int64
+
+    def __len__(self) -> int:
+        return len(self.start_ts)
+
+    def coarsen(self) -> "PyramidLevel":
+        """Next level up: merge buckets pairwise, an odd last bucket is carried over alone"""
+        n = len(self)
+        left = np.arange(0, n, 2)
+        right = np.minimum(left + 1, n - 1)
+        use_right_min = self.min[right] < self.min[left]
+        use_right_max = self.max[right] > self.max[left]
+        paired = right != left
+        return PyramidLevel(
+            bucket_size=self.bucket_size * 2,
+            start_ts=self.start_ts[left],
+            end_ts=self.end_ts[right],
+            min_ts=np.where(use_right_min, self.min_ts[right], self.min_ts[left]),
+            min=np.where(use_right_min, self.min[right], self.min[left]),
+            max_ts=np.where(use_right_max, self.max_ts[right], self.max_ts[left]),
+            max=np.where(use_right_max, self.max[right], self.max[left]),
+            sum=self.sum[left] + np.where(paired, self.sum[right], 0.0),
+            count=self.count[left] + np.where(paired, self.count[right], 0),
+        )
+
+
+def _first_level(timestamps: np.ndarray, values: np.ndarray, size: int) -> PyramidLevel:
+    n = len(values)
+    starts = np.arange(0, n, size)
+    ends = np.minimum(starts + size, n) - 1
+    bucket_count = len(starts)
+
+    padded = np.full(bucket_count * size, np.nan)
+    padded[:n] = values
+    buckets = padded.reshape(bucket_count, size)
+    lowest = starts + np.nanargmin(buckets, axis=1)
+    highest = starts + np.nanargmax(buckets, axis=1)
+
+    return PyramidLevel(
+        bucket_size=size,
+        start_ts=timestamps[starts],
+        end_ts=timestamps[ends],
+        min_ts=timestamps[lowest],
+        min=values[lowest],
+        max_ts=timestamps[highest],
+        max=values[highest],
+        sum=np.add.reduceat(values, starts),
+        count=ends - starts + 1,
+    )
+
+
+class Pyramid:
+    """Pyramid levels of one eye of a recording, finest first"""
+
+    def __init__(self, levels: List[PyramidLevel], sample_count: int):
+        self.levels = levels
+        self.sample_count = sample_count
+
+    @classmethod
+    def build(cls, timestamps: np.ndarray, values: np.ndarray) -> "Pyramid":
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        levels = []
+        if len(values) >= 2 * MIN_BUCKET_SIZE:
+            level = _first_level(timestamps, values, MIN_BUCKET_SIZE)
+            levels.append(level)
+            while len(level) > 2:
+                level = level.coarsen()
+                levels.append(level)
+        return cls(levels, len(values))
+
+    def to_bytes(self) -> bytes:
+        arrays: Dict[str, np.ndarray] = {"sample_count": np.array(self.sample_count)}
+        for k, level in enumerate(self.levels):
+            for field in _FIELDS:
+                arrays[f"{k}_{field}"] = getattr(level, field)
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Pyramid":
+        with np.load(io.BytesIO(data)) as arrays:
+            level_count = sum(1 for name in arrays.files if name.endswith("_start_ts"))
+            levels = [
+                PyramidLevel(MIN_BUCKET_SIZE << k, **{field: arrays[f"{k}_{field}"] for field in _FIELDS})
+                for k in range(level_count)
+            ]
+            return cls(levels, int(arrays["sample_count"]))
+
+    def _overlapping(self, level: PyramidLevel, start_ts: Optional[int], end_ts: Optional[int]) -> Tuple[int, int]:
+        """[first, last) indexes of the buckets of a level overlapping [start_ts, end_ts]"""
+        first = 0 if start_ts is None else int(np.searchsorted(level.end_ts, start_ts, side='left'))
+        last = len(level) if end_ts is None else int(np.searchsorted(level.start_ts, end_ts, side='right'))
+        return first, max(first, last)
+
+    def select(self, start_ts: Optional[int], end_ts: Optional[int], max_points: int,
+               method: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Downsampled (timestamps, values) of [start_ts, end_ts] within max_points, from the finest level
+        that fits. None when even the finest level has too few samples per bucket for the range, in which
+        case the raw series is small enough to be downsampled directly, or when even the coarsest level
+        exceeds the budget, which only downsampling the raw series can meet, or when no bucket extreme
+        falls inside the range.
+        """
+        if not self.levels:
+            return None
+        points_per_bucket = PYRAMID_METHODS[method]
+
+        finest = self.levels[0]
+        first, last = self._overlapping(finest, start_ts, end_ts)
+        if (last - first) * points_per_bucket <= max_points:
+            return None
+
+        # Coarser levels have fewer buckets in any range: binary search the first that fits
+        low, high = 1, len(self.levels) - 1
+        chosen = None
+        while low <= high:
+            middle = (low + high) // 2
+            first, last = self._overlapping(self.levels[middle], start_ts, end_ts)
+            if (last - first) * points_per_bucket <= max_points:
+                chosen, high = middle, middle - 1
+            else:
+                low = middle + 1
+        if chosen is None:
+            return None
+
+        level = self.levels[chosen]
+        first, last = self._overlapping(level, start_ts, end_ts)
+        if method == "mean":
+            timestamps = (level.start_ts[first:last] + level.end_ts[first:last]) // 2
+            values = level.sum[first:last] / level.count[first:last]
+            return timestamps, values
+        timestamps, values = _envelope(level, first, last, start_ts, end_ts)
+        if len(timestamps) == 0:
+            # The extremes of the few buckets covering a narrow range all fall outside it
+            return None
+        return timestamps, values
+
+
+def _envelope(level: PyramidLevel, first: int, last: int,
+              start_ts: Optional[int], end_ts: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Minimum and maximum of each bucket, in time order, without duplicates"""
+    timestamps = np.concatenate((level.min_ts[first:last], level.max_ts[first:last]))
+    values = np.concatenate((level.min[first:last], level.max[first:last]))
+    keep = np.ones(len(timestamps), dtype=bool)
+    if start_ts is not None:
+        keep &= timestamps >= start_ts
+    if end_ts is not None:
+        keep &= timestamps <= end_ts
+    timestamps, values = timestamps[keep], values[keep]
+    timestamps, order = np.unique(timestamps, return_index=True)
+    return timestamps, values[order]
+
+
+recording_pyramids = RecordingPyramid.__table__
+
+
+async def load_pyramid(db: AsyncSession, session_id: str, recording_number: int, eye_side: str) -> Optional[Pyramid]:
+    """
+    Stored pyramid of one eye of a recording, None if missing, built with another normalization formula
+    or built from fewer rows than the catalog now counts (an ingest ran since)
+    """
+    result = await db.execute(
+        select(recording_pyramids.c.version, recording_pyramids.c.data).join(
+            recording_catalog,
+            (recording_catalog.c.session_id == recording_pyramids.c.session_id)
+            & (recording_catalog.c.recording_number == recording_pyramids.c.recording_number)
+        ).where(
+            recording_pyramids.c.session_id == session_id,
+            recording_pyramids.c.recording_number == recording_number,
+            recording_pyramids.c.eye_side == eye_side,
+            recording_pyramids.c.data_points == recording_catalog.c.data_points
+        )
+    )
+    row = result.first()
+    if row is None or row.version != NORMALIZATION_VERSION:
+        return None
+    return Pyramid.from_bytes(row.data)
+
+
+async def save_pyramid(db: AsyncSession, session_id: str, recording_number: int, eye_side: str, pyramid: Pyramid,
+                       data_points: int) -> None:
+    """
+    Store a pyramid, replacing any previous one. data_points is the recording's catalog count, read before
+    the series the pyramid was built from (see catalog.recording_data_points). Runs in the caller's transaction.
+    """
+    values = {
+        'version': NORMALIZATION_VERSION,
+        'data_points': data_points,
+        'sample_count': pyramid.sample_count,
+        'data': pyramid.to_bytes(),
+        'created_at': datetime.utcnow()
+    }
+    stmt = dialect_insert(db, recording_pyramids).values(
+        session_id=session_id,
+        recording_number=recording_number,
+        eye_side=eye_side,
+        **values
+    ).on_conflict_do_update(
+        index_elements=[recording_pyramids.c.session_id, recording_pyramids.c.recording_number, recording_pyramids.c.eye_side],
+        set_=values
+    )
+    await db.execute(stmt)
+
+
+async def remove_pyramids(db: AsyncSession, session_id: str, recording_number: Optional[int] = None) -> None:
+    """Drop the pyramids of a session, or of one of its recordings. Runs in the caller's transaction."""
+    criteria = [recording_pyramids.c.session_id == session_id]
+    if recording_number is not None:
+        criteria.append(recording_pyramids.c.recording_number == recording_number)
+    await db.execute(delete(recording_pyramids).where(*criteria))
@@ -0,0 +1,137 @@
+"""
+Range statistics of a recording's normalized series from indexes built once per series.
+
+count, mean and std come from prefix sums of the (centered) values and their squares, mean
+absolute velocity from a prefix sum of |dx/dt| between consecutive samples: each is two lookups.
+min and max come from sparse tables over blocks of BLOCK_SIZE samples, plus a scan of the two
+partial blocks at the ends of the range, which keeps the index at O(n) memory instead of
+O(n log n). Percentiles have no such decomposition and are computed on the in-memory slice.
+"""
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+BLOCK_SIZE = 32
+DEFAULT_PERCENTILES = (5.0, 25.0, 50.0, 75.0, 95.0)
+
+
+def _sparse_table(values: np.ndarray, reduce) -> List[np.ndarray]:
+    """levels[k][i] = reduce(values[i:i + 2**k])"""
+    levels = [values]
+    width = 1
+    while 2 * width <= len(values):
+        previous = levels[-1]
+        levels.append(reduce(previous[:-width], previous[width:]))
+        width *= 2
+    return levels
+
+
+def _sparse_query(levels: List[np.ndarray], start: int, end: int, reduce) -> float:
+    """reduce(values[start:end]) for a non-empty range"""
+    level = (end - start).bit_length() - 1
+    return reduce(levels[level][start], levels[level][end - (1 << level)])
+
+
+class RangeIndex:
+    """Indexes over one (timestamps, values) series, ordered by timestamp"""
+
+    def __init__(self, timestamps: np.ndarray, values: np.ndarray):
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float64)
+        n = len(self.values)
+
+        # Centering keeps the sum of squares from cancelling catastrophically
+        self.offset = float(self.values.mean()) if n else 0.0
+        centered = self.values - self.offset
+        self.prefix_sum = np.concatenate(([0.0], np.cumsum(centered)))
+        self.prefix_squares = np.concatenate(([0.0], np.cumsum(centered * centered)))
+
+        # Velocity of the step from sample i to i + 1, in normalized units per second;
+        # steps between samples with the same timestamp are left out
+        seconds = np.diff(self.timestamps) / 1000.0
+        valid = seconds > 0
+        speeds = np.zeros(max(n - 1, 0))
+        speeds[valid] = np.abs(np.diff(self.values)[valid] / seconds[valid])
+        self.prefix_speed = np.concatenate(([0.0], np.cumsum(speeds)))
+        self.prefix_steps = np.concatenate(([0], np.cumsum(valid)))
+
+        block_count = -(-n // BLOCK_SIZE)
+        padded = np.full(block_count * BLOCK_SIZE, np.nan)
+        padded[:n] = self.values
+        blocks = padded.reshape(block_count, BLOCK_SIZE)
+        self.block_min = _sparse_table(np.nanmin(blocks, axis=1), np.minimum) if block_count else []
+        self.block_max = _sparse_table(np.nanmax(blocks, axis=1), np.maximum) if block_count else []
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def bounds(self, start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> tuple:
+        """[start, end) sample indexes of the samples within [start_ts, end_ts]"""
+        start = 0 if start_ts is None else int(np.searchsorted(self.timestamps, start_ts, side='left'))
+        end = len(self) if end_ts is None else int(np.searchsorted(self.timestamps, end_ts, side='right'))
+        return start, max(start, end)
+
+    def _extreme(self, start: int, end: int, levels: List[np.ndarray], reduce) -> float:
+        first_block = -(-start // BLOCK_SIZE)
+        last_block = end // BLOCK_SIZE
+        if first_block >= last_block:
+            return float(reduce.reduce(self.values[start:end]))
+        candidates = [_sparse_query(levels, first_block, last_block, reduce)]
+        if start < first_block * BLOCK_SIZE:
+            candidates.append(reduce.reduce(self.values[start:first_block * BLOCK_SIZE]))
+        if last_block * BLOCK_SIZE < end:
+            candidates.append(reduce.reduce(self.values[last_block * BLOCK_SIZE:end]))
+        return float(reduce.reduce(candidates))
+
+    def stats(self, start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+              percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> dict:
+        start, end = self.bounds(start_ts, end_ts)
+        count = end - start
+        if count == 0:
+            return {
+                'count': 0,
+                'mean': None,
+                'std': None,
+                'min': None,
+                'max': None,
+                'percentiles': {_percentile_key(p): None for p in percentiles},
+                'mean_abs_velocity': None
+            }
+
+        centered_mean = (self.prefix_sum[end] - self.prefix_sum[start]) / count
+        variance = (self.prefix_squares[end] - self.prefix_squares[start]) / count - centered_mean * centered_mean
+        steps = int(self.prefix_steps[end - 1] - self.prefix_steps[start])
+        speed = self.prefix_speed[end - 1] - self.prefix_speed[start]
+        values = np.percentile(self.values[start:end], percentiles) if len(percentiles) else []
+
+        return {
+            'count': count,
+            'mean': float(centered_mean + self.offset),
+            'std': float(np.sqrt(max(variance, 0.0))),
+            'min': self._extreme(start, end, self.block_min, np.minimum),
+            'max': self._extreme(start, end, self.block_max, np.maximum),
+            'percentiles': {_percentile_key(p): float(v) for p, v in zip(percentiles, values)},
+            'mean_abs_velocity': float(speed / steps) if steps else None
+        }
+
+
+def _percentile_key(percentile: float) -> str:
+    return f"{percentile:g}"
+
+
+def parse_percentiles(text: Optional[str]) -> List[float]:
+    """'5,50,95' to [5.0, 50.0, 95.0]"""
+    if text is None:
+        return list(DEFAULT_PERCENTILES)
+    percentiles = []
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        try:
+            percentile = float(part)
+        except ValueError:
+            raise ValueError(f"Invalid percentile '{part.strip()}'")
+        if not 0 <= percentile <= 100:
+            raise ValueError("Percentiles must be between 0 and 100")
+        percentiles.append(percentile)
+    return percentiles
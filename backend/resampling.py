@@ -0,0 +1,98 @@
+"""
+Resampling of recording series onto a uniform time grid.
+
+Frames come from the browser's detection loop: timestamps jitter and frames get dropped. The grid
+starts at the first sample and steps by 1000 / rate_hz ms; each grid point is linearly interpolated
+between the samples around it, unless they are more than max_gap_ms apart, in which case it is NaN
+(null in JSON) instead of a line bridging the gap. Grid timestamps are rounded to the millisecond.
+"""
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from normalization import EyeArrays
+
+DEFAULT_MAX_GAP_MS = 100
+MAX_RATE_HZ = 1000.0
+# Refuse grids larger than this, which only a wrong rate or corrupted timestamps would need
+MAX_RESAMPLED_POINTS = 10_000_000
+
+
+def validate_resampling(rate_hz: Optional[float], max_gap_ms: int) -> None:
+    """Raise ValueError for a rate or gap threshold out of range"""
+    if rate_hz is None:
+        return
+    if not 0 < rate_hz <= MAX_RATE_HZ:
+        raise ValueError(f"resample_hz must be between 0 and {MAX_RATE_HZ:g}")
+    if max_gap_ms <= 0:
+        raise ValueError("max_gap_ms must be positive")
+
+
+def uniform_grid(timestamps: np.ndarray, rate_hz: float) -> np.ndarray:
+    """Grid times (float ms) from the first to the last timestamp, 1000 / rate_hz ms apart"""
+    if len(timestamps) == 0:
+        return np.empty(0, dtype=np.float64)
+    step = 1000.0 / rate_hz
+    count = int((timestamps[-1] - timestamps[0]) // step) + 1
+    if count > MAX_RESAMPLED_POINTS:
+        raise ValueError(f"Resampling at {rate_hz:g} Hz would produce {count} points, more than {MAX_RESAMPLED_POINTS}")
+    return timestamps[0] + np.arange(count) * step
+
+
+def resample(timestamps: np.ndarray, values: np.ndarray, rate_hz: float,
+             max_gap_ms: int = DEFAULT_MAX_GAP_MS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Interpolate values (shape (n,) or (n, k), ordered by timestamp) onto the uniform grid.
+    Returns (int64 grid timestamps, values), NaN on grid points inside gaps longer than max_gap_ms.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+
+    # Interpolation needs increasing times: keep the first sample of duplicated timestamps
+    timestamps, first = np.unique(timestamps, return_index=True)
+    values = values[first]
+
+    grid = uniform_grid(timestamps, rate_hz)
+    if len(grid) == 0:
+        return np.empty(0, dtype=np.int64), values[:0]
+
+    columns = values.reshape(len(timestamps), -1)
+    resampled = np.empty((len(grid), columns.shape[1]))
+    for column in range(columns.shape[1]):
+        resampled[:, column] = np.interp(grid, timestamps, columns[:, column])
+
+    # Samples on both sides of each grid point; a grid point on a sample is never in a gap
+    after = np.minimum(np.searchsorted(timestamps, grid, side='right'), len(timestamps) - 1)
+    before = np.maximum(after - 1, 0)
+    on_sample = timestamps[before] == grid
+    in_gap = (timestamps[after] - timestamps[before] > max_gap_ms) & ~on_sample
+    resampled[in_gap] = np.nan
+
+    return np.round(grid).astype(np.int64), resampled.reshape((len(grid),) + values.shape[1:])
+
+
+def resample_eye(eye: EyeArrays, rate_hz: float, max_gap_ms: int = DEFAULT_MAX_GAP_MS) -> EyeArrays:
+    """Raw landmark coordinates of one eye on the uniform grid, NaN inside gaps"""
+    coordinates = np.concatenate((eye.iris, eye.corner_left, eye.corner_right), axis=1)
+    timestamps, coordinates = resample(eye.timestamps, coordinates, rate_hz, max_gap_ms)
+    return EyeArrays(
+        timestamps=timestamps,
+        iris=np.ascontiguousarray(coordinates[:, 0:3]),
+        corner_left=np.ascontiguousarray(coordinates[:, 3:6]),
+        corner_right=np.ascontiguousarray(coordinates[:, 6:9]),
+    )
+
+
+def finite_segments(values: np.ndarray) -> np.ndarray:
+    """(start, end) index pairs of the runs of finite values"""
+    finite = np.concatenate(([False], np.isfinite(values), [False]))
+    edges = np.flatnonzero(np.diff(finite.astype(np.int8)))
+    return edges.reshape(-1, 2)
+
+
+def apply_per_segment(values: np.ndarray, transform: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+    """Apply a series transform (a filter) to each run of finite values separately, leaving the gaps NaN"""
+    output = np.full(len(values), np.nan)
+    for start, end in finite_segments(values):
+        output[start:end] = transform(values[start:end])
+    return output
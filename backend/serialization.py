@@ -0,0 +1,207 @@
+"""
+Response encodings of recording time series, and the binary recording upload layout.
+
+Binary series layout (SERIES_MEDIA_TYPE), all little-endian:
+
+    offset  size  content
+    0       4     magic b"ETS1"
+    4       4     uint32 n, number of samples
+    8       8*n   int64 timestamps, in ms
+    8+8*n   4*n   float32 normalized values
+
+Timestamps come first so that they stay 8-byte aligned, and both blocks can be read with
+numpy.frombuffer (or a JavaScript BigInt64Array / Float32Array) without copying.
+
+NDJSON (NDJSON_MEDIA_TYPE) streams one {"timestamp": ..., "x": ...} object per line.
+
+Binary recording upload layout (RECORDING_MEDIA_TYPE), all little-endian:
+
+    offset  size    content
+    0       4       magic b"ETR1"
+    4       4       uint32 flags: 1 confidence block, 2 left eye block, 4 right eye block
+    8       8       int64 recording number
+    16      4       uint32 n, number of frames
+    20      4       reserved, 0
+    24      8*n     int64 timestamps, in ms
+            4*n     float32 confidence, NaN where unknown (flag 1)
+            4*9*n   float32 left eye: one block of n values per EYE_COLUMNS coordinate, in that
+                    order, NaN in frames without the eye (flag 2)
+            4*9*n   float32 right eye, same layout (flag 4)
+
+The blocks are decoded with numpy.frombuffer, without copying the body.
+"""
+import json
+import struct
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ingest import EYE_COLUMNS, EYE_KEYS
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow IPC is optional
+    pa = None
+
+JSON_MEDIA_TYPE = "application/json"
+SERIES_MEDIA_TYPE = "application/vnd.eyetracking.series"
+OCTET_STREAM_MEDIA_TYPE = "application/octet-stream"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+RECORDING_MEDIA_TYPE = "application/vnd.eyetracking.recording"
+
+SERIES_MAGIC = b"ETS1"
+_SERIES_HEADER = struct.Struct("<4sI")
+
+RECORDING_MAGIC = b"ETR1"
+_RECORDING_HEADER = struct.Struct("<4sIqII")
+RECORDING_CONFIDENCE = 1
+RECORDING_EYE_FLAGS = {'left': 2, 'right': 4}
+
+
+def supported_media_types() -> Tuple[str, ...]:
+    media_types = (JSON_MEDIA_TYPE, SERIES_MEDIA_TYPE, OCTET_STREAM_MEDIA_TYPE, NDJSON_MEDIA_TYPE)
+    if pa is not None:
+        media_types += (ARROW_MEDIA_TYPE,)
+    return media_types
+
+
+def negotiate_series_format(accept: Optional[str]) -> str:
+    """
+    Pick the response media type from an Accept header, honouring q-values. JSON is the default,
+    including for */* and for headers that only list unsupported types.
+    """
+    if not accept:
+        return JSON_MEDIA_TYPE
+
+    supported = supported_media_types()
+    best, best_quality = JSON_MEDIA_TYPE, 0.0
+    for entry in accept.split(","):
+        media_type, *parameters = [part.strip() for part in entry.split(";")]
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type.lower() in supported and quality > best_quality:
+            best, best_quality = media_type.lower(), quality
+    return best
+
+
+def encode_series(timestamps: np.ndarray, values: np.ndarray) -> bytes:
+    """Encode a series in the binary layout described above, straight from the arrays"""
+    n = len(timestamps)
+    return b"".join((
+        _SERIES_HEADER.pack(SERIES_MAGIC, n),
+        np.ascontiguousarray(timestamps, dtype="<i8").tobytes(),
+        np.ascontiguousarray(values, dtype="<f4").tobytes(),
+    ))
+
+
+def decode_series(buffer: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """Decode the binary layout into (timestamps, values) arrays without copying, raising ValueError on a malformed buffer"""
+    if len(buffer) < _SERIES_HEADER.size:
+        raise ValueError("Series buffer is shorter than its header")
+    magic, n = _SERIES_HEADER.unpack_from(buffer, 0)
+    if magic != SERIES_MAGIC:
+        raise ValueError("Not an eye tracking series buffer")
+    expected = _SERIES_HEADER.size + 12 * n
+    if len(buffer) != expected:
+        raise ValueError(f"Series buffer has {len(buffer)} bytes, {expected} expected for {n} samples")
+    offset = _SERIES_HEADER.size
+    timestamps = np.frombuffer(buffer, dtype="<i8", count=n, offset=offset)
+    values = np.frombuffer(buffer, dtype="<f4", count=n, offset=offset + 8 * n)
+    return timestamps, values
+
+
+@dataclass
+class BinaryRecording:
+    """Decoded binary recording upload. Arrays are read-only views of the request body."""
+    recording_number: int
+    timestamps: np.ndarray                                   # int64, shape (n,)
+    confidence: Optional[np.ndarray]                         # float32, shape (n,)
+    eyes: Dict[str, Optional[Dict[str, np.ndarray]]]         # eye side -> EYE_COLUMNS -> float32 (n,)
+
+
+def encode_recording(recording_number: int, timestamps: np.ndarray, confidence: Optional[np.ndarray],
+                     eyes: Dict[str, Optional[np.ndarray]]) -> bytes:
+    """Encode a recording in the binary upload layout; each eye is a (9, n) array in EYE_COLUMNS order, or None"""
+    n = len(timestamps)
+    flags = 0 if confidence is None else RECORDING_CONFIDENCE
+    blocks = [np.ascontiguousarray(timestamps, dtype="<i8").tobytes()]
+    if confidence is not None:
+        blocks.append(np.ascontiguousarray(confidence, dtype="<f4").tobytes())
+    for eye_side, _ in EYE_KEYS:
+        if eyes.get(eye_side) is not None:
+            flags |= RECORDING_EYE_FLAGS[eye_side]
+            blocks.append(np.ascontiguousarray(eyes[eye_side], dtype="<f4").reshape(len(EYE_COLUMNS), n).tobytes())
+    return _RECORDING_HEADER.pack(RECORDING_MAGIC, flags, recording_number, n, 0) + b"".join(blocks)
+
+
+def decode_recording(buffer: bytes) -> BinaryRecording:
+    """Decode the binary upload layout, raising ValueError on a malformed body"""
+    if len(buffer) < _RECORDING_HEADER.size:
+        raise ValueError("Binary recording body is shorter than its header")
+    magic, flags, recording_number, n, _ = _RECORDING_HEADER.unpack_from(buffer, 0)
+    if magic != RECORDING_MAGIC:
+        raise ValueError("Not an eye tracking recording buffer")
+    if flags & ~(RECORDING_CONFIDENCE | sum(RECORDING_EYE_FLAGS.values())):
+        raise ValueError(f"Unknown binary recording flags {flags:#x}")
+
+    eye_sides = [eye_side for eye_side, _ in EYE_KEYS if flags & RECORDING_EYE_FLAGS[eye_side]]
+    expected = _RECORDING_HEADER.size + 8 * n + 4 * n * (bool(flags & RECORDING_CONFIDENCE) + len(EYE_COLUMNS) * len(eye_sides))
+    if len(buffer) != expected:
+        raise ValueError(f"Binary recording body has {len(buffer)} bytes, {expected} expected for {n} frames")
+
+    offset = _RECORDING_HEADER.size
+    timestamps = np.frombuffer(buffer, dtype="<i8", count=n, offset=offset)
+    offset += 8 * n
+    confidence = None
+    if flags & RECORDING_CONFIDENCE:
+        confidence = np.frombuffer(buffer, dtype="<f4", count=n, offset=offset)
+        offset += 4 * n
+    eyes: Dict[str, Optional[Dict[str, np.ndarray]]] = {eye_side: None for eye_side, _ in EYE_KEYS}
+    for eye_side in eye_sides:
+        block = np.frombuffer(buffer, dtype="<f4", count=len(EYE_COLUMNS) * n, offset=offset).reshape(len(EYE_COLUMNS), n)
+        eyes[eye_side] = dict(zip(EYE_COLUMNS, block))
+        offset += 4 * len(EYE_COLUMNS) * n
+    return BinaryRecording(recording_number, timestamps, confidence, eyes)
+
+
+def encode_series_arrow(timestamps: np.ndarray, values: np.ndarray) -> bytes:
+    """Encode a series as an Arrow IPC stream with int64 'timestamp' and float32 'x' columns"""
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed")
+    batch = pa.record_batch([
+        pa.array(np.asarray(timestamps, dtype=np.int64)),
+        pa.array(np.asarray(values, dtype=np.float32)),
+    ], names=["timestamp", "x"])
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_series_as(media_type: str, timestamps: np.ndarray, values: np.ndarray) -> bytes:
+    """Encode a series for one of the binary media types"""
+    if media_type == ARROW_MEDIA_TYPE:
+        return encode_series_arrow(timestamps, values)
+    return encode_series(timestamps, values)
+
+
+def encode_series_ndjson(timestamps: np.ndarray, values: np.ndarray) -> str:
+    """Encode a chunk of a series as NDJSON lines"""
+    return "".join(
+        json.dumps({"timestamp": timestamp, "x": x}) + "\n"
+        for timestamp, x in zip(timestamps.tolist(), values.tolist())
+    )
+
+
+def encode_ndjson(items: List[dict]) -> str:
+    """Encode a chunk of objects as NDJSON lines"""
+    return "".join(json.dumps(item) + "\n" for item in items)
@@ -1,17 +1,204 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from database import EyeTrackingData, CalibrationData
-from typing import List, Optional
+from sqlalchemy import select, Table
+from database import EyeTrackingData, CalibrationData, RecordingCatalog, SessionCatalog
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
 from datetime import datetime
-from utils import get_euclidean_distance, calculate_normalized_position, apply_noise_reduction_to_normalized_data
+import asyncio
+import os
+import time
+import numpy as np
+from ingest import BULK_INGEST, eye_dict, IngestStats, bulk_insert, positions_to_columns, calibration_to_columns, column_length
+from catalog import (SESSION_FIELDS, encode_session_cursor, record_recording_ingest, record_calibration_ingest,
+                     recording_data_points, remove_session_recordings, session_page_query, session_recording_numbers, validate_session_listing)
+from normalization import CalibrationReference, calibration_references, eye_arrays_from_rows, normalize_eye, normalized_values, series_eye
+from cache import MISSING, calibration_cache, event_cache, pyramid_cache, range_index_cache
+from storage import ROW_STORAGE, STORAGES, recording_storage, storage_for_write
+from derived import (can_extend_normalized, has_current_normalized, normalized_series_query, remove_normalized,
+                     series_from_rows, store_normalized)
+from filters import DEFAULT_FILTER, DEFAULT_WINDOW, ChunkedFilter, apply_filter, validate_filter
+from downsampling import DEFAULT_DOWNSAMPLER, downsample, validate_downsampler
+from range_stats import DEFAULT_PERCENTILES, RangeIndex
+from pyramid import PYRAMID_METHODS, Pyramid, load_pyramid, remove_pyramids, save_pyramid
+from events import EventParameters, detect_events, validate_event_parameters
+from resampling import DEFAULT_MAX_GAP_MS, apply_per_segment, resample, resample_eye, validate_resampling
+from jobs import INGEST_JOBS, enqueue_jobs, has_pending_job, notify_workers, remove_jobs
+
+# Rows fetched per round trip by the streaming readers
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "5000"))
+# Series of at least this many samples are processed in a worker thread, so that the event loop keeps serving requests
+OFFLOAD_MIN_SAMPLES = int(os.getenv("OFFLOAD_MIN_SAMPLES", "10000"))
+
+async def offload(samples: int, function, *args):
+    """
+    Call a CPU-bound function on a series of `samples` samples, in a worker thread when the series is long.
+    NumPy releases the GIL in its loops, so other requests progress meanwhile.
+    """
+    if samples >= OFFLOAD_MIN_SAMPLES:
+        return await asyncio.to_thread(function, *args)
+    return function(*args)
+
+def process_series(timestamps: np.ndarray, values: np.ndarray, noise_reduction: bool, filter_name: str, window: int,
+                   max_points: Optional[int], downsample_method: str, resample_hz: Optional[float],
+                   max_gap_ms: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Resample, smooth and downsample a normalized series, see EyeTrackingService.get_recording_arrays
+    """
+    if resample_hz is not None:
+        timestamps, values = resample(timestamps, values, resample_hz, max_gap_ms)
+    
+    # Apply noise reduction if requested, without smoothing across gaps
+    if noise_reduction:
+        if resample_hz is not None:
+            values = apply_per_segment(values, lambda segment: apply_filter(segment, filter_name, window))
+        else:
+            values = apply_filter(values, filter_name, window)
+    
+    # Smooth at full resolution, then reduce to the point budget. Gap markers are not points.
+    if max_points is not None:
+        if resample_hz is not None:
+            finite = np.isfinite(values)
+            timestamps, values = timestamps[finite], values[finite]
+        timestamps, values = downsample(timestamps, values, max_points, downsample_method)
+    
+    return timestamps, values
+
+def detect_eye_events(eye_arrays, reference: Optional[CalibrationReference], parameters: EventParameters) -> dict:
+    """
+    Detect the events of one eye's raw rows, see EyeTrackingService.get_recording_events
+    """
+    if reference is None:
+        eye_arrays = eye_arrays_from_rows([])
+    elif parameters.resample_hz is not None:
+        eye_arrays = resample_eye(eye_arrays, parameters.resample_hz, parameters.max_gap_ms)
+    values = normalized_values(eye_arrays, reference) if len(eye_arrays) else np.empty(0)
+    return detect_events(eye_arrays, values, parameters)
 
 class EyeTrackingService:
     def __init__(self, db: AsyncSession):
         self.db = db
+        self.last_ingest_stats: Optional[IngestStats] = None
+        # Jobs enqueued by the last ingest
+        self.last_job_ids: List[str] = []
+    
+    async def store_recording_data(self, session_id: str, recording_number: int, positions: List[dict],
+                                   queue_jobs: bool = True) -> int:
+        """
+        Store recording data in the configured storage format (one multi-row INSERT per chunk of rows,
+        or packed column arrays), and update the catalog
+        """
+        started = time.perf_counter()
+        columns = positions_to_columns(session_id, recording_number, positions)
+        return await self.store_recording_columns(session_id, recording_number, columns, positions, started, queue_jobs)
     
-    async def store_recording_data(self, session_id: str, recording_number: int, positions: List[dict]) -> int:
+    async def store_recording_columns(self, session_id: str, recording_number: int, columns: Dict[str, list],
+                                      positions: Optional[List[dict]] = None, started: Optional[float] = None,
+                                      queue_jobs: bool = True) -> int:
         """
-        Store recording data in flattened format
+        Store recording data already in column batches (see ingest.positions_to_columns), and update the catalog.
+        The per-row ORM path needs the original positions: without them, rows are always bulk inserted.
+        Unless queue_jobs is False, the INGEST_JOBS of the recording are enqueued in the same transaction
+        (see jobs.py), and their ids left in last_job_ids.
+        """
+        started = time.perf_counter() if started is None else started
+        
+        # Partitions are created in their own transaction, before this one touches eye_tracking_data
+        await ROW_STORAGE.prepare(self.db, columns)
+        storage = await storage_for_write(self.db, session_id, recording_number)
+        if storage is ROW_STORAGE and not BULK_INGEST and positions is not None:
+            await self._store_recording_data_orm(session_id, recording_number, positions)
+            statements = None
+        else:
+            statements = await storage.store(self.db, session_id, recording_number, columns)
+        timestamps, eye_sides = columns['timestamp'], columns['eye_side']
+        
+        await record_recording_ingest(self.db, session_id, recording_number, timestamps, eye_sides)
+        
+        # Normalize once at ingest when the session is already calibrated, otherwise
+        # store_calibration_data backfills the recording later
+        references = await self.get_calibration_references(session_id)
+        normalize_jobs = []
+        if timestamps and any(reference is not None for reference in references.values()):
+            if (not await has_pending_job(self.db, session_id, recording_number, "normalize")
+                    and await can_extend_normalized(self.db, session_id, recording_number, len(timestamps))):
+                await store_normalized(self.db, session_id, recording_number, columns, references)
+            else:
+                # The earlier frames are not normalized yet (the calibration changed): a stored series of this
+                # batch alone would hide them. Playback normalizes the raw rows until the job covers them all.
+                normalize_jobs = ["normalize"]
+        await remove_pyramids(self.db, session_id, recording_number)
+        
+        # Pyramids, statistics and events are computed by the background workers
+        self.last_job_ids = await enqueue_jobs(self.db, session_id, recording_number,
+                                               normalize_jobs + (INGEST_JOBS if queue_jobs else []))
+        
+        await self.db.commit()
+        range_index_cache.invalidate_where(lambda key: key[:2] == (session_id, recording_number))
+        pyramid_cache.invalidate_where(lambda key: key[:2] == (session_id, recording_number))
+        event_cache.invalidate_where(lambda key: key[:2] == (session_id, recording_number))
+        if self.last_job_ids:
+            notify_workers()
+        
+        return self._record_ingest_stats(storage.table, len(timestamps), statements, started)
+    
+    async def store_calibration_data(self, session_id: str, calibration_points: List[dict]) -> int:
+        """
+        Store calibration data in the dedicated calibration table, one multi-row INSERT per chunk, and update the catalog
+        """
+        started = time.perf_counter()
+        
+        if BULK_INGEST:
+            columns = calibration_to_columns(session_id, calibration_points)
+            statements = await bulk_insert(self.db, CalibrationData.__table__, columns)
+            stored_count = column_length(columns)
+        else:
+            stored_count = await self._store_calibration_data_orm(session_id, calibration_points)
+            statements = None
+        
+        await record_calibration_ingest(self.db, session_id)
+        
+        # The background workers recompute the normalized series of the recordings stored so far with the
+        # new references, and what derives from them; until then, playback normalizes the raw rows
+        await remove_normalized(self.db, session_id)
+        await remove_pyramids(self.db, session_id)
+        self.last_job_ids = []
+        for recording_number in await session_recording_numbers(self.db, session_id):
+            self.last_job_ids += await enqueue_jobs(self.db, session_id, recording_number, ["normalize", *INGEST_JOBS])
+        
+        await self.db.commit()
+        calibration_cache.invalidate(session_id)
+        range_index_cache.invalidate_where(lambda key: key[0] == session_id)
+        pyramid_cache.invalidate_where(lambda key: key[0] == session_id)
+        event_cache.invalidate_where(lambda key: key[0] == session_id)
+        if self.last_job_ids:
+            notify_workers()
+        
+        return self._record_ingest_stats(CalibrationData.__table__, stored_count, statements, started)
+    
+    async def enqueue_recording_jobs(self, session_id: str, recording_number: int) -> List[str]:
+        """
+        Enqueue the INGEST_JOBS of a recording stored with queue_jobs=False, and return their ids
+        """
+        job_ids = await enqueue_jobs(self.db, session_id, recording_number, INGEST_JOBS)
+        await self.db.commit()
+        notify_workers()
+        return job_ids
+    
+    def _record_ingest_stats(self, table: Table, rows: int, statements: Optional[int], started: float) -> int:
+        """
+        Record and log the ingest throughput, including the commit
+        """
+        self.last_ingest_stats = IngestStats(
+            table=table.name,
+            rows=rows,
+            statements=statements,
+            seconds=time.perf_counter() - started
+        )
+        print(f"{'Bulk' if statements is not None else 'ORM'} ingest {self.last_ingest_stats}")
+        return rows
+    
+    async def _store_recording_data_orm(self, session_id: str, recording_number: int, positions: List[dict]) -> int:
+        """
+        Store recording data in flattened format, one ORM object per eye per frame
         """
         stored_count = 0
         
@@ -71,12 +258,12 @@ class EyeTrackingService:
                 self.db.add(right_record)
                 stored_count += 1
         
-        await self.db.commit()
+        await self.db.flush()
         return stored_count
     
-    async def store_calibration_data(self, session_id: str, calibration_points: List[dict]) -> int:
+    async def _store_calibration_data_orm(self, session_id: str, calibration_points: List[dict]) -> int:
         """
-        Store calibration data in the dedicated calibration table
+        Store calibration data in the dedicated calibration table, one ORM object per eye per point
         """
         stored_count = 0
         
@@ -139,144 +326,258 @@ class EyeTrackingService:
                 self.db.add(right_record)
                 stored_count += 1
         
-        await self.db.commit()
+        await self.db.flush()
         return stored_count
     
     async def get_session_data(self, session_id: str) -> List[dict]:
         """
-        Get all data for a session
+        Get all data for a session, from every storage format
         """
-        query = select(EyeTrackingData).where(EyeTrackingData.session_id == session_id)
-        result = await self.db.execute(query)
-        records = result.scalars().all()
-        
-        # Group by timestamp and reconstruct the original format
-        data_by_timestamp = {}
-        for record in records:
-            if record.timestamp not in data_by_timestamp:
-                data_by_timestamp[record.timestamp] = {
-                    'timestamp': record.timestamp,
-                    'confidence': record.confidence,
-                    'leftEye': None,
-                    'rightEye': None
-                }
-            
-            eye_data = {
-                'center': {
-                    'x': record.iris_x,
-                    'y': record.iris_y,
-                    'z': record.iris_z
-                },
-                'corners': [
-                    {
-                        'x': record.corner_left_x,
-                        'y': record.corner_left_y,
-                        'z': record.corner_left_z
-                    },
-                    {
-                        'x': record.corner_right_x,
-                        'y': record.corner_right_y,
-                        'z': record.corner_right_z
+        return [
+            position
+            async for positions in self.stream_session_data(session_id)
+            for position in positions
+        ]
+    
+    async def stream_session_data(self, session_id: str, chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[List[dict]]:
+        """
+        Same positions as get_session_data, read through a server-side cursor and yielded in lists of
+        about chunk_size positions. Positions are ordered by timestamp within each storage format, and
+        the recordings stored as rows come first.
+        """
+        # Both eyes of a frame are adjacent, but may straddle two partitions
+        current = None
+        async for rows in self._stream_session_rows(session_id, chunk_size):
+            positions = []
+            for timestamp, eye_side, confidence, *coordinates in rows:
+                if current is None or current['timestamp'] != timestamp:
+                    if current is not None:
+                        positions.append(current)
+                    current = {
+                        'timestamp': timestamp,
+                        'confidence': confidence,
+                        'leftEye': None,
+                        'rightEye': None
                     }
-                ]
-            }
-            
-            if record.eye_side == 'left':
-                data_by_timestamp[record.timestamp]['leftEye'] = eye_data
-            else:
-                data_by_timestamp[record.timestamp]['rightEye'] = eye_data
+                current['leftEye' if eye_side == 'left' else 'rightEye'] = eye_dict(coordinates)
+            if positions:
+                yield positions
         
-        return list(data_by_timestamp.values())
+        if current is not None:
+            yield [current]
+    
+    async def _stream_session_rows(self, session_id: str, chunk_size: int) -> AsyncIterator[List[tuple]]:
+        for storage in STORAGES.values():
+            async for rows in storage.stream_session(self.db, session_id, chunk_size):
+                yield rows
     
-    async def get_recording_data(self, session_id: str, recording_number: int, eye: str = "both", noise_reduction: bool = False) -> List[dict]:
+    async def get_recording_series(self, session_id: str, recording_number: int, eye: str = "both",
+                                   start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Get normalized X positions for a specific recording with optional filtering and noise reduction
+        Get the normalized X series of a recording as (timestamps, values) arrays ordered by timestamp,
+        optionally restricted to [start_ts, end_ts]
         """
-        # Get calibration data for normalization
-        calibration_data = await self.get_calibration_data(session_id)
+        eye_side = series_eye(eye)
+        reference = (await self.get_calibration_references(session_id))[eye_side]
+        if reference is None:
+            return normalize_eye(eye_arrays_from_rows([]), None)
         
-        # Build query based on eye filter
-        if eye == "left":
-            query = select(EyeTrackingData).where(
-                EyeTrackingData.session_id == session_id,
-                EyeTrackingData.recording_number == recording_number,
-                EyeTrackingData.eye_side == 'left'
-            )
-        elif eye == "right":
-            query = select(EyeTrackingData).where(
-                EyeTrackingData.session_id == session_id,
-                EyeTrackingData.recording_number == recording_number,
-                EyeTrackingData.eye_side == 'right'
-            )
-        else:  # "both"
-            query = select(EyeTrackingData).where(
-                EyeTrackingData.session_id == session_id,
-                EyeTrackingData.recording_number == recording_number
-            )
+        if await has_current_normalized(self.db, session_id, recording_number):
+            query = normalized_series_query(session_id, recording_number, eye_side, start_ts, end_ts)
+            result = await self.db.execute(query)
+            return series_from_rows(result.all())
         
-        result = await self.db.execute(query)
-        records = result.scalars().all()
+        storage = await recording_storage(self.db, session_id, recording_number)
+        eye_arrays = await storage.read_eye(self.db, session_id, recording_number, eye_side, start_ts, end_ts)
         
-        # Group by timestamp and reconstruct the original format
-        data_by_timestamp = {}
-        for record in records:
-            if record.timestamp not in data_by_timestamp:
-                data_by_timestamp[record.timestamp] = {
-                    'timestamp': record.timestamp,
-                    'confidence': record.confidence,
-                    'leftEye': None,
-                    'rightEye': None
-                }
-            
-            eye_data = {
-                'center': {
-                    'x': record.iris_x,
-                    'y': record.iris_y,
-                    'z': record.iris_z
-                },
-                'corners': [
-                    {
-                        'x': record.corner_left_x,
-                        'y': record.corner_left_y,
-                        'z': record.corner_left_z
-                    },
-                    {
-                        'x': record.corner_right_x,
-                        'y': record.corner_right_y,
-                        'z': record.corner_right_z
-                    }
-                ]
-            }
-            
-            if record.eye_side == 'left':
-                data_by_timestamp[record.timestamp]['leftEye'] = eye_data
-            else:
-                data_by_timestamp[record.timestamp]['rightEye'] = eye_data
+        return await offload(len(eye_arrays), normalize_eye, eye_arrays, reference)
+    
+    async def stream_recording_arrays(self, session_id: str, recording_number: int, eye: str = "both", noise_reduction: bool = False,
+                                      filter_name: str = DEFAULT_FILTER, window: int = DEFAULT_WINDOW,
+                                      start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                                      chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Same series as get_recording_arrays (without downsampling), read through a server-side cursor
+        and normalized and smoothed chunk by chunk, so memory does not grow with the recording length
+        """
+        smoother = ChunkedFilter(filter_name, window) if noise_reduction else None
+        
+        eye_side = series_eye(eye)
+        reference = (await self.get_calibration_references(session_id))[eye_side]
+        if reference is None:
+            return
+        
+        async for timestamps, values in self._stream_normalized(session_id, recording_number, eye_side, reference,
+                                                               start_ts, end_ts, chunk_size):
+            if smoother is not None:
+                timestamps, values = smoother.push(timestamps, values)
+            if len(timestamps):
+                yield timestamps, values
+        
+        if smoother is not None:
+            timestamps, values = smoother.push(np.empty(0, dtype=np.int64), np.empty(0), final=True)
+            if len(timestamps):
+                yield timestamps, values
+    
+    async def _stream_normalized(self, session_id: str, recording_number: int, eye_side: str, reference: CalibrationReference,
+                                 start_ts: Optional[int], end_ts: Optional[int], chunk_size: int) -> AsyncIterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Normalized series of one eye in chunks, from the precomputed series when it is up to date
+        """
+        if await has_current_normalized(self.db, session_id, recording_number):
+            query = normalized_series_query(session_id, recording_number, eye_side, start_ts, end_ts)
+            result = await self.db.stream(query.execution_options(yield_per=chunk_size))
+            async for rows in result.partitions():
+                yield series_from_rows(rows)
+            return
         
+        storage = await recording_storage(self.db, session_id, recording_number)
+        async for eye_arrays in storage.stream_eye(self.db, session_id, recording_number, eye_side, start_ts, end_ts, chunk_size):
+            yield normalize_eye(eye_arrays, reference)
+    
+    async def get_recording_arrays(self, session_id: str, recording_number: int, eye: str = "both", noise_reduction: bool = False,
+                                   filter_name: str = DEFAULT_FILTER, window: int = DEFAULT_WINDOW,
+                                   start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                                   max_points: Optional[int] = None, downsample_method: str = DEFAULT_DOWNSAMPLER,
+                                   resample_hz: Optional[float] = None, max_gap_ms: int = DEFAULT_MAX_GAP_MS) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the normalized X series of a recording as (timestamps, values) arrays, with optional noise reduction,
+        restricted to a time range, resampled to a uniform grid (NaN inside gaps) and downsampled to at most max_points
+        """
+        if noise_reduction:
+            validate_filter(filter_name, window)
+        if max_points is not None:
+            validate_downsampler(downsample_method, max_points)
+        validate_resampling(resample_hz, max_gap_ms)
+        
+        # Zoomed-out views of the unsmoothed series are answered from the pyramid, without reading the range
+        if max_points is not None and not noise_reduction and resample_hz is None and downsample_method in PYRAMID_METHODS:
+            pyramid = await self.get_pyramid(session_id, recording_number, eye)
+            selected = pyramid.select(start_ts, end_ts, max_points, downsample_method)
+            if selected is not None:
+                return selected
+        
+        timestamps, values = await self.get_recording_series(session_id, recording_number, eye, start_ts, end_ts)
         
-        data = list(data_by_timestamp.values())
+        return await offload(
+            len(timestamps), process_series, timestamps, values, noise_reduction, filter_name, window,
+            max_points, downsample_method, resample_hz, max_gap_ms
+        )
+    
+    async def get_recording_data(self, session_id: str, recording_number: int, eye: str = "both", noise_reduction: bool = False,
+                                 filter_name: str = DEFAULT_FILTER, window: int = DEFAULT_WINDOW,
+                                 start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                                 max_points: Optional[int] = None, downsample_method: str = DEFAULT_DOWNSAMPLER,
+                                 resample_hz: Optional[float] = None, max_gap_ms: int = DEFAULT_MAX_GAP_MS) -> List[dict]:
+        """
+        Get normalized X positions for a specific recording with optional filtering and noise reduction,
+        restricted to a time range, resampled and downsampled to at most max_points. Gaps are null.
+        """
+        timestamps, values = await self.get_recording_arrays(
+            session_id, recording_number, eye, noise_reduction, filter_name, window,
+            start_ts, end_ts, max_points, downsample_method, resample_hz, max_gap_ms
+        )
         
-        # Convert to normalized X positions
-        normalized_data = []
-        for point in data:
-            normalized_position = calculate_normalized_position(point, calibration_data)
-            if normalized_position is not None:
-                normalized_data.append({
-                    'timestamp': point['timestamp'],
-                    'x': normalized_position
-                })
+        return [
+            {'timestamp': timestamp, 'x': None if np.isnan(x) else x}
+            for timestamp, x in zip(timestamps.tolist(), values.tolist())
+        ]
+    
+    async def get_pyramid(self, session_id: str, recording_number: int, eye: str = "both") -> Pyramid:
+        """
+        Get the downsampling pyramid of a recording's normalized series, from the pyramid cache, then the
+        database, or built from the whole series and stored on first use
+        """
+        eye_side = series_eye(eye)
+        key = (session_id, recording_number, eye_side)
+        pyramid = pyramid_cache.get(key)
+        if pyramid is not MISSING:
+            return pyramid
         
-        # Apply noise reduction if requested
+        pyramid = await load_pyramid(self.db, session_id, recording_number, eye_side)
+        if pyramid is None:
+            # Counted before the read: an ingest committing meanwhile leaves the stored pyramid stale, see load_pyramid
+            data_points = await recording_data_points(self.db, session_id, recording_number)
+            timestamps, values = await self.get_recording_series(session_id, recording_number, eye)
+            pyramid = await offload(len(values), Pyramid.build, timestamps, values)
+            # Without a calibration there is no series yet: nothing worth storing
+            if len(values) and data_points is not None:
+                await save_pyramid(self.db, session_id, recording_number, eye_side, pyramid, data_points)
+                await self.db.commit()
+                # Do not cache what an ingest committed since has already invalidated
+                if await recording_data_points(self.db, session_id, recording_number) != data_points:
+                    return pyramid
+        pyramid_cache.set(key, pyramid)
+        return pyramid
+    
+    async def get_range_index(self, session_id: str, recording_number: int, eye: str = "both", noise_reduction: bool = False,
+                              filter_name: str = DEFAULT_FILTER, window: int = DEFAULT_WINDOW) -> RangeIndex:
+        """
+        Get the range statistics indexes of a recording's whole series, built once and kept in the range index cache
+        """
         if noise_reduction:
-            normalized_data = apply_noise_reduction_to_normalized_data(normalized_data)
+            validate_filter(filter_name, window)
+            key = (session_id, recording_number, series_eye(eye), filter_name, window)
+        else:
+            key = (session_id, recording_number, series_eye(eye), None, None)
+        
+        index = range_index_cache.get(key)
+        if index is MISSING:
+            timestamps, values = await self.get_recording_arrays(
+                session_id, recording_number, eye, noise_reduction, filter_name, window
+            )
+            index = await offload(len(values), RangeIndex, timestamps, values)
+            range_index_cache.set(key, index)
+        return index
+    
+    async def get_range_stats(self, session_id: str, recording_number: int, eye: str = "both", noise_reduction: bool = False,
+                              filter_name: str = DEFAULT_FILTER, window: int = DEFAULT_WINDOW,
+                              start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                              percentiles: List[float] = DEFAULT_PERCENTILES) -> dict:
+        """
+        Get count, mean, std, min, max, percentiles and mean absolute velocity of the normalized series
+        over [start_ts, end_ts], from the cached range indexes
+        """
+        index = await self.get_range_index(session_id, recording_number, eye, noise_reduction, filter_name, window)
+        return index.stats(start_ts, end_ts, percentiles)
+    
+    async def get_recording_events(self, session_id: str, recording_number: int, eye: str = "both",
+                                   parameters: EventParameters = EventParameters()) -> dict:
+        """
+        Get the fixations, saccades, blinks and gaps of a recording, detected on the raw rows of one eye
+        (missing and degenerate landmarks included) and kept in the event cache per parameters
+        """
+        validate_event_parameters(parameters)
+        eye_side = series_eye(eye)
+        key = (session_id, recording_number, eye_side, parameters)
         
-        return normalized_data
+        detected = event_cache.get(key)
+        if detected is MISSING:
+            reference = (await self.get_calibration_references(session_id))[eye_side]
+            storage = await recording_storage(self.db, session_id, recording_number)
+            eye_arrays = await storage.read_eye(self.db, session_id, recording_number, eye_side)
+            detected = await offload(len(eye_arrays), detect_eye_events, eye_arrays, reference, parameters)
+            event_cache.set(key, detected)
+        return detected
+    
+    async def get_calibration_references(self, session_id: str) -> Dict[str, Optional[CalibrationReference]]:
+        """
+        Get the normalization reference of each eye for a session, through the process-wide calibration cache
+        """
+        references = calibration_cache.get(session_id)
+        if references is MISSING:
+            references = calibration_references(await self.get_calibration_data(session_id))
+            calibration_cache.set(session_id, references)
+        return references
     
     async def get_calibration_data(self, session_id: str) -> List[dict]:
         """
-        Get calibration data for a session from the dedicated calibration table
+        Get calibration data for a session from the dedicated calibration table.
+        When a session was calibrated again, the latest capture of each point comes first.
         """
-        query = select(CalibrationData).where(CalibrationData.session_id == session_id)
+        query = select(CalibrationData).where(
+            CalibrationData.session_id == session_id
+        ).order_by(CalibrationData.calibration_point_index, CalibrationData.timestamp.desc())
         result = await self.db.execute(query)
         records = result.scalars().all()
         
@@ -374,94 +675,108 @@ class EyeTrackingService:
     
     async def get_session_summary(self, session_id: str) -> dict:
         """
-        Get summary statistics for a session
+        Get summary statistics for a session from the catalog
         """
-        # Get all recordings for the session
-        query = select(EyeTrackingData.recording_number).where(
-            EyeTrackingData.session_id == session_id
-        ).distinct()
-        result = await self.db.execute(query)
-        recording_numbers = [row[0] for row in result.fetchall()]
+        session = await self.db.get(SessionCatalog, session_id)
         
-        # Get total data points
-        query = select(EyeTrackingData).where(EyeTrackingData.session_id == session_id)
+        query = select(RecordingCatalog.recording_number).where(
+            RecordingCatalog.session_id == session_id
+        ).order_by(RecordingCatalog.recording_number)
         result = await self.db.execute(query)
-        total_records = len(result.scalars().all())
+        recording_numbers = list(result.scalars().all())
         
         return {
             'session_id': session_id,
             'total_recordings': len(recording_numbers),
-            'total_data_points': total_records,
-            'recording_numbers': sorted(recording_numbers)
+            'total_data_points': session.total_data_points if session else 0,
+            'recording_numbers': recording_numbers,
+            'has_calibration': bool(session and session.has_calibration)
         }
     
     async def delete_session_data(self, session_id: str) -> int:
         """
         Delete all data for a session
         """
-        query = delete(EyeTrackingData).where(EyeTrackingData.session_id == session_id)
-        result = await self.db.execute(query)
+        deleted_count = 0
+        for storage in STORAGES.values():
+            deleted_count += await storage.delete_session(self.db, session_id)
+        await remove_session_recordings(self.db, session_id)
+        await remove_normalized(self.db, session_id)
+        await remove_pyramids(self.db, session_id)
+        await remove_jobs(self.db, session_id)
         await self.db.commit()
-        return result.rowcount
+        range_index_cache.invalidate_where(lambda key: key[0] == session_id)
+        pyramid_cache.invalidate_where(lambda key: key[0] == session_id)
+        event_cache.invalidate_where(lambda key: key[0] == session_id)
+        return deleted_count
     
     async def get_all_sessions(self) -> List[dict]:
         """
-        Get all sessions with their recordings and summary information
+        Get all sessions with their recordings and summary information, from the catalog
+        """
+        sessions, _ = await self.list_sessions()
+        return sessions
+    
+    async def list_sessions(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                            start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                            min_duration: Optional[int] = None, has_calibration: Optional[bool] = None,
+                            fields: Sequence[str] = SESSION_FIELDS, order: str = "desc") -> Tuple[List[dict], Optional[str]]:
+        """
+        Get one page of sessions with recordings, from the catalog, in one query: the page of session_catalog
+        rows, joined with their recording_catalog rows unless only the summary is requested.
+        Returns the sessions and the cursor of the next page, None on the last page.
         """
-        # Get all unique session IDs
-        query = select(EyeTrackingData.session_id).distinct()
+        validate_session_listing(limit, fields, order)
+        page = session_page_query(limit, cursor, start_ts, end_ts, min_duration, has_calibration, order).subquery()
+        with_recordings = "recordings" in fields
+        
+        if with_recordings:
+            query = select(page, RecordingCatalog).outerjoin(
+                RecordingCatalog, RecordingCatalog.session_id == page.c.session_id
+            )
+        else:
+            query = select(page)
+        key = (page.c.first_timestamp.desc(), page.c.session_id.desc()) if order == "desc" else (page.c.first_timestamp, page.c.session_id)
+        query = query.order_by(*key, *((RecordingCatalog.recording_number,) if with_recordings else ()))
         result = await self.db.execute(query)
-        session_ids = [row[0] for row in result.fetchall()]
         
-        sessions = []
-        for session_id in session_ids:
-            # Get summary for this session
-            summary = await self.get_session_summary(session_id)
-            
-            # Get recordings for this session
-            recordings = []
-            for recording_number in summary['recording_numbers']:
-                # Get data count for this recording
-                query = select(EyeTrackingData).where(
-                    EyeTrackingData.session_id == session_id,
-                    EyeTrackingData.recording_number == recording_number
-                )
-                result = await self.db.execute(query)
-                data_count = len(result.scalars().all())
-                
-                # Get the first timestamp for this recording to calculate duration
-                query = select(EyeTrackingData.timestamp).where(
-                    EyeTrackingData.session_id == session_id,
-                    EyeTrackingData.recording_number == recording_number
-                ).order_by(EyeTrackingData.timestamp.asc()).limit(1)
-                result = await self.db.execute(query)
-                first_timestamp = result.scalar()
-                
-                # Get the last timestamp for this recording
-                query = select(EyeTrackingData.timestamp).where(
-                    EyeTrackingData.session_id == session_id,
-                    EyeTrackingData.recording_number == recording_number
-                ).order_by(EyeTrackingData.timestamp.desc()).limit(1)
-                result = await self.db.execute(query)
-                last_timestamp = result.scalar()
-                
-                # Calculate duration in seconds
-                duration = 0
-                if first_timestamp and last_timestamp:
-                    duration = (last_timestamp - first_timestamp) // 1000  # Convert to seconds
-                
-                recordings.append({
-                    'recording_number': recording_number,
-                    'data_points': data_count,
-                    'duration': duration,
-                    'timestamp': first_timestamp,
-                    'session_id': session_id
-                })
+        sessions: Dict[str, dict] = {}
+        for row in result.all():
+            if row.session_id not in sessions:
+                sessions[row.session_id] = {
+                    'session_id': row.session_id,
+                    'summary': {
+                        'session_id': row.session_id,
+                        'total_recordings': row.total_recordings,
+                        'total_data_points': row.total_data_points,
+                        'has_calibration': row.has_calibration,
+                        'first_timestamp': row.first_timestamp,
+                        'last_timestamp': row.last_timestamp,
+                        'duration': (row.last_timestamp - row.first_timestamp) // 1000
+                    }
+                }
+                if with_recordings:
+                    sessions[row.session_id]['summary']['recording_numbers'] = []
+                    sessions[row.session_id]['recordings'] = []
             
-            sessions.append({
-                'session_id': session_id,
-                'summary': summary,
-                'recordings': recordings
+            recording = row.RecordingCatalog if with_recordings else None
+            if recording is None:
+                continue
+            session = sessions[row.session_id]
+            session['recordings'].append({
+                'recording_number': recording.recording_number,
+                'data_points': recording.data_points,
+                'duration': recording.duration,
+                'timestamp': recording.first_timestamp,
+                'session_id': recording.session_id,
+                'eyes': [eye_side for eye_side, present in (('left', recording.has_left_eye), ('right', recording.has_right_eye)) if present]
             })
+            session['summary']['recording_numbers'].append(recording.recording_number)
         
-        return sessions 
\ No newline at end of file
+        page_sessions = list(sessions.values())
+        next_cursor = None
+        if limit is not None and len(page_sessions) > limit:
+            page_sessions = page_sessions[:limit]
+            last = page_sessions[-1]['summary']
+            next_cursor = encode_session_cursor(last['first_timestamp'], last['session_id'])
+        return page_sessions, next_cursor
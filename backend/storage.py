@@ -0,0 +1,560 @@
+"""
+Storage formats of recording data, selected with STORAGE_MODE for new recordings.
+
+rows (default): eye_tracking_data, one row per eye per frame.
+
+packed: recording_chunks, one row per PACKED_CHUNK_SIZE consecutive frames of a recording,
+holding zlib-compressed column arrays:
+
+    timestamps  int64 (n,), delta encoded: the first value is absolute
+    eye_mask    uint8 (n,), bit 0 set when the frame has the left eye, bit 1 for the right eye
+    samples     float64 (19, n): confidence, then the 9 EYE_COLUMNS of the left eye, then those
+                of the right eye, NaN where missing. The bytes are shuffled (all first bytes,
+                then all second bytes, ...) before compression, so that the slowly changing
+                sign/exponent bytes of consecutive samples compress together.
+
+Coordinates keep the float64 precision of eye_tracking_data, so both formats return the same
+values and migrating between them is lossless (chunks written in float32 by earlier versions
+are still read). Batches appended to a recording fill its last chunk before opening a new one.
+Like the eye_tracking_data primary key, a session holds at most one sample per timestamp and eye:
+a batch repeating one is rejected.
+
+Reads look up where each recording is actually stored, so STORAGE_MODE can be changed at any
+time; `python cli.py migrate-storage` moves existing recordings from one format to the other.
+"""
+import os
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Table, delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from catalog import time_bounds
+from database import EyeTrackingData, RecordingChunk
+from ingest import EYE_COLUMNS, EYE_KEYS, bulk_insert
+from normalization import EyeArrays, eye_arrays_from_rows
+from partitioning import PARTITION_LAYOUT, ensure_time_partitions
+
+STORAGE_MODE = os.getenv("STORAGE_MODE", "rows").lower()
+
+# Frames per packed chunk: about 2 minutes at 30 fps
+PACKED_CHUNK_SIZE = int(os.getenv("PACKED_CHUNK_SIZE", "4096"))
+
+ZLIB_LEVEL = 6
+
+# Row of samples holding each eye's first coordinate, and its bit in eye_mask
+EYE_OFFSETS = {'left': 1, 'right': 1 + len(EYE_COLUMNS)}
+EYE_BITS = {'left': 1, 'right': 2}
+SAMPLE_ROWS = 1 + 2 * len(EYE_COLUMNS)
+
+# Chunks fetched per round trip when streaming packed recordings
+PACKED_STREAM_CHUNKS = 8
+
+
+class Frames:
+    """Frames of a recording in the packed layout, decoded"""
+
+    def __init__(self, timestamps: np.ndarray, eye_mask: np.ndarray, samples: np.ndarray):
+        self.timestamps = timestamps  # int64, shape (n,)
+        self.eye_mask = eye_mask      # uint8, shape (n,)
+        self.samples = samples        # float64, shape (SAMPLE_ROWS, n)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @classmethod
+    def empty(cls) -> "Frames":
+        return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint8), np.empty((SAMPLE_ROWS, 0), dtype=np.float64))
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, list]) -> "Frames":
+        """Group eye_tracking_data column batches (see ingest.positions_to_columns) into frames"""
+        timestamps = np.array(columns['timestamp'], dtype=np.int64)
+        frames, frame_of_row = np.unique(timestamps, return_inverse=True)
+        eye_sides = np.array(columns['eye_side'])
+        coordinates = np.array([columns[column] for column in EYE_COLUMNS], dtype=np.float64).reshape(len(EYE_COLUMNS), -1)
+
+        eye_mask = np.zeros(len(frames), dtype=np.uint8)
+        samples = np.full((SAMPLE_ROWS, len(frames)), np.nan, dtype=np.float64)
+        samples[0, frame_of_row] = np.array(columns['confidence'], dtype=np.float64)
+        for eye_side, offset in EYE_OFFSETS.items():
+            rows = eye_sides == eye_side
+            if np.any(np.bincount(frame_of_row[rows], minlength=len(frames)) > 1):
+                raise ValueError(f"Duplicate {eye_side} eye frames in the batch")
+            eye_mask[frame_of_row[rows]] |= EYE_BITS[eye_side]
+            samples[offset:offset + len(EYE_COLUMNS), frame_of_row[rows]] = coordinates[:, rows]
+        return cls(frames, eye_mask, samples)
+
+    def concatenate(self, other: "Frames") -> "Frames":
+        timestamps = np.concatenate((self.timestamps, other.timestamps))
+        eye_mask = np.concatenate((self.eye_mask, other.eye_mask))
+        samples = np.concatenate((self.samples, other.samples), axis=1)
+        if len(timestamps) > 1 and np.any(np.diff(timestamps) < 0):
+            order = np.argsort(timestamps, kind='stable')
+            timestamps, eye_mask, samples = timestamps[order], eye_mask[order], samples[:, order]
+        return Frames(timestamps, eye_mask, samples)
+
+    def slice(self, start: int, end: int) -> "Frames":
+        return Frames(self.timestamps[start:end], self.eye_mask[start:end], self.samples[:, start:end])
+
+    def eye(self, eye_side: str, start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> EyeArrays:
+        """EyeArrays of one eye, restricted to [start_ts, end_ts]"""
+        keep = (self.eye_mask & EYE_BITS[eye_side]) != 0
+        if start_ts is not None:
+            keep &= self.timestamps >= start_ts
+        if end_ts is not None:
+            keep &= self.timestamps <= end_ts
+        offset = EYE_OFFSETS[eye_side]
+        coordinates = self.samples[offset:offset + len(EYE_COLUMNS), keep].T.astype(np.float64)
+        return EyeArrays(
+            timestamps=self.timestamps[keep],
+            iris=np.ascontiguousarray(coordinates[:, 0:3]),
+            corner_left=np.ascontiguousarray(coordinates[:, 3:6]),
+            corner_right=np.ascontiguousarray(coordinates[:, 6:9]),
+        )
+
+    def rows(self) -> List[tuple]:
+        """(timestamp, eye_side, confidence, *EYE_COLUMNS) per eye per frame, as eye_tracking_data stores them"""
+        presence = np.stack([(self.eye_mask & EYE_BITS[eye_side]) != 0 for eye_side, _ in EYE_KEYS], axis=1)
+        frame_index, eye_index = np.nonzero(presence)
+        eye_samples = self.samples[1:].reshape(len(EYE_KEYS), len(EYE_COLUMNS), -1)
+        coordinates = _nullable(eye_samples[eye_index, :, frame_index].astype(np.float64))
+        confidences = _nullable(self.samples[0, frame_index].astype(np.float64))
+        timestamps = self.timestamps[frame_index].tolist()
+        eye_sides = [EYE_KEYS[index][0] for index in eye_index.tolist()]
+        return [
+            (timestamp, eye_side, confidence, *values)
+            for timestamp, eye_side, confidence, values in zip(timestamps, eye_sides, confidences, coordinates)
+        ]
+
+
+def _nullable(array: np.ndarray) -> list:
+    """NaN to None, as the database returns missing values"""
+    return np.where(np.isnan(array), None, array).tolist()
+
+
+def _shuffle(samples: np.ndarray) -> bytes:
+    return np.ascontiguousarray(samples, dtype='<f8').view(np.uint8).reshape(-1, 8).T.tobytes()
+
+
+def _unshuffle(buffer: bytes, rows: int, frame_count: int) -> np.ndarray:
+    # float64, or float32 in chunks written by earlier versions: the size tells them apart
+    itemsize = len(buffer) // (rows * frame_count) if frame_count else 8
+    shuffled = np.frombuffer(buffer, dtype=np.uint8).reshape(itemsize, -1)
+    samples = np.ascontiguousarray(shuffled.T).view(f'<f{itemsize}').reshape(rows, -1)
+    return samples.astype(np.float64)
+
+
+def pack_frames(frames: Frames) -> dict:
+    """Encode frames into the compressed columns of a recording_chunks row"""
+    deltas = np.diff(frames.timestamps, prepend=np.int64(0)).astype('<i8')
+    return {
+        'first_timestamp': int(frames.timestamps.min()),
+        'last_timestamp': int(frames.timestamps.max()),
+        'frame_count': len(frames),
+        'left_count': int(np.count_nonzero(frames.eye_mask & EYE_BITS['left'])),
+        'right_count': int(np.count_nonzero(frames.eye_mask & EYE_BITS['right'])),
+        'timestamps': zlib.compress(deltas.tobytes(), ZLIB_LEVEL),
+        'eye_mask': zlib.compress(frames.eye_mask.tobytes(), ZLIB_LEVEL),
+        'samples': zlib.compress(_shuffle(frames.samples), ZLIB_LEVEL),
+    }
+
+
+def unpack_timestamps(timestamps: bytes) -> np.ndarray:
+    return np.cumsum(np.frombuffer(zlib.decompress(timestamps), dtype='<i8')).astype(np.int64)
+
+
+def unpack_frames(timestamps: bytes, eye_mask: bytes, samples: bytes) -> Frames:
+    """Decode the compressed columns of a recording_chunks row straight into arrays"""
+    frame_timestamps = unpack_timestamps(timestamps)
+    return Frames(
+        frame_timestamps,
+        np.frombuffer(zlib.decompress(eye_mask), dtype=np.uint8),
+        _unshuffle(zlib.decompress(samples), SAMPLE_ROWS, len(frame_timestamps)),
+    )
+
+
+async def _pruning_bounds(db: AsyncSession, session_id: str,
+                          recording_number: Optional[int] = None) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Catalog time bounds of a session or recording when eye_tracking_data is partitioned by time, so that
+    queries can carry a timestamp range PostgreSQL prunes partitions with
+    """
+    if PARTITION_LAYOUT != "time":
+        return None, None
+    return await time_bounds(db, session_id, recording_number)
+
+
+def _clamp(start_ts: Optional[int], end_ts: Optional[int],
+           bounds: Tuple[Optional[int], Optional[int]]) -> Tuple[Optional[int], Optional[int]]:
+    first_timestamp, last_timestamp = bounds
+    if first_timestamp is not None:
+        start_ts = first_timestamp if start_ts is None else max(start_ts, first_timestamp)
+    if last_timestamp is not None:
+        end_ts = last_timestamp if end_ts is None else min(end_ts, last_timestamp)
+    return start_ts, end_ts
+
+
+def _within(criteria: list, bounds: Tuple[Optional[int], Optional[int]]) -> list:
+    first_timestamp, last_timestamp = bounds
+    if first_timestamp is not None:
+        criteria.append(EyeTrackingData.timestamp >= first_timestamp)
+    if last_timestamp is not None:
+        criteria.append(EyeTrackingData.timestamp <= last_timestamp)
+    return criteria
+
+
+class RowStorage:
+    """One eye_tracking_data row per eye per frame"""
+    name = "rows"
+    table: Table = EyeTrackingData.__table__
+
+    async def prepare(self, db: AsyncSession, columns: Dict[str, list]) -> None:
+        """Create the partitions a batch needs. Call it before the batch's transaction touches eye_tracking_data."""
+        await ensure_time_partitions(db.bind, self.table.name, columns['timestamp'])
+
+    async def contains(self, db: AsyncSession, session_id: str, recording_number: int) -> bool:
+        bounds = await _pruning_bounds(db, session_id, recording_number)
+        result = await db.execute(
+            select(EyeTrackingData.session_id).where(*_within([
+                EyeTrackingData.session_id == session_id,
+                EyeTrackingData.recording_number == recording_number
+            ], bounds)).limit(1)
+        )
+        return result.first() is not None
+
+    async def store(self, db: AsyncSession, session_id: str, recording_number: int, columns: Dict[str, list]) -> int:
+        """Append column batches to a recording and return the number of statements. Runs in the caller's transaction."""
+        return await bulk_insert(db, self.table, columns)
+
+    def eye_query(self, session_id: str, recording_number: int, eye_side: str,
+                  start_ts: Optional[int] = None, end_ts: Optional[int] = None):
+        """
+        Timestamp and coordinate columns of one eye of a recording, ordered by timestamp, no ORM hydration
+        """
+        query = select(
+            EyeTrackingData.timestamp,
+            *[getattr(EyeTrackingData, column) for column in EYE_COLUMNS]
+        ).where(
+            EyeTrackingData.session_id == session_id,
+            EyeTrackingData.recording_number == recording_number,
+            EyeTrackingData.eye_side == eye_side
+        ).order_by(EyeTrackingData.timestamp)
+
+        # The time range is served by the (session_id, timestamp) index
+        if start_ts is not None:
+            query = query.where(EyeTrackingData.timestamp >= start_ts)
+        if end_ts is not None:
+            query = query.where(EyeTrackingData.timestamp <= end_ts)
+        return query
+
+    async def read_eye(self, db: AsyncSession, session_id: str, recording_number: int, eye_side: str,
+                       start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> EyeArrays:
+        start_ts, end_ts = _clamp(start_ts, end_ts, await _pruning_bounds(db, session_id, recording_number))
+        result = await db.execute(self.eye_query(session_id, recording_number, eye_side, start_ts, end_ts))
+        return eye_arrays_from_rows(result.all())
+
+    async def stream_eye(self, db: AsyncSession, session_id: str, recording_number: int, eye_side: str,
+                         start_ts: Optional[int], end_ts: Optional[int], chunk_size: int) -> AsyncIterator[EyeArrays]:
+        start_ts, end_ts = _clamp(start_ts, end_ts, await _pruning_bounds(db, session_id, recording_number))
+        query = self.eye_query(session_id, recording_number, eye_side, start_ts, end_ts)
+        result = await db.stream(query.execution_options(yield_per=chunk_size))
+        async for rows in result.partitions():
+            yield eye_arrays_from_rows(rows)
+
+    async def read_columns(self, db: AsyncSession, session_id: str, recording_number: int) -> Dict[str, list]:
+        """Every row of a recording as column batches, in the positions_to_columns layout"""
+        names = [column.name for column in self.table.columns]
+        bounds = await _pruning_bounds(db, session_id, recording_number)
+        result = await db.execute(
+            select(self.table).where(*_within([
+                self.table.c.session_id == session_id,
+                self.table.c.recording_number == recording_number
+            ], bounds)).order_by(self.table.c.timestamp, self.table.c.eye_side)
+        )
+        rows = result.all()
+        return {name: [row[index] for row in rows] for index, name in enumerate(names)}
+
+    async def stream_session(self, db: AsyncSession, session_id: str, chunk_size: int) -> AsyncIterator[List[tuple]]:
+        """(timestamp, eye_side, confidence, *EYE_COLUMNS) rows of a session ordered by timestamp, in partitions"""
+        bounds = await _pruning_bounds(db, session_id)
+        query = select(
+            EyeTrackingData.timestamp,
+            EyeTrackingData.eye_side,
+            EyeTrackingData.confidence,
+            *[getattr(EyeTrackingData, column) for column in EYE_COLUMNS]
+        ).where(
+            *_within([EyeTrackingData.session_id == session_id], bounds)
+        ).order_by(EyeTrackingData.timestamp, EyeTrackingData.eye_side)
+        result = await db.stream(query.execution_options(yield_per=chunk_size))
+        async for rows in result.partitions():
+            yield rows
+
+    async def stream_export(self, db: AsyncSession, session_id: str, start_ts: Optional[int], end_ts: Optional[int],
+                            chunk_size: int) -> AsyncIterator[List[tuple]]:
+        """(recording_number, timestamp, eye_side, confidence, *EYE_COLUMNS) rows of a session within [start_ts, end_ts]"""
+        start_ts, end_ts = _clamp(start_ts, end_ts, await _pruning_bounds(db, session_id))
+        query = select(
+            EyeTrackingData.recording_number,
+            EyeTrackingData.timestamp,
+            EyeTrackingData.eye_side,
+            EyeTrackingData.confidence,
+            *[getattr(EyeTrackingData, column) for column in EYE_COLUMNS]
+        ).where(
+            EyeTrackingData.session_id == session_id
+        ).order_by(EyeTrackingData.recording_number, EyeTrackingData.timestamp, EyeTrackingData.eye_side)
+        if start_ts is not None:
+            query = query.where(EyeTrackingData.timestamp >= start_ts)
+        if end_ts is not None:
+            query = query.where(EyeTrackingData.timestamp <= end_ts)
+        result = await db.stream(query.execution_options(yield_per=chunk_size))
+        async for rows in result.partitions():
+            yield rows
+
+    async def recordings(self, db: AsyncSession, session_id: Optional[str] = None) -> List[Tuple[str, int]]:
+        query = select(EyeTrackingData.session_id, EyeTrackingData.recording_number).where(
+            EyeTrackingData.recording_number.is_not(None)
+        ).distinct().order_by(EyeTrackingData.session_id, EyeTrackingData.recording_number)
+        if session_id is not None:
+            query = query.where(EyeTrackingData.session_id == session_id)
+        result = await db.execute(query)
+        return [tuple(row) for row in result.all()]
+
+    async def delete_recording(self, db: AsyncSession, session_id: str, recording_number: int) -> int:
+        bounds = await _pruning_bounds(db, session_id, recording_number)
+        result = await db.execute(
+            delete(EyeTrackingData).where(*_within([
+                EyeTrackingData.session_id == session_id,
+                EyeTrackingData.recording_number == recording_number
+            ], bounds))
+        )
+        return result.rowcount
+
+    async def delete_session(self, db: AsyncSession, session_id: str) -> int:
+        bounds = await _pruning_bounds(db, session_id)
+        result = await db.execute(
+            delete(EyeTrackingData).where(*_within([EyeTrackingData.session_id == session_id], bounds))
+        )
+        return result.rowcount
+
+
+class PackedStorage:
+    """Compressed column arrays per chunk of frames, see the module docstring for the layout"""
+    name = "packed"
+    table: Table = RecordingChunk.__table__
+
+    async def prepare(self, db: AsyncSession, columns: Dict[str, list]) -> None:
+        pass
+
+    async def contains(self, db: AsyncSession, session_id: str, recording_number: int) -> bool:
+        result = await db.execute(
+            select(RecordingChunk.chunk_index).where(
+                RecordingChunk.session_id == session_id,
+                RecordingChunk.recording_number == recording_number
+            ).limit(1)
+        )
+        return result.first() is not None
+
+    async def store(self, db: AsyncSession, session_id: str, recording_number: int, columns: Dict[str, list]) -> int:
+        """
+        Append column batches to a recording, topping up its last chunk first, and return the number of
+        statements. Runs in the caller's transaction.
+        """
+        frames = Frames.from_columns(columns)
+        if len(frames) == 0:
+            return 0
+        await self._reject_duplicates(db, session_id, frames)
+
+        result = await db.execute(
+            select(RecordingChunk).where(
+                RecordingChunk.session_id == session_id,
+                RecordingChunk.recording_number == recording_number
+            ).order_by(RecordingChunk.chunk_index.desc()).limit(1)
+        )
+        last_chunk = result.scalars().first()
+        chunk_index = 0
+        statements = 1
+        if last_chunk is not None:
+            chunk_index = last_chunk.chunk_index + 1
+            if last_chunk.frame_count < PACKED_CHUNK_SIZE:
+                frames = unpack_frames(last_chunk.timestamps, last_chunk.eye_mask, last_chunk.samples).concatenate(frames)
+                chunk_index = last_chunk.chunk_index
+                await db.delete(last_chunk)
+                await db.flush()
+                statements += 1
+
+        now = datetime.utcnow()
+        chunks = [
+            {
+                'session_id': session_id,
+                'recording_number': recording_number,
+                'chunk_index': chunk_index + offset // PACKED_CHUNK_SIZE,
+                **pack_frames(frames.slice(offset, offset + PACKED_CHUNK_SIZE)),
+                'created_at': now,
+            }
+            for offset in range(0, len(frames), PACKED_CHUNK_SIZE)
+        ]
+        columns = {name: [chunk[name] for chunk in chunks] for name in chunks[0]}
+        return statements + await bulk_insert(db, self.table, columns)
+
+    async def _reject_duplicates(self, db: AsyncSession, session_id: str, frames: Frames) -> None:
+        """Raise ValueError when the session already holds a sample of the same eye at one of the frames' timestamps"""
+        result = await db.execute(
+            select(RecordingChunk.timestamps, RecordingChunk.eye_mask).where(
+                RecordingChunk.session_id == session_id,
+                RecordingChunk.last_timestamp >= int(frames.timestamps[0]),
+                RecordingChunk.first_timestamp <= int(frames.timestamps[-1])
+            )
+        )
+        for timestamps, eye_mask in result.all():
+            _, new, stored = np.intersect1d(frames.timestamps, unpack_timestamps(timestamps), return_indices=True)
+            stored_mask = np.frombuffer(zlib.decompress(eye_mask), dtype=np.uint8)
+            if np.any(frames.eye_mask[new] & stored_mask[stored]):
+                raise ValueError(f"Session {session_id} already has frames at some of these timestamps")
+
+    def chunk_query(self, session_id: str, recording_number: int,
+                    start_ts: Optional[int] = None, end_ts: Optional[int] = None):
+        """Chunks of a recording overlapping [start_ts, end_ts], in order"""
+        query = select(
+            RecordingChunk.timestamps,
+            RecordingChunk.eye_mask,
+            RecordingChunk.samples
+        ).where(
+            RecordingChunk.session_id == session_id,
+            RecordingChunk.recording_number == recording_number
+        ).order_by(RecordingChunk.chunk_index)
+
+        if start_ts is not None:
+            query = query.where(RecordingChunk.last_timestamp >= start_ts)
+        if end_ts is not None:
+            query = query.where(RecordingChunk.first_timestamp <= end_ts)
+        return query
+
+    async def read_frames(self, db: AsyncSession, session_id: str, recording_number: int,
+                          start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> Frames:
+        result = await db.execute(self.chunk_query(session_id, recording_number, start_ts, end_ts))
+        frames = Frames.empty()
+        for chunk in result.all():
+            frames = frames.concatenate(unpack_frames(*chunk))
+        return frames
+
+    async def read_eye(self, db: AsyncSession, session_id: str, recording_number: int, eye_side: str,
+                       start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> EyeArrays:
+        frames = await self.read_frames(db, session_id, recording_number, start_ts, end_ts)
+        return frames.eye(eye_side, start_ts, end_ts)
+
+    async def stream_eye(self, db: AsyncSession, session_id: str, recording_number: int, eye_side: str,
+                         start_ts: Optional[int], end_ts: Optional[int], chunk_size: int) -> AsyncIterator[EyeArrays]:
+        query = self.chunk_query(session_id, recording_number, start_ts, end_ts)
+        result = await db.stream(query.execution_options(yield_per=PACKED_STREAM_CHUNKS))
+        async for chunk in result:
+            yield unpack_frames(*chunk).eye(eye_side, start_ts, end_ts)
+
+    async def read_columns(self, db: AsyncSession, session_id: str, recording_number: int) -> Dict[str, list]:
+        """Every row of a recording as column batches, in the positions_to_columns layout"""
+        rows = (await self.read_frames(db, session_id, recording_number)).rows()
+        columns = {
+            'session_id': [session_id] * len(rows),
+            'timestamp': [row[0] for row in rows],
+            'eye_side': [row[1] for row in rows],
+            'recording_number': [recording_number] * len(rows),
+        }
+        for index, name in enumerate(EYE_COLUMNS):
+            columns[name] = [row[3 + index] for row in rows]
+        columns['confidence'] = [row[2] for row in rows]
+        columns['created_at'] = [datetime.utcnow()] * len(rows)
+        return columns
+
+    async def stream_session(self, db: AsyncSession, session_id: str, chunk_size: int) -> AsyncIterator[List[tuple]]:
+        """(timestamp, eye_side, confidence, *EYE_COLUMNS) rows of a session, one partition per chunk"""
+        query = select(
+            RecordingChunk.timestamps,
+            RecordingChunk.eye_mask,
+            RecordingChunk.samples
+        ).where(
+            RecordingChunk.session_id == session_id
+        ).order_by(RecordingChunk.first_timestamp, RecordingChunk.recording_number, RecordingChunk.chunk_index)
+        result = await db.stream(query.execution_options(yield_per=PACKED_STREAM_CHUNKS))
+        async for chunk in result:
+            yield unpack_frames(*chunk).rows()
+
+    async def stream_export(self, db: AsyncSession, session_id: str, start_ts: Optional[int], end_ts: Optional[int],
+                            chunk_size: int) -> AsyncIterator[List[tuple]]:
+        """(recording_number, timestamp, eye_side, confidence, *EYE_COLUMNS) rows of a session within [start_ts, end_ts]"""
+        query = select(
+            RecordingChunk.recording_number,
+            RecordingChunk.timestamps,
+            RecordingChunk.eye_mask,
+            RecordingChunk.samples
+        ).where(
+            RecordingChunk.session_id == session_id
+        ).order_by(RecordingChunk.recording_number, RecordingChunk.chunk_index)
+        if start_ts is not None:
+            query = query.where(RecordingChunk.last_timestamp >= start_ts)
+        if end_ts is not None:
+            query = query.where(RecordingChunk.first_timestamp <= end_ts)
+        result = await db.stream(query.execution_options(yield_per=PACKED_STREAM_CHUNKS))
+        async for recording_number, *chunk in result:
+            frames = unpack_frames(*chunk)
+            start = 0 if start_ts is None else int(np.searchsorted(frames.timestamps, start_ts, side='left'))
+            end = len(frames.timestamps) if end_ts is None else int(np.searchsorted(frames.timestamps, end_ts, side='right'))
+            rows = frames.slice(start, end).rows()
+            if rows:
+                yield [(recording_number, *row) for row in rows]
+
+    async def recordings(self, db: AsyncSession, session_id: Optional[str] = None) -> List[Tuple[str, int]]:
+        query = select(RecordingChunk.session_id, RecordingChunk.recording_number).distinct().order_by(
+            RecordingChunk.session_id, RecordingChunk.recording_number
+        )
+        if session_id is not None:
+            query = query.where(RecordingChunk.session_id == session_id)
+        result = await db.execute(query)
+        return [tuple(row) for row in result.all()]
+
+    async def _delete(self, db: AsyncSession, *criteria) -> int:
+        """Delete chunks and return the number of eye rows they held"""
+        count = await db.execute(
+            select(func.coalesce(func.sum(RecordingChunk.left_count + RecordingChunk.right_count), 0)).where(*criteria)
+        )
+        data_points = count.scalar()
+        await db.execute(delete(RecordingChunk).where(*criteria))
+        return int(data_points)
+
+    async def delete_recording(self, db: AsyncSession, session_id: str, recording_number: int) -> int:
+        return await self._delete(
+            db,
+            RecordingChunk.session_id == session_id,
+            RecordingChunk.recording_number == recording_number
+        )
+
+    async def delete_session(self, db: AsyncSession, session_id: str) -> int:
+        return await self._delete(db, RecordingChunk.session_id == session_id)
+
+
+ROW_STORAGE = RowStorage()
+PACKED_STORAGE = PackedStorage()
+
+STORAGES = {storage.name: storage for storage in (ROW_STORAGE, PACKED_STORAGE)}
+
+if STORAGE_MODE not in STORAGES:
+    raise ValueError(f"Unknown STORAGE_MODE '{STORAGE_MODE}', expected one of: {', '.join(STORAGES)}")
+
+
+async def recording_storage(db: AsyncSession, session_id: str, recording_number: int):
+    """Storage holding a recording: packed if it has chunks, rows otherwise"""
+    if await PACKED_STORAGE.contains(db, session_id, recording_number):
+        return PACKED_STORAGE
+    return ROW_STORAGE
+
+
+async def storage_for_write(db: AsyncSession, session_id: str, recording_number: int):
+    """Storage new batches of a recording go to: the one already holding it, or STORAGE_MODE for a new recording"""
+    if STORAGE_MODE == PACKED_STORAGE.name:
+        if await ROW_STORAGE.contains(db, session_id, recording_number):
+            return ROW_STORAGE
+        return PACKED_STORAGE
+    if await PACKED_STORAGE.contains(db, session_id, recording_number):
+        return PACKED_STORAGE
+    return ROW_STORAGE
@@ -0,0 +1,25 @@
+import os
+import tempfile
+
+# database.py builds its engine on import: point it at a throwaway SQLite file first
+_database_directory = tempfile.mkdtemp(prefix="eye-tracking-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_database_directory, 'test.db')}"
+
+import pytest_asyncio  # noqa: E402
+
+from cache import _caches  # noqa: E402
+from database import AsyncSessionLocal, Base, engine, init_db  # noqa: E402
+
+
+@pytest_asyncio.fixture
+async def db():
+    """A session on empty tables, with empty caches"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await init_db()
+    for cache in _caches:
+        cache.clear()
+    async with AsyncSessionLocal() as session:
+        yield session
+    # Pooled connections belong to this test's event loop
+    await engine.dispose()
@@ -0,0 +1,43 @@
+import httpx
+import pytest
+
+from benchmarks.generator import generate_session
+from main import app
+
+TIMESTAMP = 1_700_000_000_000
+
+
+@pytest.fixture
+async def client(db):
+    # Without the lifespan: no background workers
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+def _json_payload(session_id):
+    positions = generate_session(session_id, duration_s=1).recordings[1]
+    return {'session_id': session_id, 'recording_number': 1, 'positions': positions, 'timestamp': TIMESTAMP}
+
+
+def _columnar_payload(session_id):
+    return {'session_id': session_id, 'recording_number': 1, 'timestamps': [TIMESTAMP], 'timestamp': TIMESTAMP}
+
+
+@pytest.mark.parametrize("route, payload", [
+    ("/api/eye-tracking/{session_id}", _json_payload),
+    ("/api/eye-tracking/{session_id}/columnar", _columnar_payload),
+])
+async def test_session_id_mismatch_is_a_bad_request(client, route, payload):
+    response = await client.post(route.format(session_id="session"), json=payload("other"))
+
+    assert response.status_code == 400
+    assert response.json() == {'detail': "Session ID mismatch"}
+
+
+async def test_json_recording_is_stored(client):
+    payload = _json_payload("session")
+
+    response = await client.post("/api/eye-tracking/session", json=payload)
+
+    assert response.status_code == 200
+    assert response.json()['positions_received'] == len(payload['positions'])
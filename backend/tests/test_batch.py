@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from batch import Checkpoint, reprocess_options
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "reprocess.checkpoint")
+
+
+def test_resumes_a_run_with_the_same_options(path):
+    Checkpoint(path, reprocess_options(["pyramids", "normalized"], False)).record([("a", 1), ("b", 2)])
+
+    checkpoint = Checkpoint(path, reprocess_options(["normalized", "pyramids"], False))
+    checkpoint.record([("c", 1)])
+
+    assert checkpoint.done == {("a", 1), ("b", 2), ("c", 1)}
+    assert Checkpoint(path, checkpoint.options).done == checkpoint.done
+
+
+@pytest.mark.parametrize("targets, recompute_current", [(["normalized"], False), (["normalized", "pyramids"], True)])
+def test_refuses_a_checkpoint_of_other_options(path, targets, recompute_current):
+    Checkpoint(path, reprocess_options(["normalized", "pyramids"], False)).record([("a", 1)])
+
+    with pytest.raises(ValueError, match="was written for"):
+        Checkpoint(path, reprocess_options(targets, recompute_current))
+
+    checkpoint = Checkpoint(path, reprocess_options(targets, recompute_current), restart=True)
+    checkpoint.record([("b", 1)])
+    assert Checkpoint(path, checkpoint.options).done == {("b", 1)}
+
+
+def test_refuses_a_checkpoint_without_options(path):
+    with open(path, "w") as checkpoint:
+        checkpoint.write(json.dumps(["a", 1]) + "\n")
+
+    with pytest.raises(ValueError, match="unknown options"):
+        Checkpoint(path, reprocess_options(["normalized"], False))
+
+
+def test_clear_removes_the_file(path):
+    checkpoint = Checkpoint(path, reprocess_options(["pyramids"], False))
+    checkpoint.record([("a", 1)])
+
+    checkpoint.clear()
+
+    assert checkpoint.done == set()
+    assert Checkpoint(path, reprocess_options(["normalized"], True)).done == set()
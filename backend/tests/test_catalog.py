@@ -0,0 +1,123 @@
+import base64
+import json
+
+import pytest
+from sqlalchemy import select
+
+import storage
+from benchmarks.generator import generate_session
+from catalog import (decode_session_cursor, encode_session_cursor, rebuild_catalog, record_recording_ingest,
+                     recording_catalog, session_catalog)
+from services import EyeTrackingService
+
+
+def _cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("first_timestamp, session_id", [
+    (1_700_000_000_000, "session-1"),
+    (0, ""),
+    (-5, "é/?&=+ with spaces"),
+])
+def test_session_cursor_round_trip(first_timestamp, session_id):
+    cursor = encode_session_cursor(first_timestamp, session_id)
+
+    assert "=" not in cursor
+    assert decode_session_cursor(cursor) == (first_timestamp, session_id)
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not a cursor!",
+    encode_session_cursor(1, "session")[:-3],
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+    _cursor({"first_timestamp": 1, "session_id": "session"}),
+    _cursor([1, "session", "extra"]),
+    _cursor(["1", "session"]),
+    _cursor([1.5, "session"]),
+    _cursor([True, "session"]),
+    _cursor([1, 2]),
+    _cursor(None),
+])
+def test_session_cursor_rejects_tampered_cursor(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_session_cursor(cursor)
+
+
+async def _catalog_rows(db):
+    recordings = await db.execute(
+        select(recording_catalog.c.session_id, recording_catalog.c.recording_number, recording_catalog.c.data_points,
+               recording_catalog.c.first_timestamp, recording_catalog.c.last_timestamp, recording_catalog.c.duration,
+               recording_catalog.c.has_left_eye, recording_catalog.c.has_right_eye)
+        .order_by(recording_catalog.c.session_id, recording_catalog.c.recording_number)
+    )
+    sessions = await db.execute(
+        select(session_catalog.c.session_id, session_catalog.c.total_recordings, session_catalog.c.total_data_points,
+               session_catalog.c.first_timestamp, session_catalog.c.last_timestamp, session_catalog.c.has_calibration)
+        .order_by(session_catalog.c.session_id)
+    )
+    return [tuple(row) for row in recordings.all()], [tuple(row) for row in sessions.all()]
+
+
+async def test_batches_of_a_recording_merge_into_one_row(db):
+    # Out of order: the second batch extends the recording on both sides
+    await record_recording_ingest(db, "session", 1, [5000, 5000, 6000], ["left", "right", "left"])
+    await record_recording_ingest(db, "session", 1, [1000, 9500], ["left", "left"])
+    await record_recording_ingest(db, "session", 2, [20_000], ["right"])
+    await db.commit()
+
+    recordings, sessions = await _catalog_rows(db)
+
+    assert recordings == [
+        ("session", 1, 5, 1000, 9500, 8, True, True),
+        ("session", 2, 1, 20_000, 20_000, 0, False, True),
+    ]
+    assert sessions == [("session", 2, 6, 1000, 20_000, False)]
+
+
+async def test_empty_batch_leaves_the_catalog_alone(db):
+    await record_recording_ingest(db, "session", 1, [], [])
+    await db.commit()
+
+    assert await _catalog_rows(db) == ([], [])
+
+
+async def test_deleting_a_session_keeps_it_only_if_calibrated(db):
+    calibrated = generate_session("calibrated", duration_s=2)
+    uncalibrated = generate_session("uncalibrated", duration_s=2)
+    service = EyeTrackingService(db)
+    await service.store_calibration_data("calibrated", calibrated.calibration_points)
+    await service.store_recording_data("calibrated", 1, calibrated.recordings[1])
+    await service.store_recording_data("uncalibrated", 1, uncalibrated.recordings[1])
+
+    await service.delete_session_data("calibrated")
+    await service.delete_session_data("uncalibrated")
+
+    recordings, sessions = await _catalog_rows(db)
+    assert recordings == []
+    assert sessions == [("calibrated", 0, 0, None, None, True)]
+
+
+async def test_rebuild_matches_the_incremental_catalog(db, monkeypatch):
+    service = EyeTrackingService(db)
+    for index in range(3):
+        session = generate_session(f"session-{index}", recordings=2, duration_s=3, seed=index)
+        if index != 1:
+            await service.store_calibration_data(session.session_id, session.calibration_points)
+        # Session 2 is stored packed, in several batches
+        monkeypatch.setattr(storage, "STORAGE_MODE", "packed" if index == 2 else "rows")
+        for recording_number, positions in session.recordings.items():
+            third = len(positions) // 3
+            for start in range(0, len(positions), third):
+                await service.store_recording_data(session.session_id, recording_number, positions[start:start + third])
+    await service.store_calibration_data("calibration-only", generate_session("calibration-only").calibration_points)
+    incremental = await _catalog_rows(db)
+
+    counts = await rebuild_catalog(db)
+
+    assert await _catalog_rows(db) == incremental
+    assert counts == {'sessions': 4, 'recordings': 6}
+    assert [row[:2] + row[-1:] for row in incremental[1]] == [
+        ("calibration-only", 0, True), ("session-0", 2, True), ("session-1", 2, False), ("session-2", 2, True),
+    ]
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from events import EventParameters, detect_events, validate_event_parameters
+from normalization import EyeArrays
+
+START = 1_700_000_000_000
+
+
+def _eye(timestamps, collapsed=()):
+    """Landmarks one unit wide, the corners collapsed onto each other at the given samples"""
+    n = len(timestamps)
+    corner_right = np.tile([1.0, 0.0, 0.0], (n, 1))
+    corner_right[list(collapsed)] = 0.0
+    return EyeArrays(
+        timestamps=np.asarray(timestamps, dtype=np.int64),
+        iris=np.tile([0.5, 0.0, 0.0], (n, 1)),
+        corner_left=np.zeros((n, 3)),
+        corner_right=corner_right,
+    )
+
+
+def _step():
+    """100 Hz: 30 samples at 0, three samples ramping up, then 30 samples at 0.5"""
+    values = np.concatenate((np.zeros(30), [0.125, 0.25, 0.375], np.full(30, 0.5)))
+    return START + 10 * np.arange(len(values)), values
+
+
+def _summary(events, *keys):
+    return [tuple(event[key] for key in ('type', 'start_ts', 'end_ts') + keys) for event in events]
+
+
+def test_ivt_on_a_step():
+    timestamps, values = _step()
+
+    result = detect_events(_eye(timestamps), values, EventParameters(method="ivt"))
+
+    # Every sample after the first off the plateau moves 12.5 units per second, the first on the
+    # next plateau included
+    assert _summary(result['events'], 'samples') == [
+        ('fixation', START, START + 290, 30),
+        ('saccade', START + 300, START + 330, 4),
+        ('fixation', START + 340, START + 620, 29),
+    ]
+    saccade = result['events'][1]
+    assert saccade['amplitude'] == 0.5 - 0.125
+    assert saccade['peak_velocity'] == pytest.approx(12.5)
+    assert result['events'][2]['mean_x'] == 0.5
+    assert result['summary']['fixation'] == {'count': 2, 'total_ms': 290 + 280}
+
+
+def test_idt_on_a_step():
+    timestamps, values = _step()
+
+    result = detect_events(_eye(timestamps), values, EventParameters(method="idt", dispersion_threshold=0.05))
+
+    assert _summary(result['events'], 'samples') == [
+        ('fixation', START, START + 290, 30),
+        ('saccade', START + 300, START + 320, 3),
+        ('fixation', START + 330, START + 620, 30),
+    ]
+    assert result['events'][0]['dispersion'] == 0.0
+
+
+@pytest.mark.parametrize("method", ["ivt", "idt"])
+def test_short_fixations_are_dropped(method):
+    timestamps, values = _step()
+
+    result = detect_events(_eye(timestamps), values, EventParameters(method=method, min_fixation_ms=295))
+
+    assert [event['type'] for event in result['events']] == ['saccade']
+
+
+def test_blinks_and_gaps():
+    timestamps = START + 10 * np.arange(200)
+    timestamps[150:] += 1000
+    values = np.zeros(200)
+    values[0] = np.nan
+    values[40:50] = np.nan
+
+    result = detect_events(_eye(timestamps, collapsed=range(100, 110)), values, EventParameters())
+
+    assert _summary(result['events'], 'duration_ms') == [
+        # A lost first sample runs from the edge of the recording, too short for a blink
+        ('gap', START, START + 10, 10),
+        ('fixation', START + 10, START + 390, 380),
+        ('blink', START + 390, START + 500, 110),
+        ('fixation', START + 500, START + 990, 490),
+        ('blink', START + 990, START + 1100, 110),
+        ('fixation', START + 1100, START + 1490, 390),
+        ('gap', START + 1490, START + 2500, 1010),
+        ('fixation', START + 2500, START + 2990, 490),
+    ]
+    assert result['summary']['blink'] == {'count': 2, 'total_ms': 220}
+    assert result['summary']['gap'] == {'count': 2, 'total_ms': 1020}
+    assert result['summary']['saccade'] == {'count': 0, 'total_ms': 0}
+
+
+def test_no_valid_sample_is_one_loss():
+    timestamps = START + 10 * np.arange(20)
+
+    result = detect_events(_eye(timestamps), np.full(20, np.nan), EventParameters())
+
+    assert _summary(result['events']) == [('blink', START, START + 190)]
+
+
+@pytest.mark.parametrize("parameters, message", [
+    (EventParameters(method="hmm"), "Unknown event detection method"),
+    (EventParameters(velocity_threshold=0), "velocity_threshold"),
+    (EventParameters(dispersion_threshold=-1), "dispersion_threshold"),
+    (EventParameters(blink_min_ms=600), "blink_min_ms"),
+    (EventParameters(resample_hz=0), "resample_hz"),
+])
+def test_validate_event_parameters(parameters, message):
+    with pytest.raises(ValueError, match=message):
+        validate_event_parameters(parameters)
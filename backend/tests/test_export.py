@@ -0,0 +1,94 @@
+import csv
+import gzip
+import io
+
+import pytest
+
+import storage
+from benchmarks.generator import generate_session
+from export import EXPORT_COLUMNS, export_session_ids, export_table, stream_table_rows
+from ingest import EYE_COLUMNS, positions_to_columns
+from services import EyeTrackingService
+
+
+def _expected_rows(session_id, recordings, start_ts=None, end_ts=None):
+    """eye_tracking_data rows in EXPORT_COLUMNS order, by recording then timestamp"""
+    rows = []
+    for recording_number, positions in sorted(recordings.items()):
+        columns = positions_to_columns(session_id, recording_number, positions)
+        names = ['session_id', 'recording_number', 'timestamp', 'eye_side', 'confidence', *EYE_COLUMNS]
+        rows.extend(
+            row for row in zip(*[columns[name] for name in names])
+            if (start_ts is None or row[2] >= start_ts) and (end_ts is None or row[2] <= end_ts)
+        )
+    return rows
+
+
+@pytest.fixture
+async def sessions(db, monkeypatch):
+    """Two sessions, each with a recording stored as rows and one stored packed, in several batches"""
+    service = EyeTrackingService(db)
+    recordings = {}
+    for index, session_id in enumerate(("first", "second")):
+        session = generate_session(session_id, recordings=2, duration_s=4,
+                                   start_ts=1_700_000_000_000 + index * 3_600_000, seed=index)
+        await service.store_calibration_data(session_id, session.calibration_points)
+        for recording_number, positions in session.recordings.items():
+            monkeypatch.setattr(storage, "STORAGE_MODE", "rows" if recording_number == 1 else "packed")
+            for start in range(0, len(positions), 50):
+                await service.store_recording_data(session_id, recording_number, positions[start:start + 50])
+        recordings[session_id] = session.recordings
+    return recordings
+
+
+async def test_rows_come_from_both_storages(db, sessions):
+    rows = [row async for batch in stream_table_rows(db, "eye_tracking_data", ["first", "second"], chunk_size=64)
+            for row in batch]
+
+    assert rows == _expected_rows("first", sessions["first"]) + _expected_rows("second", sessions["second"])
+
+
+async def test_time_range_selects_sessions_and_rows(db, sessions):
+    timestamps = [position['timestamp'] for position in sessions["first"][2]]
+    start_ts, end_ts = timestamps[10], timestamps[40]
+
+    session_ids = await export_session_ids(db, None, start_ts, end_ts)
+    rows = [row async for batch in stream_table_rows(db, "eye_tracking_data", session_ids, start_ts, end_ts)
+            for row in batch]
+
+    assert session_ids == ["first"]
+    assert rows == _expected_rows("first", sessions["first"], start_ts, end_ts)
+    assert {row[1] for row in rows} == {2}
+
+
+async def test_csv_export(db, sessions):
+    data = b"".join([chunk async for chunk in export_table(db, "eye_tracking_data", "csv", ["second"],
+                                                           row_group_size=100)])
+
+    lines = list(csv.reader(io.StringIO(gzip.decompress(data).decode())))
+
+    expected = _expected_rows("second", sessions["second"])
+    assert lines[0] == EXPORT_COLUMNS["eye_tracking_data"]
+    assert len(lines) == 1 + len(expected)
+    assert lines[1:] == [["" if value is None else str(value) for value in row] for row in expected]
+
+
+async def test_parquet_export(db, sessions):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    data = b"".join([chunk async for chunk in export_table(db, "eye_tracking_data", "parquet", ["first", "second"],
+                                                           row_group_size=100)])
+    table = pq.read_table(io.BytesIO(data))
+
+    expected = _expected_rows("first", sessions["first"]) + _expected_rows("second", sessions["second"])
+    assert table.column_names == EXPORT_COLUMNS["eye_tracking_data"]
+    assert [tuple(row.values()) for row in table.to_pylist()] == expected
+    assert pq.ParquetFile(io.BytesIO(data)).num_row_groups == -(-len(expected) // 100)
+
+
+async def test_calibration_export(db, sessions):
+    rows = [row async for batch in stream_table_rows(db, "calibration_data", ["first"]) for row in batch]
+
+    assert len(rows) > 0
+    assert {row[0] for row in rows} == {"first"}
+    assert [row[1] for row in rows] == sorted(row[1] for row in rows)
@@ -0,0 +1,140 @@
+import numpy as np
+import pytest
+
+from filters import (_MEDIAN_VIEW_MAX_WINDOW, FILTERS, SAVGOL_POLYORDER, ChunkedFilter, _running_median_sorted,
+                     _running_median_view, apply_filter, exponential_moving_average, moving_average, running_median,
+                     savitzky_golay)
+
+
+def _values(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    # Rounded so that the running median sees ties
+    return np.round(np.cumsum(rng.normal(size=n)), 1)
+
+
+def _windows(values, window):
+    half = window // 2
+    return [values[max(i - half, 0):i + half + 1] for i in range(len(values))]
+
+
+def brute_force_savgol(values, window, polyorder=SAVGOL_POLYORDER):
+    n = len(values)
+    half = window // 2
+    size = 2 * half + 1
+    smoothed = np.empty(n)
+    for i in range(n):
+        # Edge samples take the polynomial fitted on the first/last full window
+        start = min(max(i - half, 0), n - size)
+        offsets = np.arange(start, start + size) - i
+        smoothed[i] = np.polyval(np.polyfit(offsets, values[start:start + size], polyorder), 0)
+    return smoothed
+
+
+@pytest.mark.parametrize("window", [1, 2, 3, 4, 9, 50])
+def test_moving_average_matches_truncated_window_means(window):
+    values = _values()
+
+    expected = [window_values.mean() for window_values in _windows(values, window)]
+
+    np.testing.assert_allclose(moving_average(values, window), expected, rtol=1e-12, atol=1e-9)
+
+
+@pytest.mark.parametrize("window", [1, 2, 3, 8, _MEDIAN_VIEW_MAX_WINDOW - 1, _MEDIAN_VIEW_MAX_WINDOW,
+                                    _MEDIAN_VIEW_MAX_WINDOW + 1, _MEDIAN_VIEW_MAX_WINDOW + 2, 101])
+def test_running_median_matches_truncated_window_medians(window):
+    values = _values()
+
+    expected = [np.median(window_values) for window_values in _windows(values, window)]
+
+    np.testing.assert_array_equal(running_median(values, window), expected)
+
+
+@pytest.mark.parametrize("window", [_MEDIAN_VIEW_MAX_WINDOW, _MEDIAN_VIEW_MAX_WINDOW + 1])
+def test_running_median_paths_agree_across_the_switch(window):
+    values = _values(seed=1)
+
+    np.testing.assert_array_equal(_running_median_view(values, window), _running_median_sorted(values, window))
+
+
+@pytest.mark.parametrize("window", [2, 3, 10, 200])
+def test_ema_matches_its_recurrence(window):
+    # Long enough to cross several closed form blocks for every window
+    values = _values(n=20_000)
+    alpha = 2.0 / (window + 1)
+
+    expected = np.empty(len(values))
+    state = values[0]
+    for i, value in enumerate(values):
+        state = alpha * value + (1 - alpha) * state
+        expected[i] = state
+
+    np.testing.assert_allclose(exponential_moving_average(values, window), expected, rtol=1e-9, atol=1e-9)
+
+
+def test_ema_starts_from_the_initial_state():
+    smoothed = exponential_moving_average(np.array([1.0, 1.0]), 3, initial=3.0)
+
+    np.testing.assert_allclose(smoothed, [2.0, 1.5])
+
+
+@pytest.mark.parametrize("window", [3, 4, 5, 11, 21])
+def test_savgol_matches_local_polynomial_fits(window):
+    values = _values(n=200)
+
+    np.testing.assert_allclose(savitzky_golay(values, window), brute_force_savgol(values, window), atol=1e-9)
+
+
+def test_savgol_keeps_a_quadratic_exactly():
+    x = np.arange(50, dtype=np.float64)
+    values = 0.5 * x ** 2 - 3 * x + 2
+
+    np.testing.assert_allclose(savitzky_golay(values, 7), values, atol=1e-9)
+
+
+def test_savgol_rejects_window_below_polynomial_order():
+    with pytest.raises(ValueError, match="polynomial order"):
+        apply_filter(_values(), "savgol", 1)
+
+
+@pytest.mark.parametrize("filter_name", ["moving_average", "median", "savgol"])
+def test_short_series_is_returned_unchanged(filter_name):
+    values = np.array([1.0, 5.0, 2.0])
+
+    np.testing.assert_array_equal(apply_filter(values, filter_name, 5), values)
+
+
+@pytest.mark.parametrize("filter_name", list(FILTERS))
+@pytest.mark.parametrize("window", [3, 4, 40])
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 1000])
+def test_chunked_filter_matches_the_whole_series(filter_name, window, chunk_size):
+    values = _values(n=300)
+    timestamps = 1_700_000_000_000 + 33 * np.arange(len(values), dtype=np.int64)
+    chunked = ChunkedFilter(filter_name, window)
+
+    emitted_timestamps, emitted_values = [], []
+    for start in range(0, len(values), chunk_size):
+        chunk_timestamps, chunk_values = chunked.push(timestamps[start:start + chunk_size],
+                                                      values[start:start + chunk_size])
+        emitted_timestamps.append(chunk_timestamps)
+        emitted_values.append(chunk_values)
+    chunk_timestamps, chunk_values = chunked.push(timestamps[:0], values[:0], final=True)
+    emitted_timestamps.append(chunk_timestamps)
+    emitted_values.append(chunk_values)
+
+    np.testing.assert_array_equal(np.concatenate(emitted_timestamps), timestamps)
+    np.testing.assert_allclose(np.concatenate(emitted_values), apply_filter(values, filter_name, window),
+                               rtol=1e-12, atol=1e-9)
+
+
+@pytest.mark.parametrize("filter_name", ["moving_average", "median", "savgol"])
+def test_chunked_filter_on_a_series_shorter_than_the_window(filter_name):
+    values = _values(n=5)
+    timestamps = np.arange(5, dtype=np.int64)
+    chunked = ChunkedFilter(filter_name, 9)
+
+    first = chunked.push(timestamps[:3], values[:3])
+    last = chunked.push(timestamps[3:], values[3:], final=True)
+
+    assert len(first[0]) == 0
+    np.testing.assert_array_equal(last[0], timestamps)
+    np.testing.assert_array_equal(last[1], values)
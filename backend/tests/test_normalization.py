@@ -0,0 +1,119 @@
+import copy
+
+import numpy as np
+import pytest
+
+from benchmarks.generator import generate_session
+from normalization import (calibration_reference, calibration_references, eye_arrays_from_positions, normalize_eye,
+                           series_eye)
+from services import EyeTrackingService
+from utils import calculate_normalized_position
+
+EYE_KEYS = {"left": "leftEye", "right": "rightEye"}
+
+
+def _as_left_eye(item: dict, eye_key: str) -> dict:
+    """The scalar path only reads leftEye: move the eye under test there"""
+    return {**item, "leftEye": item.get(eye_key)}
+
+
+def scalar_series(positions, calibration_points, eye_key):
+    """(timestamps, values) of calculate_normalized_position, frame by frame, skipping frames it returns None for"""
+    calibration = [_as_left_eye(point, eye_key) for point in calibration_points]
+    pairs = [
+        (position["timestamp"], calculate_normalized_position(_as_left_eye(position, eye_key), calibration))
+        for position in positions
+    ]
+    pairs = [(timestamp, value) for timestamp, value in pairs if value is not None]
+    return np.array([t for t, _ in pairs], dtype=np.int64), np.array([v for _, v in pairs], dtype=np.float64)
+
+
+@pytest.fixture
+def session():
+    return generate_session("session", duration_s=3)
+
+
+@pytest.mark.parametrize("eye", ["left", "right", "both"])
+def test_normalize_eye_matches_scalar_path(session, eye):
+    positions = session.recordings[1]
+    eye_key = EYE_KEYS[series_eye(eye)]
+    # Drop the eye from a few frames, as blinks and tracking losses do
+    for position in positions[::7]:
+        position[eye_key] = None
+
+    reference = calibration_reference(session.calibration_points, eye_key)
+    timestamps, values = normalize_eye(eye_arrays_from_positions(positions, eye_key), reference)
+    expected_timestamps, expected_values = scalar_series(positions, session.calibration_points, eye_key)
+
+    assert len(expected_timestamps) < len(positions)
+    np.testing.assert_array_equal(timestamps, expected_timestamps)
+    # Same operations in the same order: identical, not just close
+    np.testing.assert_array_equal(values, expected_values)
+
+
+def test_normalize_eye_drops_frames_with_missing_landmarks(session):
+    positions = session.recordings[1][:20]
+    reference = calibration_reference(session.calibration_points, "leftEye")
+    eye_arrays = eye_arrays_from_positions(positions, "leftEye")
+    eye_arrays.iris[3, 0] = np.nan
+    eye_arrays.corner_left[5, 2] = np.nan
+
+    timestamps, values = normalize_eye(eye_arrays, reference)
+
+    kept = [index for index in range(len(positions)) if index not in (3, 5)]
+    expected_timestamps, expected_values = scalar_series([positions[index] for index in kept],
+                                                         session.calibration_points, "leftEye")
+    np.testing.assert_array_equal(timestamps, expected_timestamps)
+    np.testing.assert_array_equal(values, expected_values)
+    assert np.isfinite(values).all()
+
+
+def test_zero_width_calibration_normalizes_nothing(session):
+    calibration = copy.deepcopy(session.calibration_points)
+    eye = calibration[0]["leftEye"]
+    # Iris as far from both corners: zero range
+    eye["corners"][1] = {"x": 2 * eye["center"]["x"] - eye["corners"][0]["x"],
+                         "y": 2 * eye["center"]["y"] - eye["corners"][0]["y"],
+                         "z": 2 * eye["center"]["z"] - eye["corners"][0]["z"]}
+    positions = session.recordings[1][:10]
+
+    assert calibration_reference(calibration, "leftEye") is None
+    assert all(calculate_normalized_position(position, calibration) is None for position in positions)
+    timestamps, values = normalize_eye(eye_arrays_from_positions(positions, "leftEye"), None)
+    assert len(timestamps) == len(values) == 0
+
+
+def test_missing_calibration_eye_has_no_reference(session):
+    calibration = copy.deepcopy(session.calibration_points)
+    calibration[0]["rightEye"] = None
+
+    references = calibration_references(calibration)
+
+    assert references["right"] is None
+    assert references["left"] == calibration_reference(calibration, "leftEye")
+    assert calibration_references([]) == {"left": None, "right": None}
+
+
+def test_series_eye():
+    assert series_eye("left") == "left"
+    assert series_eye("right") == "right"
+    # 'both' keeps the historical left eye series
+    assert series_eye("both") == "left"
+
+
+@pytest.mark.parametrize("eye", ["left", "right", "both"])
+async def test_recording_series_uses_the_reference_of_its_eye(db, session, eye):
+    service = EyeTrackingService(db)
+    await service.store_calibration_data("session", session.calibration_points)
+    await service.store_recording_data("session", 1, session.recordings[1])
+
+    timestamps, values = await service.get_recording_series("session", 1, eye)
+
+    eye_key = EYE_KEYS[series_eye(eye)]
+    expected_timestamps, expected_values = scalar_series(session.recordings[1], session.calibration_points, eye_key)
+    np.testing.assert_array_equal(timestamps, expected_timestamps)
+    np.testing.assert_allclose(values, expected_values, rtol=0, atol=1e-12)
+    if eye == "right":
+        # The right eye series differs from the left eye normalized with the left reference
+        _, left_values = scalar_series(session.recordings[1], session.calibration_points, "leftEye")
+        assert not np.array_equal(values, left_values)
@@ -0,0 +1,168 @@
+import numpy as np
+import pytest
+
+from benchmarks.generator import generate_session
+from pyramid import MIN_BUCKET_SIZE, PYRAMID_METHODS, Pyramid
+from services import EyeTrackingService
+
+
+@pytest.fixture(scope="module")
+def series():
+    rng = np.random.default_rng(0)
+    n = 100_003  # Not a multiple of the bucket sizes: the last buckets are partial
+    timestamps = 1_700_000_000_000 + np.cumsum(rng.integers(30, 37, n))
+    values = np.cumsum(rng.normal(0.0, 0.01, n))
+    return timestamps, values
+
+
+@pytest.fixture(scope="module")
+def pyramid(series):
+    return Pyramid.build(*series)
+
+
+def expected_level(pyramid, start_ts, end_ts, max_points, method):
+    """Index of the finest level whose buckets overlapping the range fit the budget, by linear search"""
+    for index, level in enumerate(pyramid.levels):
+        first, last = pyramid._overlapping(level, start_ts, end_ts)
+        if (last - first) * PYRAMID_METHODS[method] <= max_points:
+            return index
+    return None
+
+
+def test_levels_aggregate_the_series(series, pyramid):
+    timestamps, values = series
+    assert pyramid.sample_count == len(values)
+    for index, level in enumerate(pyramid.levels):
+        size = MIN_BUCKET_SIZE << index
+        assert level.bucket_size == size
+        assert len(level) == -(-len(values) // size)
+        starts = np.arange(0, len(values), size)
+        np.testing.assert_array_equal(level.start_ts, timestamps[starts])
+        np.testing.assert_array_equal(level.count, np.diff(np.append(starts, len(values))))
+        np.testing.assert_allclose(level.sum, np.add.reduceat(values, starts))
+        np.testing.assert_array_equal(level.min, np.minimum.reduceat(values, starts))
+        np.testing.assert_array_equal(level.max, np.maximum.reduceat(values, starts))
+        np.testing.assert_array_equal(values[np.searchsorted(timestamps, level.min_ts)], level.min)
+        np.testing.assert_array_equal(values[np.searchsorted(timestamps, level.max_ts)], level.max)
+    assert len(pyramid.levels[-1]) <= 2
+
+
+@pytest.mark.parametrize("method", list(PYRAMID_METHODS))
+@pytest.mark.parametrize("max_points", [3, 10, 100, 1000, 5000])
+@pytest.mark.parametrize("span", [(None, None), (0.1, 0.9), (0.5, 0.52), (0.3, None)])
+def test_select_picks_the_finest_level_within_budget(series, pyramid, method, max_points, span):
+    timestamps, values = series
+    start_ts = None if span[0] is None else int(timestamps[int(span[0] * len(timestamps))])
+    end_ts = None if span[1] is None else int(timestamps[int(span[1] * len(timestamps))])
+
+    selected = pyramid.select(start_ts, end_ts, max_points, method)
+
+    index = expected_level(pyramid, start_ts, end_ts, max_points, method)
+    if selected is None and index:
+        # No extreme of the chosen level falls inside the range, see the test below
+        assert method == "minmax"
+        return
+    if index is None or index == 0:
+        # The finest level fits (the raw range is small) or even the coarsest does not: the caller downsamples the raw range
+        assert selected is None
+        return
+    selected_timestamps, selected_values = selected
+    assert 0 < len(selected_timestamps) <= max_points
+    assert np.all(np.diff(selected_timestamps) > 0)
+
+    level = pyramid.levels[index]
+    first, last = pyramid._overlapping(level, start_ts, end_ts)
+    if method == "mean":
+        # Buckets straddling the range ends are kept whole
+        np.testing.assert_allclose(selected_values, level.sum[first:last] / level.count[first:last])
+        assert start_ts is None or level.end_ts[first] >= start_ts
+        assert end_ts is None or level.start_ts[last - 1] <= end_ts
+    else:
+        if start_ts is not None:
+            assert selected_timestamps[0] >= start_ts
+        if end_ts is not None:
+            assert selected_timestamps[-1] <= end_ts
+        # Actual samples of the series, taken from the chosen level's extremes
+        assert set(selected_timestamps.tolist()) <= set(level.min_ts[first:last].tolist()) | set(level.max_ts[first:last].tolist())
+        np.testing.assert_array_equal(values[np.searchsorted(timestamps, selected_timestamps)], selected_values)
+    # The next finer level would exceed the budget
+    finer = pyramid.levels[index - 1]
+    finer_first, finer_last = pyramid._overlapping(finer, start_ts, end_ts)
+    assert (finer_last - finer_first) * PYRAMID_METHODS[method] > max_points
+
+
+def test_select_falls_back_when_no_extreme_is_in_range(series, pyramid):
+    timestamps, _ = series
+    start_ts, end_ts = int(timestamps[50_000]), int(timestamps[52_000])
+    index = expected_level(pyramid, start_ts, end_ts, 3, "minmax")
+    level = pyramid.levels[index]
+    first, last = pyramid._overlapping(level, start_ts, end_ts)
+    extremes = np.concatenate((level.min_ts[first:last], level.max_ts[first:last]))
+    # A single coarse bucket covers the range, and its extremes lie outside it
+    assert index > 0 and last - first == 1
+    assert not np.any((extremes >= start_ts) & (extremes <= end_ts))
+
+    assert pyramid.select(start_ts, end_ts, 3, "minmax") is None
+
+
+def test_select_whole_series_keeps_its_extremes(series, pyramid):
+    timestamps, values = series
+
+    selected_timestamps, selected_values = pyramid.select(None, None, 200, "minmax")
+
+    assert selected_values.min() == values.min()
+    assert selected_values.max() == values.max()
+
+
+def test_select_coarsest_level_over_budget_falls_back(pyramid):
+    coarsest = len(pyramid.levels[-1]) * PYRAMID_METHODS["minmax"]
+    assert pyramid.select(None, None, coarsest - 1, "minmax") is None
+
+
+def test_short_series_has_no_levels():
+    pyramid = Pyramid.build(np.arange(2 * MIN_BUCKET_SIZE - 1), np.zeros(2 * MIN_BUCKET_SIZE - 1))
+
+    assert pyramid.levels == []
+    assert pyramid.select(None, None, 3, "minmax") is None
+
+
+def test_bytes_round_trip(pyramid):
+    restored = Pyramid.from_bytes(pyramid.to_bytes())
+
+    assert restored.sample_count == pyramid.sample_count
+    assert len(restored.levels) == len(pyramid.levels)
+    for level, restored_level in zip(pyramid.levels, restored.levels):
+        assert restored_level.bucket_size == level.bucket_size
+        for field in ("start_ts", "end_ts", "min_ts", "min", "max_ts", "max", "sum", "count"):
+            np.testing.assert_array_equal(getattr(restored_level, field), getattr(level, field))
+
+
+async def test_default_zoom_is_served_by_the_pyramid(db, monkeypatch):
+    session = generate_session("session", duration_s=120)
+    service = EyeTrackingService(db)
+    await service.store_calibration_data("session", session.calibration_points)
+    await service.store_recording_data("session", 1, session.recordings[1])
+    full_timestamps, full_values = await service.get_recording_series("session", 1, "left")
+
+    selections = []
+    select = Pyramid.select
+
+    def spy(self, *args):
+        result = select(self, *args)
+        selections.append(result is not None)
+        return result
+
+    async def read_range(*args, **kwargs):
+        raise AssertionError("the zoomed-out view read the full-resolution series")
+
+    monkeypatch.setattr(Pyramid, "select", spy)
+    await service.get_pyramid("session", 1, "left")
+    monkeypatch.setattr(service, "get_recording_series", read_range)
+
+    timestamps, values = await service.get_recording_arrays("session", 1, "left", max_points=100)
+
+    assert selections == [True]
+    assert 0 < len(timestamps) <= 100
+    assert values.min() == full_values.min()
+    assert values.max() == full_values.max()
+    assert set(timestamps.tolist()) <= set(full_timestamps.tolist())
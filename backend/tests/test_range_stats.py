@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from range_stats import BLOCK_SIZE, RangeIndex, parse_percentiles
+
+
+@pytest.fixture(scope="module")
+def series():
+    rng = np.random.default_rng(0)
+    n = 5000
+    # Repeated timestamps, and values far from zero to exercise the centering
+    timestamps = 1_700_000_000_000 + np.cumsum(rng.integers(0, 40, size=n))
+    values = 1e4 + np.cumsum(rng.normal(size=n))
+    return timestamps, values, RangeIndex(timestamps, values)
+
+
+def _expected(timestamps, values, start, end):
+    window = values[start:end]
+    seconds = np.diff(timestamps[start:end]) / 1000.0
+    steps = np.abs(np.diff(window))[seconds > 0] / seconds[seconds > 0]
+    return {
+        'count': len(window),
+        'mean': window.mean(),
+        'std': window.std(),
+        'min': window.min(),
+        'max': window.max(),
+        'mean_abs_velocity': steps.mean() if len(steps) else None,
+    }
+
+
+def test_stats_match_numpy_on_random_slices(series):
+    timestamps, values, index = series
+    rng = np.random.default_rng(1)
+
+    for _ in range(300):
+        start, end = sorted(rng.integers(0, len(values), size=2))
+        start_ts, end_ts = int(timestamps[start]), int(timestamps[end])
+        first, last = index.bounds(start_ts, end_ts)
+
+        stats = index.stats(start_ts, end_ts, percentiles=[10, 50])
+        expected = _expected(timestamps, values, first, last)
+
+        assert (first, last) == (np.searchsorted(timestamps, start_ts), np.searchsorted(timestamps, end_ts, 'right'))
+        assert stats['count'] == expected['count']
+        assert stats['min'] == expected['min']
+        assert stats['max'] == expected['max']
+        assert stats['mean'] == pytest.approx(expected['mean'], rel=1e-12)
+        assert stats['std'] == pytest.approx(expected['std'], rel=1e-6, abs=1e-9)
+        assert stats['percentiles'] == pytest.approx(dict(zip(["10", "50"], np.percentile(values[first:last], [10, 50]))))
+        if expected['mean_abs_velocity'] is None:
+            assert stats['mean_abs_velocity'] is None
+        else:
+            assert stats['mean_abs_velocity'] == pytest.approx(expected['mean_abs_velocity'], rel=1e-9)
+
+
+@pytest.mark.parametrize("start, end", [
+    (0, 1), (0, BLOCK_SIZE), (1, BLOCK_SIZE - 1), (BLOCK_SIZE - 1, BLOCK_SIZE + 1),
+    (BLOCK_SIZE, 3 * BLOCK_SIZE), (5, 5000), (0, 5000),
+])
+def test_extremes_across_block_boundaries(series, start, end):
+    _, values, index = series
+
+    assert index._extreme(start, end, index.block_min, np.minimum) == values[start:end].min()
+    assert index._extreme(start, end, index.block_max, np.maximum) == values[start:end].max()
+
+
+def test_whole_series_without_bounds(series):
+    timestamps, values, index = series
+
+    stats = index.stats(percentiles=[])
+
+    assert stats['count'] == len(values)
+    assert stats['min'] == values.min()
+    assert stats['max'] == values.max()
+    assert stats['percentiles'] == {}
+
+
+def test_empty_range(series):
+    timestamps, _, index = series
+
+    stats = index.stats(int(timestamps[-1]) + 1, None, percentiles=[50])
+
+    assert stats == {'count': 0, 'mean': None, 'std': None, 'min': None, 'max': None,
+                     'percentiles': {'50': None}, 'mean_abs_velocity': None}
+
+
+def test_empty_series():
+    index = RangeIndex(np.empty(0, dtype=np.int64), np.empty(0))
+
+    assert index.stats()['count'] == 0
+
+
+def test_parse_percentiles():
+    assert parse_percentiles(" 5, 50,,99.5") == [5.0, 50.0, 99.5]
+    with pytest.raises(ValueError, match="between 0 and 100"):
+        parse_percentiles("101")
+    with pytest.raises(ValueError, match="Invalid percentile 'x'"):
+        parse_percentiles("5, x")
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from normalization import EyeArrays
+from resampling import (MAX_RESAMPLED_POINTS, apply_per_segment, finite_segments, resample, resample_eye,
+                        validate_resampling)
+
+START = 1_700_000_000_000
+
+
+def test_linear_signal_is_interpolated_exactly():
+    rng = np.random.default_rng(0)
+    timestamps = START + np.cumsum(rng.integers(20, 45, size=300))
+    values = 0.002 * (timestamps - START) - 1.0
+
+    grid, resampled = resample(timestamps, values, rate_hz=100, max_gap_ms=100)
+
+    assert grid[0] == timestamps[0]
+    assert len(grid) == (timestamps[-1] - timestamps[0]) // 10 + 1
+    np.testing.assert_array_equal(np.diff(grid), 10)
+    np.testing.assert_allclose(resampled, 0.002 * (grid - START) - 1.0, atol=1e-9)
+
+
+def test_grid_points_inside_long_gaps_are_nan():
+    timestamps = START + np.array([0, 30, 60, 300, 330, 450, 480])
+    values = np.arange(len(timestamps), dtype=np.float64)
+
+    grid, resampled = resample(timestamps, values, rate_hz=100, max_gap_ms=100)
+
+    expected = np.interp(grid, timestamps, values)
+    # 60 -> 300 and 330 -> 450 are longer than 100 ms; the samples bounding them are not inside
+    in_gap = ((grid > START + 60) & (grid < START + 300)) | ((grid > START + 330) & (grid < START + 450))
+    np.testing.assert_array_equal(np.isnan(resampled), in_gap)
+    np.testing.assert_allclose(resampled[~in_gap], expected[~in_gap])
+
+
+def test_gap_of_exactly_max_gap_is_bridged():
+    grid, resampled = resample(START + np.array([0, 100]), np.array([0.0, 1.0]), rate_hz=20, max_gap_ms=100)
+
+    np.testing.assert_array_equal(grid, START + np.array([0, 50, 100]))
+    np.testing.assert_allclose(resampled, [0.0, 0.5, 1.0])
+
+
+def test_columns_and_duplicate_timestamps():
+    timestamps = START + np.array([0, 0, 20, 40])
+    values = np.array([[0.0, 10.0], [5.0, 5.0], [2.0, 12.0], [4.0, 14.0]])
+
+    grid, resampled = resample(timestamps, values, rate_hz=100)
+
+    # The first of the duplicated samples is kept
+    np.testing.assert_allclose(resampled, [[0, 10], [1, 11], [2, 12], [3, 13], [4, 14]])
+    assert resampled.shape == (len(grid), 2)
+
+
+def test_empty_series():
+    grid, resampled = resample(np.empty(0, dtype=np.int64), np.empty(0), rate_hz=60)
+
+    assert len(grid) == 0 and len(resampled) == 0
+
+
+def test_resample_eye_keeps_the_landmark_columns():
+    timestamps = START + np.array([0, 40])
+    eye = EyeArrays(
+        timestamps=timestamps,
+        iris=np.array([[0.0, 1.0, 2.0], [4.0, 5.0, 6.0]]),
+        corner_left=np.zeros((2, 3)),
+        corner_right=np.ones((2, 3)),
+    )
+
+    resampled = resample_eye(eye, rate_hz=50)
+
+    np.testing.assert_array_equal(resampled.timestamps, START + np.array([0, 20, 40]))
+    np.testing.assert_allclose(resampled.iris[1], [2.0, 3.0, 4.0])
+    np.testing.assert_array_equal(resampled.corner_right, np.ones((3, 3)))
+
+
+def test_oversized_grid_is_refused():
+    with pytest.raises(ValueError, match=str(MAX_RESAMPLED_POINTS)):
+        resample(np.array([0, 10 * MAX_RESAMPLED_POINTS]), np.zeros(2), rate_hz=1000)
+
+
+@pytest.mark.parametrize("rate_hz, max_gap_ms", [(0, 100), (1001, 100), (60, 0)])
+def test_validate_resampling(rate_hz, max_gap_ms):
+    with pytest.raises(ValueError):
+        validate_resampling(rate_hz, max_gap_ms)
+
+
+def test_filters_run_per_finite_segment():
+    values = np.array([np.nan, 1.0, 2.0, np.nan, np.nan, 3.0, 4.0, 5.0])
+
+    output = apply_per_segment(values, lambda segment: segment - segment.mean())
+
+    np.testing.assert_array_equal(finite_segments(values), [[1, 3], [5, 8]])
+    np.testing.assert_array_equal(output, [np.nan, -0.5, 0.5, np.nan, np.nan, -1.0, 0.0, 1.0])
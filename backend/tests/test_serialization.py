@@ -0,0 +1,143 @@
+import struct
+
+import numpy as np
+import pytest
+
+from ingest import EYE_COLUMNS
+from serialization import (RECORDING_MAGIC, SERIES_MAGIC, decode_recording, decode_series, encode_recording,
+                           encode_series)
+
+
+def test_series_round_trip():
+    timestamps = np.array([1_700_000_000_000, 1_700_000_000_033, 1_700_000_000_067], dtype=np.int64)
+    values = np.array([0.25, -1.5, np.nan])
+
+    buffer = encode_series(timestamps, values)
+    decoded_timestamps, decoded_values = decode_series(buffer)
+
+    assert len(buffer) == 8 + 12 * len(timestamps)
+    assert buffer[:4] == SERIES_MAGIC
+    assert struct.unpack_from("<I", buffer, 4) == (len(timestamps),)
+    np.testing.assert_array_equal(decoded_timestamps, timestamps)
+    np.testing.assert_array_equal(decoded_values, values.astype(np.float32))
+
+
+def test_series_round_trip_empty():
+    timestamps, values = decode_series(encode_series(np.empty(0, dtype=np.int64), np.empty(0)))
+
+    assert len(timestamps) == 0
+    assert len(values) == 0
+
+
+def test_series_layout_is_little_endian_timestamps_then_values():
+    buffer = encode_series(np.array([1, 2]), np.array([0.5, 1.0]))
+
+    assert buffer[8:24] == struct.pack("<qq", 1, 2)
+    assert buffer[24:32] == struct.pack("<ff", 0.5, 1.0)
+
+
+def test_series_rejects_bad_magic():
+    buffer = bytearray(encode_series(np.array([1]), np.array([0.5])))
+    buffer[:4] = b"XXXX"
+
+    with pytest.raises(ValueError, match="Not an eye tracking series"):
+        decode_series(bytes(buffer))
+
+
+@pytest.mark.parametrize("size_change", [-1, 1, 12])
+def test_series_rejects_wrong_length(size_change):
+    buffer = encode_series(np.array([1, 2, 3]), np.array([0.1, 0.2, 0.3]))
+    buffer = buffer[:size_change] if size_change < 0 else buffer + b"\0" * size_change
+
+    with pytest.raises(ValueError, match="expected for 3 samples"):
+        decode_series(buffer)
+
+
+def test_series_rejects_truncated_header():
+    with pytest.raises(ValueError, match="shorter than its header"):
+        decode_series(SERIES_MAGIC + b"\1")
+
+
+def _recording(n=4, confidence=True, eyes=("left", "right")):
+    rng = np.random.default_rng(0)
+    timestamps = 1_700_000_000_000 + 33 * np.arange(n, dtype=np.int64)
+    return (
+        timestamps,
+        rng.random(n).astype(np.float32) if confidence else None,
+        {eye_side: rng.random((len(EYE_COLUMNS), n)).astype(np.float32) for eye_side in eyes},
+    )
+
+
+@pytest.mark.parametrize("confidence, eyes", [
+    (True, ("left", "right")),
+    (False, ("left",)),
+    (True, ("right",)),
+    (False, ()),
+])
+def test_recording_round_trip(confidence, eyes):
+    timestamps, confidences, eye_blocks = _recording(confidence=confidence, eyes=eyes)
+
+    buffer = encode_recording(7, timestamps, confidences, eye_blocks)
+    recording = decode_recording(buffer)
+
+    assert len(buffer) == 24 + 8 * 4 + 4 * 4 * (confidence + len(EYE_COLUMNS) * len(eyes))
+    assert recording.recording_number == 7
+    np.testing.assert_array_equal(recording.timestamps, timestamps)
+    if confidence:
+        np.testing.assert_array_equal(recording.confidence, confidences)
+    else:
+        assert recording.confidence is None
+    for eye_side in ("left", "right"):
+        if eye_side in eyes:
+            assert list(recording.eyes[eye_side]) == list(EYE_COLUMNS)
+            np.testing.assert_array_equal(np.stack(list(recording.eyes[eye_side].values())), eye_blocks[eye_side])
+        else:
+            assert recording.eyes[eye_side] is None
+
+
+def test_recording_header_layout():
+    timestamps, confidences, eye_blocks = _recording(n=3, eyes=("right",))
+
+    buffer = encode_recording(-2, timestamps, confidences, eye_blocks)
+
+    assert struct.unpack_from("<4sIqII", buffer, 0) == (RECORDING_MAGIC, 1 | 4, -2, 3, 0)
+
+
+def test_recording_rejects_bad_magic():
+    buffer = bytearray(encode_recording(1, *_recording()))
+    buffer[:4] = b"ETS1"
+
+    with pytest.raises(ValueError, match="Not an eye tracking recording"):
+        decode_recording(bytes(buffer))
+
+
+@pytest.mark.parametrize("size_change", [-1, -4, 4])
+def test_recording_rejects_wrong_length(size_change):
+    buffer = encode_recording(1, *_recording())
+    buffer = buffer[:size_change] if size_change < 0 else buffer + b"\0" * size_change
+
+    with pytest.raises(ValueError, match="expected for 4 frames"):
+        decode_recording(buffer)
+
+
+def test_recording_rejects_length_of_other_flags():
+    # A body laid out for both eyes does not decode as a left-eye-only body
+    buffer = bytearray(encode_recording(1, *_recording()))
+    struct.pack_into("<I", buffer, 4, 1 | 2)
+
+    with pytest.raises(ValueError, match="expected"):
+        decode_recording(bytes(buffer))
+
+
+@pytest.mark.parametrize("flags", [8, 1 | 16, 0x80000000])
+def test_recording_rejects_unknown_flags(flags):
+    buffer = bytearray(encode_recording(1, *_recording()))
+    struct.pack_into("<I", buffer, 4, flags)
+
+    with pytest.raises(ValueError, match="Unknown binary recording flags"):
+        decode_recording(bytes(buffer))
+
+
+def test_recording_rejects_truncated_header():
+    with pytest.raises(ValueError, match="shorter than its header"):
+        decode_recording(RECORDING_MAGIC + b"\0" * 8)
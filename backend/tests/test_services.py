@@ -0,0 +1,45 @@
+import numpy as np
+
+from benchmarks.generator import START_TIMESTAMP, generate_session
+from derived import has_current_normalized
+from jobs import recording_jobs
+from services import EyeTrackingService
+
+
+async def test_batch_after_recalibration_does_not_hide_earlier_frames(db):
+    session = generate_session("session", duration_s=4)
+    positions = session.recordings[1]
+    half = len(positions) // 2
+    service = EyeTrackingService(db)
+
+    await service.store_calibration_data("session", session.calibration_points)
+    await service.store_recording_data("session", 1, positions[:half])
+    assert await has_current_normalized(db, "session", 1)
+
+    # Recalibrating drops the stored series and queues its recomputation; jobs are not run here
+    recalibration = generate_session("session", start_ts=START_TIMESTAMP + 1, seed=1).calibration_points
+    await service.store_calibration_data("session", recalibration)
+    await service.store_recording_data("session", 1, positions[half:])
+
+    assert not await has_current_normalized(db, "session", 1)
+    assert [job['kind'] for job in await recording_jobs(db, "session", 1)].count("normalize") == 1
+    for eye in ("left", "right"):
+        timestamps, values = await service.get_recording_series("session", 1, eye)
+        expected = [position['timestamp'] for position in positions if position.get(f"{eye}Eye")]
+        np.testing.assert_array_equal(timestamps, expected)
+        assert not np.isnan(values).all()
+
+
+async def test_batches_of_a_calibrated_recording_extend_its_series(db):
+    session = generate_session("session", duration_s=4)
+    positions = session.recordings[1]
+    half = len(positions) // 2
+    service = EyeTrackingService(db)
+
+    await service.store_calibration_data("session", session.calibration_points)
+    await service.store_recording_data("session", 1, positions[:half])
+    await service.store_recording_data("session", 1, positions[half:])
+
+    assert await has_current_normalized(db, "session", 1)
+    timestamps, _ = await service.get_recording_series("session", 1, "left")
+    assert len(timestamps) == sum(1 for position in positions if position.get("leftEye"))
@@ -0,0 +1,145 @@
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+import storage
+from benchmarks.generator import generate_session
+from database import RecordingChunk
+from ingest import EYE_COLUMNS, positions_to_columns
+from services import EyeTrackingService
+from storage import PACKED_STORAGE, ROW_STORAGE, Frames, pack_frames, recording_storage, unpack_frames
+
+# Small chunks, so that a few batches open several chunks and top up the last one
+CHUNK_SIZE = 50
+BATCH_SIZES = [30, 45, 7, 120, 1, 60]
+
+
+def _positions(duration_s=10, seed=0):
+    positions = generate_session("session", duration_s=duration_s, seed=seed).recordings[1]
+    for index, position in enumerate(positions):
+        # Frames with a single eye, and with no confidence
+        if index % 7 == 3:
+            position['leftEye'] = None
+        if index % 11 == 5:
+            position['rightEye'] = None
+        if index % 13 == 0:
+            position['confidence'] = None
+    return positions
+
+
+def _batches(positions):
+    start = 0
+    for size in BATCH_SIZES * len(positions):
+        if start >= len(positions):
+            return
+        yield positions[start:start + size]
+        start += size
+
+
+async def _store(db, monkeypatch, session_id, mode, positions):
+    monkeypatch.setattr(storage, "STORAGE_MODE", mode)
+    service = EyeTrackingService(db)
+    for batch in _batches(positions):
+        await service.store_recording_data(session_id, 1, batch)
+
+
+def _rows(columns):
+    """The stored rows of a read_columns result, without the columns set at write time"""
+    names = ['timestamp', 'eye_side', 'recording_number', 'confidence', *EYE_COLUMNS]
+    return list(zip(*[columns[name] for name in names]))
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(storage, "PACKED_CHUNK_SIZE", CHUNK_SIZE)
+
+
+def test_chunk_round_trip():
+    columns = positions_to_columns("session", 1, _positions(duration_s=2))
+    frames = Frames.from_columns(columns)
+
+    chunk = pack_frames(frames)
+    decoded = unpack_frames(chunk['timestamps'], chunk['eye_mask'], chunk['samples'])
+
+    assert chunk['frame_count'] == len(frames)
+    assert chunk['left_count'] == columns['eye_side'].count('left')
+    assert chunk['right_count'] == columns['eye_side'].count('right')
+    assert (chunk['first_timestamp'], chunk['last_timestamp']) == (frames.timestamps[0], frames.timestamps[-1])
+    np.testing.assert_array_equal(decoded.timestamps, frames.timestamps)
+    np.testing.assert_array_equal(decoded.eye_mask, frames.eye_mask)
+    np.testing.assert_array_equal(decoded.samples, frames.samples)
+    # Rows of eye_tracking_data, without the recording number
+    assert decoded.rows() == [row[:2] + row[3:] for row in _rows(columns)]
+
+
+def test_batch_repeating_a_frame_is_rejected():
+    columns = positions_to_columns("session", 1, _positions(duration_s=1))
+    repeated = {name: values + values[:1] for name, values in columns.items()}
+
+    with pytest.raises(ValueError, match="Duplicate left eye frames"):
+        Frames.from_columns(repeated)
+
+
+async def test_packed_batches_read_back_as_rows(db, monkeypatch):
+    positions = _positions()
+    await _store(db, monkeypatch, "rows", "rows", positions)
+    await _store(db, monkeypatch, "packed", "packed", positions)
+
+    stored = _rows(await ROW_STORAGE.read_columns(db, "rows", 1))
+    packed = _rows(await PACKED_STORAGE.read_columns(db, "packed", 1))
+
+    assert await recording_storage(db, "packed", 1) is PACKED_STORAGE
+    assert packed == stored
+    assert len(stored) == len(positions_to_columns("rows", 1, positions)['timestamp'])
+
+    # Every chunk but the last is full: batches topped up the last chunk before opening a new one
+    result = await db.execute(
+        select(RecordingChunk.chunk_index, RecordingChunk.frame_count)
+        .where(RecordingChunk.session_id == "packed").order_by(RecordingChunk.chunk_index)
+    )
+    chunks = result.all()
+    assert [index for index, _ in chunks] == list(range(len(chunks)))
+    assert [count for _, count in chunks[:-1]] == [CHUNK_SIZE] * (len(chunks) - 1)
+    assert sum(count for _, count in chunks) == len(Frames.from_columns(positions_to_columns("packed", 1, positions)))
+
+
+async def test_packed_reads_match_rows(db, monkeypatch):
+    positions = _positions()
+    await _store(db, monkeypatch, "rows", "rows", positions)
+    await _store(db, monkeypatch, "packed", "packed", positions)
+    start_ts, end_ts = positions[100]['timestamp'], positions[180]['timestamp']
+
+    for eye_side in ("left", "right"):
+        for bounds in ((None, None), (start_ts, end_ts)):
+            expected = await ROW_STORAGE.read_eye(db, "rows", 1, eye_side, *bounds)
+            actual = await PACKED_STORAGE.read_eye(db, "packed", 1, eye_side, *bounds)
+            for field in ("timestamps", "iris", "corner_left", "corner_right"):
+                np.testing.assert_array_equal(getattr(actual, field), getattr(expected, field))
+
+    expected = [row async for rows in ROW_STORAGE.stream_session(db, "rows", 64) for row in rows]
+    actual = [row async for rows in PACKED_STORAGE.stream_session(db, "packed", 64) for row in rows]
+    assert [tuple(row) for row in actual] == [tuple(row) for row in expected]
+
+
+async def test_repeated_frames_are_rejected_across_batches(db, monkeypatch):
+    positions = _positions(duration_s=5)
+    await _store(db, monkeypatch, "session", "packed", positions)
+    service = EyeTrackingService(db)
+
+    with pytest.raises(ValueError, match="already has frames"):
+        await service.store_recording_data("session", 1, positions[60:70])
+    await db.rollback()
+    # Timestamps are unique per session, whatever the recording
+    with pytest.raises(ValueError, match="already has frames"):
+        await service.store_recording_data("session", 2, positions[-1:])
+    await db.rollback()
+
+    # The eye missing from a stored frame can still be added
+    missing = [dict(position, leftEye=None) for position in positions if position['rightEye'] is None]
+    for position in missing:
+        position['rightEye'] = positions[0]['leftEye']
+    stored = len((await PACKED_STORAGE.read_columns(db, "session", 1))['timestamp'])
+    await service.store_recording_data("session", 1, missing)
+
+    columns = await PACKED_STORAGE.read_columns(db, "session", 1)
+    assert len(columns['timestamp']) == stored + len(missing)
@@ -1,6 +1,10 @@
 import math
 from typing import List, Optional, Dict
 
+import numpy as np
+
+from filters import moving_average
+
 def get_euclidean_distance(point1: dict, point2: dict) -> float:
     """Calculate Euclidean distance between two 3D points"""
     dx = point1['x'] - point2['x']
@@ -53,20 +57,9 @@ def apply_noise_reduction_to_normalized_data(data: List[Dict[str, float]], windo
     if len(data) < window_size:
         return data
     
-    smoothed_data = []
-    
-    for i in range(len(data)):
-        start_idx = max(0, i - window_size // 2)
-        end_idx = min(len(data), i + window_size // 2 + 1)
-        window = data[start_idx:end_idx]
-        
-        # Calculate average X position
-        x_values = [point['x'] for point in window]
-        avg_x = sum(x_values) / len(x_values)
-        
-        smoothed_data.append({
-            'timestamp': data[i]['timestamp'],
-            'x': avg_x
-        })
+    smoothed_x = moving_average(np.array([point['x'] for point in data], dtype=np.float64), window_size)
     
-    return smoothed_data 
\ No newline at end of file
+    return [
+        {'timestamp': point['timestamp'], 'x': x}
+        for point, x in zip(data, smoothed_x.tolist())
+    ]
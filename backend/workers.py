@@ -0,0 +1,149 @@
+"""
+Background workers running the jobs of jobs.py inside the API process.
+
+JobWorkerPool starts JOB_WORKERS tasks on the event loop. Each claims one job at a time and runs
+its handler with its own database session; the handler's writes and the job result are committed
+together. Handlers read through EyeTrackingService, which computes long series in worker threads,
+so at most JOB_WORKERS jobs run at once and none of them blocks the requests being served.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from cache import event_cache, pyramid_cache, range_index_cache
+from database import AsyncSessionLocal
+from derived import recompute_recording
+from events import EventParameters
+from filters import DEFAULT_FILTER, DEFAULT_WINDOW
+from jobs import JOB_POLL_INTERVAL, JOB_WORKERS, add_wakeup, claim_job, complete_job, fail_job, remove_wakeup
+from metrics import JOB_RUNS, JOB_SECONDS
+from pyramid import remove_pyramids
+from services import EyeTrackingService
+
+EYES = ("left", "right")
+
+JobHandler = Callable[[EyeTrackingService, str, int], Awaitable[dict]]
+
+
+async def run_normalize(service: EyeTrackingService, session_id: str, recording_number: int) -> dict:
+    references = await service.get_calibration_references(session_id)
+    rows = await recompute_recording(service.db, session_id, recording_number, references)
+    return {'rows': rows}
+
+
+async def run_pyramid(service: EyeTrackingService, session_id: str, recording_number: int) -> dict:
+    await remove_pyramids(service.db, session_id, recording_number)
+    result = {}
+    for eye_side in EYES:
+        pyramid_cache.invalidate((session_id, recording_number, eye_side))
+        pyramid = await service.get_pyramid(session_id, recording_number, eye_side)
+        result[eye_side] = {'samples': pyramid.sample_count, 'levels': len(pyramid.levels)}
+    return result
+
+
+async def run_stats(service: EyeTrackingService, session_id: str, recording_number: int) -> dict:
+    """Whole-recording statistics of both eyes, raw and smoothed with the default filter; warms the range index cache"""
+    result = {}
+    for eye_side in EYES:
+        result[eye_side] = {}
+        for noise_reduction, key in ((False, (None, None)), (True, (DEFAULT_FILTER, DEFAULT_WINDOW))):
+            range_index_cache.invalidate((session_id, recording_number, eye_side, *key))
+            stats = await service.get_range_stats(session_id, recording_number, eye_side, noise_reduction)
+            result[eye_side]['smoothed' if noise_reduction else 'raw'] = stats
+    return result
+
+
+async def run_events(service: EyeTrackingService, session_id: str, recording_number: int) -> dict:
+    """Events of both eyes with the default parameters; warms the event cache"""
+    parameters = EventParameters()
+    result = {'parameters': parameters.to_dict()}
+    for eye_side in EYES:
+        event_cache.invalidate((session_id, recording_number, eye_side, parameters))
+        result[eye_side] = await service.get_recording_events(session_id, recording_number, eye_side, parameters)
+    return result
+
+
+JOB_HANDLERS: Dict[str, JobHandler] = {
+    "normalize": run_normalize,
+    "pyramid": run_pyramid,
+    "stats": run_stats,
+    "events": run_events,
+}
+
+
+async def run_job(job: dict) -> str:
+    """Run one claimed job and record its outcome; returns its new status"""
+    started = time.perf_counter()
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await JOB_HANDLERS[job['kind']](EyeTrackingService(db), job['session_id'], job['recording_number'])
+            await complete_job(db, job, result)
+        status = "succeeded"
+    except Exception as e:
+        print(f"Job {job['id']} ({job['kind']} of session {job['session_id']} recording #{job['recording_number']}) "
+              f"failed on attempt {job['attempts']}/{job['max_attempts']}: {str(e)}")
+        async with AsyncSessionLocal() as db:
+            status = await fail_job(db, job, str(e))
+    JOB_SECONDS.observe(time.perf_counter() - started, job['kind'])
+    JOB_RUNS.inc(1, job['kind'], status)
+    return status
+
+
+async def run_next_job() -> bool:
+    """Claim and run the next due job, False when none is due"""
+    async with AsyncSessionLocal() as db:
+        job = await claim_job(db)
+    if job is None:
+        return False
+    await run_job(job)
+    return True
+
+
+async def run_pending_jobs() -> int:
+    """Run due jobs in the current task until none is left, and return how many ran"""
+    count = 0
+    while await run_next_job():
+        count += 1
+    return count
+
+
+class JobWorkerPool:
+    """
+    Tasks claiming and running due jobs until stopped. Idle workers wait for notify_workers
+    or poll_interval seconds, whichever comes first.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, poll_interval: float = JOB_POLL_INTERVAL):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        add_wakeup(self._wakeup)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel the workers: jobs they were running are claimed again once their lease expires"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._wakeup is not None:
+            remove_wakeup(self._wakeup)
+
+    async def _work(self) -> None:
+        while True:
+            # Cleared before looking for jobs, so that jobs enqueued meanwhile still wake this worker up
+            self._wakeup.clear()
+            try:
+                if await run_next_job():
+                    continue
+            except Exception as e:
+                # The database is unreachable: try again later
+                print(f"Job worker error: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
@@ -1,7 +1,7 @@
 import { useState, useEffect } from 'react'
 import { AreaChart, Area, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from 'recharts'
 import { useAppSelector, useAppDispatch } from '../store/hooks'
-import { fetchAllSessions, fetchRecordingData, setSelectedSession, setSelectedRecording } from '../store/playbackSlice'
+import { fetchAllSessions, fetchMoreSessions, fetchRecordingData, setSelectedSession, setSelectedRecording } from '../store/playbackSlice'
 import { averageEyeSpeed } from '../utils/positionCalculations'
 import type { Session, Recording } from '../types'
 
@@ -11,7 +11,7 @@ export default function PlaybackTab() {
   const [rangeEnd, setRangeEnd] = useState(100)
   const [useNoiseReduction, setUseNoiseReduction] = useState(true)
 
-  const { sessions, selectedSession, selectedRecording, recordingData, isLoading, error } = useAppSelector(state => state.playback)
+  const { sessions, nextSessionsCursor, selectedSession, selectedRecording, recordingData, isLoading, error } = useAppSelector(state => state.playback)
 
   // Fetch sessions on component mount
   useEffect(() => {
@@ -314,6 +314,15 @@ export default function PlaybackTab() {
                 )}
               </div>
             ))}
+            {nextSessionsCursor && (
+              <button
+                className="load-more-sessions"
+                disabled={isLoading}
+                onClick={() => dispatch(fetchMoreSessions(nextSessionsCursor))}
+              >
+                {isLoading ? 'Loading...' : 'Load more sessions'}
+              </button>
+            )}
           </div>
         )}
       </div>
@@ -9,6 +9,11 @@ export const API_ENDPOINTS = {
   calibrationData: (sessionId: string) => `${API_BASE_URL}/api/calibration/${sessionId}`,
   deleteSession: (sessionId: string) => `${API_BASE_URL}/api/sessions/${sessionId}`,
   allSessions: `${API_BASE_URL}/api/sessions`,
+  sessionsPage: (limit: number, cursor?: string | null) => {
+    const params = new URLSearchParams({ limit: String(limit) })
+    if (cursor) params.append('cursor', cursor)
+    return `${API_BASE_URL}/api/sessions?${params.toString()}`
+  },
   recordingData: (sessionId: string, recordingNumber: number, eye?: string, noiseReduction?: boolean) => {
     const params = new URLSearchParams()
     if (eye && eye !== 'both') params.append('eye', eye)
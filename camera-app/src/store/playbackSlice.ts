@@ -25,6 +25,7 @@ interface Session {
 
 interface PlaybackState {
   sessions: Session[]
+  nextSessionsCursor: string | null
   selectedSession: Session | null
   selectedRecording: Recording | null
   recordingData: NormalizedPosition[]
@@ -36,6 +37,7 @@ interface PlaybackState {
 
 const initialState: PlaybackState = {
   sessions: [],
+  nextSessionsCursor: null,
   selectedSession: null,
   selectedRecording: null,
   recordingData: [],
@@ -45,19 +47,39 @@ const initialState: PlaybackState = {
   noiseReduction: false,
 }
 
-// Async thunk to fetch all sessions
+// Sessions are listed most recent first, one page at a time
+const SESSIONS_PAGE_SIZE = 50
+
+const fetchSessionsPage = async (cursor: string | null) => {
+  const response = await fetch(API_ENDPOINTS.sessionsPage(SESSIONS_PAGE_SIZE, cursor))
+  
+  if (!response.ok) {
+    throw new Error(`Failed to fetch sessions: ${response.status}`)
+  }
+  
+  const result = await response.json()
+  return { sessions: result.sessions as Session[], nextCursor: result.next_cursor as string | null }
+}
+
+// Async thunk to fetch the first page of sessions
 export const fetchAllSessions = createAsyncThunk(
   'playback/fetchAllSessions',
   async () => {
     try {
-      const response = await fetch(API_ENDPOINTS.allSessions)
-      
-      if (!response.ok) {
-        throw new Error(`Failed to fetch sessions: ${response.status}`)
-      }
-      
-      const result = await response.json()
-      return result.sessions
+      return await fetchSessionsPage(null)
+    } catch (error) {
+      console.error('Failed to fetch sessions:', error)
+      throw error
+    }
+  }
+)
+
+// Async thunk to fetch the next page of sessions
+export const fetchMoreSessions = createAsyncThunk(
+  'playback/fetchMoreSessions',
+  async (cursor: string) => {
+    try {
+      return await fetchSessionsPage(cursor)
     } catch (error) {
       console.error('Failed to fetch sessions:', error)
       throw error
@@ -124,13 +146,29 @@ const playbackSlice = createSlice({
       })
       .addCase(fetchAllSessions.fulfilled, (state, action) => {
         state.isLoading = false
-        state.sessions = action.payload
+        state.sessions = action.payload.sessions
+        state.nextSessionsCursor = action.payload.nextCursor
         state.error = null
       })
       .addCase(fetchAllSessions.rejected, (state, action) => {
         state.isLoading = false
         state.error = action.error.message || 'Failed to fetch sessions'
       })
+      // Fetch the next page of sessions
+      .addCase(fetchMoreSessions.pending, (state) => {
+        state.isLoading = true
+        state.error = null
+      })
+      .addCase(fetchMoreSessions.fulfilled, (state, action) => {
+        state.isLoading = false
+        state.sessions = [...state.sessions, ...action.payload.sessions]
+        state.nextSessionsCursor = action.payload.nextCursor
+        state.error = null
+      })
+      .addCase(fetchMoreSessions.rejected, (state, action) => {
+        state.isLoading = false
+        state.error = action.error.message || 'Failed to fetch sessions'
+      })
       // Fetch recording data
       .addCase(fetchRecordingData.pending, (state) => {
         state.isLoading = true